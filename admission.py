@@ -0,0 +1,203 @@
+# admission.py
+import os
+import time
+import heapq
+import itertools
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+
+import metrics
+
+# Lower value = served first when a slot frees up
+PRIORITY_CLASSES = {
+    "voice": 0,        # live voice turns: user is waiting on audio
+    "text": 1,         # interactive text chat
+    "batch": 2,        # offline / bulk jobs
+}
+DEFAULT_PRIORITY = "text"
+
+_current_priority = contextvars.ContextVar("llm_priority", default=DEFAULT_PRIORITY)
+
+
+@contextmanager
+def priority_scope(name: str):
+    """Tag LLM calls made inside this block (same thread / task) with a priority class."""
+    if name not in PRIORITY_CLASSES:
+        name = DEFAULT_PRIORITY
+    token = _current_priority.set(name)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+def current_priority() -> str:
+    return _current_priority.get()
+
+
+class AdmissionRejected(Exception):
+    """Raised when the wait queue is full or the queue wait exceeded its budget (maps to HTTP 429)."""
+
+    def __init__(self, message: str, retry_after_s: float = 1.0):
+        super().__init__(message)
+        self.retry_after_s = retry_after_s
+
+
+class _Waiter:
+    __slots__ = ("event", "granted", "cancelled")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.granted = False
+        self.cancelled = False
+
+
+class AdmissionController:
+    """
+    Concurrency cap + bounded priority wait queue for LLM calls.
+
+    At most `max_concurrency` calls run at once. Further callers wait in a priority
+    queue (voice before text before batch, FIFO within a class) of at most `max_queue`
+    entries; a full queue or a wait longer than `max_wait_s` is rejected immediately
+    with AdmissionRejected rather than piling more load on the provider. When the
+    queue is full, a higher-priority arrival sheds the lowest-priority waiter instead.
+    """
+
+    def __init__(self, max_concurrency: int = 8, max_queue: int = 32, max_wait_s: float = 5.0):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_wait_s = max_wait_s
+        self._lock = threading.Lock()
+        self._heap = []
+        self._seq = itertools.count()
+        self._active = 0
+        self._queued = 0
+
+        # metrics
+        self.admitted = {name: 0 for name in PRIORITY_CLASSES}
+        self.rejected = {name: 0 for name in PRIORITY_CLASSES}
+        self.max_queue_depth_seen = 0
+        self._waits_ms = deque(maxlen=1000)
+
+    @classmethod
+    def from_env(cls) -> "AdmissionController":
+        return cls(
+            max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", 8)),
+            max_queue=int(os.getenv("LLM_MAX_QUEUE", 32)),
+            max_wait_s=float(os.getenv("LLM_QUEUE_TIMEOUT_S", 5.0)),
+        )
+
+    # ---------------- acquire / release ----------------
+    def _acquire(self, priority: str) -> float:
+        started = time.monotonic()
+        with self._lock:
+            if self._active < self.max_concurrency and self._queued == 0:
+                self._active += 1
+                self.admitted[priority] += 1
+                self._waits_ms.append(0.0)
+                return 0.0
+            if self._queued >= self.max_queue and not self._shed_lower_than(PRIORITY_CLASSES[priority]):
+                self.rejected[priority] += 1
+                raise AdmissionRejected("LLM queue is full", retry_after_s=self.max_wait_s)
+            waiter = _Waiter()
+            heapq.heappush(self._heap, (PRIORITY_CLASSES[priority], next(self._seq), waiter))
+            self._queued += 1
+            self.max_queue_depth_seen = max(self.max_queue_depth_seen, self._queued)
+
+        waiter.event.wait(self.max_wait_s)
+
+        with self._lock:
+            if not waiter.granted:
+                # timed out (or shed): leave the heap entry behind, release() skips cancelled waiters
+                if not waiter.cancelled:
+                    waiter.cancelled = True
+                    self._queued -= 1
+                self.rejected[priority] += 1
+                raise AdmissionRejected("Timed out waiting for an LLM slot", retry_after_s=self.max_wait_s)
+            waited_ms = (time.monotonic() - started) * 1000
+            self.admitted[priority] += 1
+            self._waits_ms.append(waited_ms)
+            return waited_ms
+
+    def _shed_lower_than(self, rank: int) -> bool:
+        """Cancel the newest waiter of the worst class below `rank`. Caller holds the lock."""
+        victim = None
+        for entry in self._heap:
+            if entry[2].cancelled or entry[0] <= rank:
+                continue
+            if victim is None or entry[:2] > victim[:2]:
+                victim = entry
+        if victim is None:
+            return False
+        victim[2].cancelled = True
+        self._queued -= 1
+        victim[2].event.set()
+        return True
+
+    def _release(self):
+        with self._lock:
+            while self._heap:
+                _, _, waiter = heapq.heappop(self._heap)
+                if waiter.cancelled:
+                    continue
+                # hand the slot straight to the next waiter; _active is unchanged
+                waiter.granted = True
+                self._queued -= 1
+                waiter.event.set()
+                return
+            self._active -= 1
+
+    def acquire(self, priority: str = None, block: bool = True) -> bool:
+        """
+        Take a slot, queueing by priority if none is free (AdmissionRejected on a full queue
+        or timeout). With block=False never queue: returns False at once if no slot is free.
+        Every successful acquire must be paired with release().
+        """
+        priority = priority or current_priority()
+        if priority not in PRIORITY_CLASSES:
+            priority = DEFAULT_PRIORITY
+        if not block:
+            with self._lock:
+                if self._active >= self.max_concurrency or self._queued:
+                    return False
+                self._active += 1
+                self.admitted[priority] += 1
+                return True
+        waited_ms = self._acquire(priority)
+        metrics.record_stage("llm_queue_wait", waited_ms)
+        return True
+
+    def release(self):
+        self._release()
+
+    @contextmanager
+    def slot(self, priority: str = None):
+        self.acquire(priority)
+        try:
+            yield
+        finally:
+            self._release()
+
+    # ---------------- metrics ----------------
+    def stats(self) -> dict:
+        with self._lock:
+            waits = sorted(self._waits_ms)
+            active, queued = self._active, self._queued
+
+        def pct(p):
+            if not waits:
+                return 0.0
+            return round(waits[min(len(waits) - 1, int(len(waits) * p))], 2)
+
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "active": active,
+            "queue_depth": queued,
+            "max_queue_depth_seen": self.max_queue_depth_seen,
+            "admitted": dict(self.admitted),
+            "rejected": dict(self.rejected),
+            "wait_ms": {"p50": pct(0.50), "p95": pct(0.95), "p99": pct(0.99)},
+        }
@@ -0,0 +1,72 @@
+# app/admin.py
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse, Response
+import profiling
+
+router = APIRouter(prefix="/admin")
+
+
+def require_admin(x_admin_token: str = Header(None)):
+    token = profiling.admin_token()
+    if not token:
+        raise HTTPException(status_code=404, detail="Admin endpoints are disabled (set PROFILE_ADMIN_TOKEN)")
+    if x_admin_token != token:
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+@router.post("/profile/arm", dependencies=[Depends(require_admin)])
+async def arm_profiling(path: str = Query("/chat", description="request path to profile, e.g. /chat or /search"),
+                        count: int = Query(1, ge=0, le=100),
+                        mode: str = Query("sample", description="sample | cprofile")):
+    """Profile the next `count` requests to `path` (count=0 disarms)."""
+    if mode not in profiling.MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of {profiling.MODES}")
+    profiling.arm(path, count, mode)
+    return {"armed": profiling.armed()}
+
+
+@router.delete("/profile/arm", dependencies=[Depends(require_admin)])
+async def disarm_profiling():
+    profiling.disarm()
+    return {"armed": profiling.armed()}
+
+
+@router.get("/profiles", dependencies=[Depends(require_admin)])
+async def list_profiles():
+    return {"armed": profiling.armed(), "profiles": profiling.list_records()}
+
+
+@router.get("/profiles/{profile_id}", dependencies=[Depends(require_admin)])
+async def get_profile(profile_id: str, format: str = Query("auto", description="auto | collapsed | text | pstats")):
+    """
+    collapsed: one "frame;frame;frame count" line per stack (sample mode; feed to flamegraph tools)
+    text: pstats table sorted by cumulative time (cprofile mode)
+    pstats: raw pstats dump, loadable with pstats.Stats(path) / snakeviz (cprofile mode)
+    """
+    record = profiling.get_record(profile_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format == "auto":
+        format = "collapsed" if record.mode == "sample" else "text"
+
+    if format == "collapsed":
+        if record.mode != "sample":
+            raise HTTPException(status_code=400, detail="collapsed stacks are only available for sample mode")
+        return PlainTextResponse(record.collapsed_text())
+    if format in ("text", "pstats"):
+        if record.mode != "cprofile":
+            raise HTTPException(status_code=400, detail="pstats are only available for cprofile mode")
+        if format == "text":
+            return PlainTextResponse(record.pstats_text())
+        return Response(
+            content=record.pstats_data,
+            media_type="application/octet-stream",
+            headers={"Content-Disposition": f'attachment; filename="{record.id}.pstats"'},
+        )
+    raise HTTPException(status_code=400, detail="format must be auto, collapsed, text or pstats")
+
+
+@router.delete("/profiles", dependencies=[Depends(require_admin)])
+async def clear_profiles():
+    profiling.clear()
+    return {"cleared": True}
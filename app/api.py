@@ -1,75 +1,301 @@
 # app/api.py
-from fastapi import APIRouter, Depends, HTTPException
-from app.models import ChatRequest, ChatResponse
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse
+from app.models import ChatRequest, ChatResponse, PartialTranscriptRequest, BatchChatRequest, BatchSearchRequest
+from app import deps
 from app.deps import get_llm
+from app.responses import dumps, json_response
+from admission import AdmissionRejected, priority_scope
+import metrics
+import memstats  # registers per-worker memory gauges on /metrics
+import profiling
+import singleflight
 import time
+from datetime import date
 from fastapi import Query
 
 router = APIRouter()
 
+MAX_BATCH_ITEMS = 5000
+
 @router.get("/health")      
 async def health():
     return {"status": "ok"}
 
 
+@router.get("/ready")
+async def ready():
+    """Readiness probe: 503 until startup warmup (model, index, LLM) has finished; 200 at once with WARMUP_ON_STARTUP=0."""
+    state = deps.warmup_state()
+    return JSONResponse(state, status_code=200 if deps.is_ready() else 503)
+
+
+def _process_with_priority(llm, text: str, channel: str, timings: dict, profile_mode: str = None) -> str:
+    # runs in a worker thread; the priority tag is read by the LLM admission controller
+    # and per-stage timings for this request accumulate into `timings`
+    with priority_scope(channel), metrics.collect_timings(timings), \
+            profiling.capture(profile_mode, f"/chat {text[:80]}"):
+        return llm.process(text)
+
+
+def _too_busy(e: AdmissionRejected) -> HTTPException:
+    return HTTPException(
+        status_code=429,
+        detail="Assistant is busy, please retry shortly.",
+        headers={"Retry-After": str(max(1, int(e.retry_after_s)))},
+    )
+
+
+CHAT_FIELDS = ("reply", "ssml", "retrieved_docs", "last_tool", "timings", "elapsed_ms")
+# what the React UI reads; SSML and timings are opt-in
+DEFAULT_CHAT_FIELDS = ("reply", "retrieved_docs", "last_tool", "elapsed_ms")
+
+
+def _chat_fields(req: ChatRequest) -> set:
+    if req.fields is None:
+        fields = set(DEFAULT_CHAT_FIELDS)
+    else:
+        fields = {f.strip() for f in req.fields if f and f.strip()}
+        unknown = fields.difference(CHAT_FIELDS)
+        if unknown:
+            raise HTTPException(status_code=400,
+                                detail=f"Unknown fields {sorted(unknown)}; expected a subset of {list(CHAT_FIELDS)}")
+    if req.include_timings:
+        fields.add("timings")
+    return fields
+
+
+def _retrieved_meta(retrieved):
+    if not retrieved:
+        return None
+    retrieved_meta = []
+    for d in retrieved:
+        md = d.metadata if hasattr(d, "metadata") else {}
+        retrieved_meta.append({
+            "source": md.get("source"),
+            "prod_id": md.get("prod_id"),
+            "title": md.get("title"),
+            "final_price": md.get("final_price"),
+            "url": md.get("url"),
+            "doc_id": md.get("doc_id"),
+        })
+    return retrieved_meta
+
+
+def _reply_ssml(llm, reply: str, timings: dict):
+    try:
+        with metrics.collect_timings(timings), metrics.stage("ssml"):
+            to_ssml = getattr(llm, "text_to_ssml", None)
+            if not callable(to_ssml):
+                from ecommerce_llm import text_to_ssml as to_ssml
+            return to_ssml(reply)
+    except Exception as e:
+        print(f"[api] SSML generation failed: {e}")
+        return None
+
+
 @router.post("/chat", response_model=ChatResponse)
-async def chat(req: ChatRequest, llm = Depends(get_llm)):
-    import time
+async def chat(req: ChatRequest, request: Request, llm = Depends(get_llm)):
+    """
+    One assistant turn. `fields` picks the response sections (default: reply,
+    retrieved_docs, last_tool, elapsed_ms); SSML is only generated when "ssml" is asked for.
+    """
     if not req.text:
         raise HTTPException(status_code=400, detail="Empty `text` is not allowed")
+    fields = _chat_fields(req)
+
+    profile_mode = profiling.requested_mode("/chat", request.headers)
+
+    # a view of its own for this turn: last_tool / last_retrieved read below are never
+    # another concurrent request's (order details carry names and emails)
+    engine = deps.get_session(req.session_id, llm).turn()
 
     start = time.time()
-    reply = llm.process(req.text)  # this returns clean plain text (no \n)
+    timings = {}
+    try:
+        # off the event loop so queued LLM calls don't block other requests
+        reply = await run_in_threadpool(
+            _process_with_priority, engine, req.text, req.channel or "text", timings, profile_mode
+        )
+    except AdmissionRejected as e:
+        raise _too_busy(e)
     elapsed = int((time.time() - start) * 1000)
 
-    # build retrieved_docs
-    retrieved = getattr(llm, "last_retrieved", None)
-    retrieved_meta = None
-    if retrieved:
-        retrieved_meta = []
-        for d in retrieved:
-            md = d.metadata if hasattr(d, "metadata") else {}
-            retrieved_meta.append({
-                "source": md.get("source"),
-                "prod_id": md.get("prod_id"),
-                "title": md.get("title"),
-                "final_price": md.get("final_price"),
-                "url": md.get("url"),
-            })
+    body = {}
+    if "reply" in fields:
+        body["reply"] = reply
+    if "ssml" in fields:
+        # SSML for spoken responses
+        body["reply_ssml"] = _reply_ssml(engine, reply, timings)
+    if "retrieved_docs" in fields:
+        body["retrieved_docs"] = _retrieved_meta(engine.last_retrieved)
+    if "last_tool" in fields:
+        body["last_tool"] = engine.last_tool
+    if "elapsed_ms" in fields:
+        body["elapsed_ms"] = elapsed
+    if "timings" in fields:
+        body["timings"] = timings
+    return json_response(request, body)
+
+@router.post("/chat/partial")
+async def chat_partial(req: PartialTranscriptRequest, llm = Depends(get_llm)):
+    """
+    Interim voice transcript: once it is stable, retrieval for the likely intent starts
+    in the background, and the final /chat turn with the same text reuses the result.
+    Returns immediately; nothing is answered or remembered.
+    """
+    return await run_in_threadpool(llm.prefetch, req.text, req.session_id, req.stable)
+
+
+@router.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus scrape endpoint: per-stage latency histograms, cache hits, LLM tokens, queue gauges."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
-    last_tool = getattr(llm, "last_tool", None)
 
-    # generate SSML for spoken responses
+@metrics.register_collector
+def _component_metrics():
+    # read-only view of already-running components; never instantiates the LLM
+    lines = []
+    warm = deps.warmup_state()
+    lines += metrics.sample_lines("ecom_ready", "1 once startup warmup has finished", {(): int(deps.is_ready())})
+    lines += metrics.sample_lines(
+        "ecom_warmup_stage_ms", "Startup warmup time per stage in milliseconds",
+        {(("stage", name),): ms for name, ms in warm["stages_ms"].items()})
+    sf = singleflight.stats()
+    lines += metrics.sample_lines(
+        "ecom_singleflight_executed_total", "Stateless-stage computations actually executed",
+        {(("stage", name),): s["executed"] for name, s in sf.items()}, metric_type="counter")
+    lines += metrics.sample_lines(
+        "ecom_singleflight_coalesced_total", "Duplicate in-flight computations collapsed",
+        {(("stage", name),): s["coalesced"] for name, s in sf.items()}, metric_type="counter")
+
+    llm = deps._llm_instance
+    if llm is not None:
+        spec = llm.speculation_stats()
+        lines += metrics.sample_lines(
+            "ecom_speculative_work_total", "Speculative retrievals started, used by the final turn, or wasted",
+            {(("outcome", o),): spec[o] for o in ("started", "used", "wasted")}, metric_type="counter")
+        gw = llm.gateway.stats()
+        lines += metrics.sample_lines(
+            "ecom_llm_gateway_events_total", "LLM gateway calls, retries, hedges, timeouts, rejections",
+            {(("event", e),): gw[e] for e in ("calls", "retries", "hedges", "timeouts", "rejected")},
+            metric_type="counter")
+        lines += metrics.sample_lines(
+            "ecom_llm_circuit_open", "1 if the LLM circuit breaker is open",
+            {(): 1 if gw["state"] == "open" else 0})
+        adm = gw.get("admission")
+        if adm:
+            lines += metrics.sample_lines(
+                "ecom_llm_queue_depth", "LLM calls waiting for an admission slot", {(): adm["queue_depth"]})
+            lines += metrics.sample_lines(
+                "ecom_llm_active_calls", "LLM calls holding an admission slot", {(): adm["active"]})
+            lines += metrics.sample_lines(
+                "ecom_llm_rejected_total", "LLM calls rejected by admission control",
+                {(("priority", p),): n for p, n in adm["rejected"].items()}, metric_type="counter")
+    return lines
+
+
+# plain def (threadpool): a cold get_catalog() parses products.csv, and stats() walks every
+# catalog string; neither may run on the event loop
+@router.get("/catalog/status")
+def catalog_status():
+    """Active index generation, catalog watcher state and product catalog size."""
+    import catalog_watcher
+    import rag_store1
+    from product_catalog import get_catalog
+    return {
+        "generation": rag_store1.active_generation().info(),
+        "watcher": catalog_watcher.stats(),
+        "catalog": get_catalog().stats(),
+    }
+
+
+@router.get("/products/{prod_id}")
+def get_product(prod_id: str):
+    """Exact product lookup by prod_id from the in-memory catalog (no embedding / vector search)."""
+    from product_catalog import get_catalog
+    product = get_catalog().product(prod_id)
+    if product is None:
+        raise HTTPException(status_code=404, detail=f"Product {prod_id} not found")
+    return product
+
+
+@router.get("/suggest")
+async def suggest(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(8, ge=1, le=20),
+    types: str = Query(None, description="comma list of title, brand, category (default all)"),
+):
+    """
+    Typeahead: product titles, brands and categories with a word starting with `q`,
+    most popular (reviews, rating) first. Served from an in-memory sorted prefix index,
+    no embedding or vector search.
+    """
+    from suggest import KINDS, get_suggest_index
+    kinds = [t.strip() for t in types.split(",") if t.strip()] if types else None
+    unknown = set(kinds or ()).difference(KINDS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown types {sorted(unknown)}; expected {list(KINDS)}")
+    # built with the catalog at warmup; only a cold first call pays for the build
+    index = await run_in_threadpool(get_suggest_index)
+    return json_response(request, {"query": q, "suggestions": index.suggest(q, limit, kinds)})
+
+
+@router.get("/analytics/returns")
+async def returns_analytics(
+    by: str = Query(None, description="category | reason | payment_method | shipping_method | location | status | month"),
+    days: int = Query(None, ge=1, description="only orders placed in the last N days (up to `until`)"),
+    until: date = Query(None, description="end of the window, YYYY-MM-DD (default today)"),
+    top: int = Query(20, ge=1, le=500),
+):
+    """
+    Return rate, reason breakdown and days-to-return histogram from returns.csv, optionally
+    grouped by a dimension and/or limited to a time window. Served from incrementally
+    maintained counters / columns; returns.csv is not re-read per request.
+    """
+    from returns_analytics import get_returns_analytics
+    # the first call parses the file; later ones only read appended rows
+    analytics = await run_in_threadpool(get_returns_analytics)
     try:
-        # call helper on llm instance (we added text_to_ssml)
-        reply_ssml = llm_text_to_ssml = getattr(llm, "text_to_ssml", None)
-        if callable(reply_ssml):
-            ssml = reply_ssml(reply)
-        else:
-            # fallback: simple wrapper if text_to_ssml not present
-            from ecommerce_llm import text_to_ssml as global_text_to_ssml
-            ssml = global_text_to_ssml(reply)
-    except Exception as e:
-        print(f"[api] SSML generation failed: {e}")
-        ssml = None
-
-    return ChatResponse(
-        reply=reply,
-        reply_ssml=ssml,
-        retrieved_docs=retrieved_meta,
-        last_tool=last_tool,
-        elapsed_ms=elapsed
-    )
+        return await run_in_threadpool(analytics.summary, by, days, until, top)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/admission/stats")
+async def admission_stats(llm = Depends(get_llm)):
+    """Queue depth, active slots, admitted/rejected counts and queue wait percentiles for LLM calls."""
+    return llm.gateway.stats()
+
+
+@router.get("/singleflight/stats")
+async def singleflight_stats():
+    """Per-stage counts of executed vs. coalesced (duplicate, collapsed) in-flight work."""
+    return singleflight.stats()
+
 
 @router.get("/search")
-async def search(q: str = Query(..., min_length=1), k: int = Query(5, ge=1, le=20)):
+async def search(request: Request, q: str = Query(..., min_length=1), k: int = Query(5, ge=1, le=20)):
     """
     Simple search endpoint — returns top-k product metadata from the vector DB (no LLM).
     Example: /search?q=running+shoes&k=5
     """
-    from rag_store import get_retriever  # local import to avoid startup cost if unused
-    retriever = get_retriever(k=k)
-    docs = retriever.get_relevant_documents(q)
+    from rag_store1 import get_retriever  # local import to avoid startup cost if unused
+    profile_mode = profiling.requested_mode("/search", request.headers)
+
+    def run():
+        with profiling.capture(profile_mode, f"/search {q[:80]}"):
+            return get_retriever(k=k).get_relevant_documents(q)
+
+    # first call loads the embedding model, so keep both steps off the event loop
+    docs = await run_in_threadpool(run)
+    return json_response(request, {"query": q, "k": k, "results": _format_search_docs(docs)})
+
+
+def _format_search_docs(docs):
     results = []
     for d in docs:
         md = d.metadata or {}
@@ -88,7 +314,50 @@ async def search(q: str = Query(..., min_length=1), k: int = Query(5, ge=1, le=2
                 "source": md.get("source"),
                 "snippet": d.page_content[:400]
             })
-    return {"query": q, "k": k, "results": results}
+    return results
+
+
+def _check_batch_size(items):
+    if not items:
+        raise HTTPException(status_code=400, detail="Batch must contain at least one item")
+    if len(items) > MAX_BATCH_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Batch too large (max {MAX_BATCH_ITEMS} items)")
+
+
+@router.post("/chat/batch")
+async def chat_batch(req: BatchChatRequest, llm = Depends(get_llm)):
+    """
+    Run many chat queries in one call. Results stream back as NDJSON, one line per
+    input, in completion order (each line carries the input `index`).
+    Batch items run at "batch" LLM priority and do not touch conversation memory.
+    """
+    _check_batch_size(req.texts)
+
+    def lines():
+        for item in llm.process_batch(req.texts, max_concurrency=req.max_concurrency or 4):
+            yield dumps(item) + b"\n"
+
+    # sync generator: Starlette iterates it in the threadpool
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@router.post("/search/batch")
+async def search_batch(req: BatchSearchRequest):
+    """
+    Vector search for many queries: one batched embedding call and one vector-store
+    query for the whole batch. Streams NDJSON lines of {index, query, results}.
+    """
+    _check_batch_size(req.queries)
+    if not 1 <= req.k <= 20:
+        raise HTTPException(status_code=400, detail="k must be between 1 and 20")
+    from rag_store1 import batch_similarity_search
+
+    def lines():
+        for i, docs in enumerate(batch_similarity_search(req.queries, k=req.k)):
+            item = {"index": i, "query": req.queries[i], "results": _format_search_docs(docs)}
+            yield dumps(item) + b"\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
 
 
 # Add below other endpoints in app/api.py
@@ -108,7 +377,8 @@ async def get_order(order_id: str, email: str = Query(None, description="optiona
 
     # If email provided and matched (or no email required), return full details
     if email:
-        return {"found": True, "order": order}
+        from product_catalog import get_catalog
+        return {"found": True, "order": dict(order, items=get_catalog().enrich_items(order.get("items")))}
     # If no email given, return minimal safe info
     return {
         "found": True,
@@ -1,15 +1,105 @@
 # app/deps.py
 import os
+import time
+import threading
+from collections import OrderedDict
 from dotenv import load_dotenv
-from ecommerce_llm import EcommerceLLM
 
 load_dotenv()
 
+# ecommerce_llm (langchain, Groq client, embeddings, Chroma) is imported on first use,
+# so the server starts accepting /health immediately and warmup() pays the cost.
 _llm_instance = None
+_llm_lock = threading.Lock()
+
+# conversations keyed by ChatRequest.session_id, least recently used evicted first
+MAX_SESSIONS = int(os.getenv("MAX_SESSIONS", "10000"))
+_sessions: "OrderedDict[str, object]" = OrderedDict()
+_sessions_lock = threading.Lock()
+
+# WARMUP_ON_STARTUP=0: no startup warmup; the first request pays the cold start instead
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "1").strip().lower() not in ("0", "false", "no", "off")
+
+# readiness state, filled in by warmup() (or skip_warmup() when warmup is disabled)
+_warmup = {"status": "cold", "started_at": None, "finished_at": None, "stages_ms": {}, "error": None}
+
 
 def get_llm():
     global _llm_instance
     if _llm_instance is None:
-        # instantiate once (keeps memory)
-        _llm_instance = EcommerceLLM()
+        with _llm_lock:
+            if _llm_instance is None:
+                from ecommerce_llm import EcommerceLLM
+                # instantiate once (keeps memory)
+                _llm_instance = EcommerceLLM()
     return _llm_instance
+
+
+def get_session(session_id, llm=None):
+    """
+    The engine view that holds `session_id`'s conversation memory (created on first use);
+    requests without a session id share the engine's own memory.
+    """
+    llm = llm or get_llm()
+    if not session_id:
+        return llm
+    with _sessions_lock:
+        view = _sessions.pop(session_id, None) or llm.session()
+        _sessions[session_id] = view
+        while len(_sessions) > MAX_SESSIONS:
+            _sessions.popitem(last=False)
+    return view
+
+
+def warmup():
+    """
+    Pay every cold-start cost before traffic arrives: import the app modules, load the
+    embedding model, open the vector index, run a dummy embedding + search, and build
+    EcommerceLLM. Runs once in a background thread at startup; /ready reports the result.
+    """
+    stages = _warmup["stages_ms"]
+    _warmup.update(status="warming", started_at=time.time(), error=None)
+
+    def timed(name, fn):
+        t = time.perf_counter()
+        result = fn()
+        stages[name] = round((time.perf_counter() - t) * 1000, 1)
+        return result
+
+    try:
+        rag_store1 = timed("import_rag_store", lambda: __import__("rag_store1"))
+        embeddings = timed("load_embedding_model", rag_store1.get_embeddings)
+        vectordb = timed("open_index", rag_store1.get_vectorstore)
+        vec = timed("dummy_embedding", lambda: embeddings.embed_query("warmup query"))
+        timed("dummy_search", lambda: vectordb.similarity_search_by_vector(vec, k=1))
+        timed("load_catalog", lambda: __import__("product_catalog").get_catalog())
+        timed("suggest_index", lambda: __import__("suggest").get_suggest_index())
+        timed("faq_index", lambda: __import__("faq_index").get_faq_index())
+        timed("build_llm", get_llm)
+        _warmup["status"] = "ready"
+    except Exception as e:
+        _warmup.update(status="failed", error=f"{type(e).__name__}: {e}")
+        print(f"[warmup] failed: {e}")
+    finally:
+        _warmup["finished_at"] = time.time()
+    if _warmup["status"] == "ready":
+        print(f"[warmup] ready in {sum(stages.values()):.0f} ms {stages}")
+
+
+def skip_warmup():
+    """Warmup disabled: ready at once, every component is built lazily on first use."""
+    _warmup.update(status="skipped", finished_at=time.time())
+
+
+def start_warmup() -> threading.Thread:
+    thread = threading.Thread(target=warmup, name="warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+def is_ready() -> bool:
+    return _warmup["status"] in ("ready", "skipped")
+
+
+def warmup_state() -> dict:
+    return dict(_warmup, stages_ms=dict(_warmup["stages_ms"]))
@@ -1,24 +1,62 @@
 # app/main.py
-from fastapi import FastAPI
+import time
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from app.api import router as api_router
-from app.deepgram_token import router as deepgram_router
+from app.token_broker import router as token_router
+from app.admin import router as admin_router
+from app import deps
+import metrics
 import os
 
-app = FastAPI(title="Ecommerce RAG API")
+app = FastAPI(title="Ecommerce RAG API", default_response_class=ORJSONResponse)
 
 
 # ✅ ADD THIS CORS CONFIG
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["http://localhost:5173"],  # allow all for local dev
+    # the React UI; add e.g. "null" for the LiveKit page opened from disk
+    allow_origins=[o.strip() for o in os.getenv("CORS_ORIGINS", "http://localhost:5173").split(",") if o.strip()],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # label by route template (/orders/{order_id}) to keep cardinality bounded
+        route = request.scope.get("route")
+        metrics.HTTP_LATENCY.observe(
+            (time.perf_counter() - start) * 1000,
+            method=request.method,
+            route=getattr(route, "path", "unmatched"),
+            status=status,
+        )
+
+
+@app.on_event("startup")
+async def start_warmup():
+    # load model + index in the background; /health is live at once, /ready flips when warm
+    if deps.WARMUP_ON_STARTUP:
+        deps.start_warmup()
+    else:
+        deps.skip_warmup()
+    # rebuild + hot-swap the index when products.csv / faqs.json change (CATALOG_WATCH_S=0 disables)
+    import catalog_watcher
+    catalog_watcher.start()
+
+
 app.include_router(api_router, prefix="")
-app.include_router(deepgram_router)
+app.include_router(token_router)
+app.include_router(admin_router)
 
 @app.get("/")
 def root():
@@ -3,11 +3,29 @@ from pydantic import BaseModel
 from typing import Optional, List, Dict,Any
 
 class ChatRequest(BaseModel):
-    session_id: Optional[str] = None   # keep session-level conv memory if you want
+    session_id: Optional[str] = None   # per-conversation memory; omitted = the shared default conversation
     text: str
+    channel: Optional[str] = "text"    # "voice" turns are scheduled ahead of "text" when the LLM is saturated
+    include_timings: bool = False      # return a per-stage latency breakdown in `timings`
+    fields: Optional[List[str]] = None # response sections: reply, ssml, retrieved_docs, last_tool, timings, elapsed_ms
     
+class PartialTranscriptRequest(BaseModel):
+    session_id: Optional[str] = None
+    text: str                          # interim (not yet final) transcript
+    stable: bool = False               # client-side stability flag; otherwise a repeat of the same partial counts
+
+class BatchChatRequest(BaseModel):
+    texts: List[str]
+    max_concurrency: Optional[int] = 4
+
+class BatchSearchRequest(BaseModel):
+    queries: List[str]
+    k: int = 5
+
 class ChatResponse(BaseModel):
-    reply: str
+    reply: Optional[str] = None
+    reply_ssml: Optional[str] = None
     retrieved_docs: Optional[List[Dict[str, Any]]] = None
     last_tool: Optional[Dict[str, Any]] = None
-    elapsed_ms: Optional[int] = None
\ No newline at end of file
+    elapsed_ms: Optional[int] = None
+    timings: Optional[Dict[str, float]] = None
\ No newline at end of file
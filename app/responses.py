@@ -0,0 +1,88 @@
+# app/responses.py
+"""
+Compact JSON bodies for the hot endpoints (/chat, /search and the NDJSON batch streams).
+
+orjson serialises the payload (several times faster than json + jsonable_encoder, and
+numpy / pandas scalars in tool results are handled), and bodies of at least
+COMPRESS_MIN_BYTES are compressed for clients that accept it: brotli when the optional
+`brotli` package is installed and the client sends `br`, otherwise gzip. Small bodies
+are sent as-is; compressing a few hundred bytes costs more CPU than it saves on the wire.
+
+    COMPRESS_MIN_BYTES   smallest body worth compressing (default 1024, 0 disables)
+    GZIP_LEVEL           gzip level (default 5)
+    BROTLI_QUALITY       brotli quality (default 4; 10-11 are far too slow per request)
+"""
+import gzip
+import os
+from typing import Any, Dict, Optional
+
+import orjson
+from fastapi import Request
+from fastapi.responses import Response
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "5"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+
+
+def _default(obj):
+    # numpy / pandas scalars, Decimal, Timestamp, ...
+    if hasattr(obj, "item"):
+        return obj.item()
+    return str(obj)
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
+
+def _accepted(accept_encoding: str) -> Dict[str, float]:
+    """Accept-Encoding as {coding: q}; codings with q=0 are refused."""
+    accepted = {}
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.strip().partition(";")
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[coding.strip()] = q
+    return accepted
+
+
+def choose_encoding(accept_encoding: str, size: int) -> Optional[str]:
+    if not COMPRESS_MIN_BYTES or size < COMPRESS_MIN_BYTES or not accept_encoding:
+        return None
+    accepted = _accepted(accept_encoding)
+    wildcard = accepted.get("*", 0.0)
+    if brotli is not None and accepted.get("br", wildcard) > 0:
+        return "br"
+    if accepted.get("gzip", wildcard) > 0:
+        return "gzip"
+    return None
+
+
+def json_response(request: Request, content: Any, status_code: int = 200,
+                  headers: Optional[Dict[str, str]] = None) -> Response:
+    """orjson-encoded response, compressed when large enough and accepted by the client."""
+    body = dumps(content)
+    headers = dict(headers or {})
+    encoding = choose_encoding(request.headers.get("accept-encoding", ""), len(body))
+    if encoding == "br":
+        body = brotli.compress(body, quality=BROTLI_QUALITY)
+    elif encoding == "gzip":
+        body = gzip.compress(body, compresslevel=GZIP_LEVEL)
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    if COMPRESS_MIN_BYTES:
+        headers["Vary"] = "Accept-Encoding"
+    return Response(body, status_code=status_code, headers=headers, media_type="application/json")
@@ -0,0 +1,203 @@
+# app/token_broker.py
+"""
+Credential broker for the voice clients (replaces app/deepgram_token.py and the Flask api.py).
+
+Tokens are cached per (provider, client, identity, room) in a bounded LRU and handed out again
+while they still have more than TOKEN_REFRESH_MARGIN of their TTL left; after that a
+fresh one is minted, so clients never receive a token about to expire. Every client
+(IP address) gets a token bucket, so reconnect storms cost a dict lookup, not a JWT
+signature, and abusive clients get 429 + Retry-After.
+
+    DEEPGRAM_TOKEN_TTL_S   default 60
+    LIVEKIT_TOKEN_TTL_S    default 3600
+    TOKEN_REFRESH_MARGIN   fraction of the TTL that must remain to reuse a token (default 0.2)
+    TOKEN_CACHE_SIZE       max cached tokens (default 1024)
+    TOKEN_RATE_PER_MIN     sustained token requests per client per minute (default 30)
+    TOKEN_RATE_BURST       burst size per client (default 10)
+"""
+import os
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Callable, Dict, Hashable, Optional, Tuple
+
+import jwt
+from fastapi import APIRouter, HTTPException, Query, Request
+
+import metrics
+
+router = APIRouter()
+
+DEEPGRAM_TTL_S = int(os.getenv("DEEPGRAM_TOKEN_TTL_S", "60"))
+LIVEKIT_TTL_S = int(os.getenv("LIVEKIT_TOKEN_TTL_S", "3600"))
+REFRESH_MARGIN = float(os.getenv("TOKEN_REFRESH_MARGIN", "0.2"))
+CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "1024"))
+RATE_PER_MIN = float(os.getenv("TOKEN_RATE_PER_MIN", "30"))
+RATE_BURST = float(os.getenv("TOKEN_RATE_BURST", "10"))
+
+
+class TokenCache:
+    """Bounded LRU of (token, expires_at) with reuse only while enough lifetime remains."""
+
+    def __init__(self, max_size: int = CACHE_SIZE, refresh_margin: float = REFRESH_MARGIN):
+        self.max_size = max_size
+        self.refresh_margin = refresh_margin
+        self._items: "OrderedDict[Hashable, Tuple[dict, float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.minted = 0
+
+    def get_or_mint(self, key: Hashable, ttl_s: int, mint: Callable[[], dict]) -> dict:
+        now = time.time()
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is not None:
+                value, issued_at, expires_at = entry
+                if expires_at - now > self.refresh_margin * (expires_at - issued_at):
+                    self._items.move_to_end(key)
+                    self.hits += 1
+                    metrics.record_cache("voice_token", True)
+                    return dict(value, expires_in=int(expires_at - now))
+        # sign outside the lock; two racing misses just mint twice
+        value = mint()
+        expires_at = now + ttl_s
+        with self._lock:
+            self._items[key] = (value, now, expires_at)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+            self.minted += 1
+        metrics.record_cache("voice_token", False)
+        return dict(value, expires_in=ttl_s)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"cached": len(self._items), "hits": self.hits, "minted": self.minted}
+
+
+class RateLimiter:
+    """Per-client token bucket; bounded like the cache (least recently seen clients are dropped)."""
+
+    def __init__(self, per_min: float = RATE_PER_MIN, burst: float = RATE_BURST, max_clients: int = 10000):
+        self.rate = per_min / 60.0
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()  # client -> [tokens, last_ts]
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    def acquire(self, client: str) -> float:
+        """0 if allowed, else seconds until the next request would be."""
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(client)
+            if bucket is None:
+                bucket = self._buckets[client] = [self.burst, now]
+                while len(self._buckets) > self.max_clients:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(client)
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return 0.0
+            self.rejected += 1
+            return (1 - bucket[0]) / self.rate
+
+
+_cache = TokenCache()
+_limiter = RateLimiter()
+
+
+def _check_rate(request: Request):
+    client = request.client.host if request.client else "unknown"
+    wait_s = _limiter.acquire(client)
+    if wait_s > 0:
+        raise HTTPException(status_code=429, detail="Too many token requests",
+                            headers={"Retry-After": str(max(1, int(wait_s + 0.999)))})
+
+
+# --------------------------------------------------
+# DEEPGRAM
+# --------------------------------------------------
+def _mint_deepgram(api_key: str) -> Callable[[], dict]:
+    def mint():
+        now = int(time.time())
+        payload = {"iat": now, "exp": now + DEEPGRAM_TTL_S, "scope": "member"}
+        return {"token": jwt.encode(payload, api_key, algorithm="HS256")}
+    return mint
+
+
+@router.get("/deepgram/token")
+def get_deepgram_token(request: Request):
+    _check_rate(request)
+    api_key = os.getenv("DEEPGRAM_API_KEY")
+    if not api_key:
+        return {"error": "Deepgram API key missing"}
+    # the token carries no identity, so one cached token serves every client
+    return _cache.get_or_mint(("deepgram",), DEEPGRAM_TTL_S, _mint_deepgram(api_key))
+
+
+# --------------------------------------------------
+# LIVEKIT
+# --------------------------------------------------
+def generate_room():
+    return "room-" + str(uuid.uuid4())[:8]  # Creates a random room name like: room-a1b2c3d4
+
+
+def _mint_livekit(api_key: str, api_secret: str, name: str, room: str) -> Callable[[], dict]:
+    def mint():
+        from livekit.api import AccessToken, VideoGrants
+        token = (
+            AccessToken(api_key, api_secret)
+            .with_identity(name)
+            .with_grants(VideoGrants(room_join=True, room=room))
+            .with_ttl(timedelta(seconds=LIVEKIT_TTL_S))
+            .to_jwt()
+        )
+        return {"token": token, "room": room, "identity": name}
+    return mint
+
+
+@router.get("/livekit/token")
+@router.get("/getToken")  # path the old Flask token server used
+def get_livekit_token(request: Request, name: str = Query("guest"), room: Optional[str] = Query(None)):
+    """
+    LiveKit access token for `name` in `room`. Without a room every call gets a new room
+    and a freshly minted token (never cached: callers sharing a display name, e.g. the
+    default "guest", must not land in one room with one identity). Tokens for an explicit
+    room are cached per client address, name and room, so reconnects reuse them.
+    """
+    _check_rate(request)
+    api_key = os.getenv("LIVEKIT_API_KEY")
+    api_secret = os.getenv("LIVEKIT_API_SECRET")
+    if not api_key or not api_secret:
+        raise HTTPException(status_code=500, detail="Missing LiveKit credentials")
+
+    if room is None:
+        metrics.record_cache("voice_token", False)
+        return dict(_mint_livekit(api_key, api_secret, name, generate_room())(), expires_in=LIVEKIT_TTL_S)
+
+    client = request.client.host if request.client else "unknown"
+    key = ("livekit", client, name, room)
+    return _cache.get_or_mint(key, LIVEKIT_TTL_S, _mint_livekit(api_key, api_secret, name, room))
+
+
+def stats() -> Dict[str, int]:
+    return dict(_cache.stats(), rate_limited=_limiter.rejected)
+
+
+@metrics.register_collector
+def _token_metrics():
+    # hits / mints are reported as ecom_cache_events_total{cache="voice_token"}
+    s = stats()
+    lines = metrics.sample_lines("ecom_voice_tokens_cached", "Voice credentials currently cached",
+                                 {(): s["cached"]})
+    lines += metrics.sample_lines("ecom_voice_token_rate_limited_total", "Token requests rejected by the per-client limit",
+                                  {(): s["rate_limited"]}, metric_type="counter")
+    return lines
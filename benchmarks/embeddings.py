@@ -0,0 +1,174 @@
+# benchmarks/embeddings.py
+"""
+Embedding backend comparison: accuracy vs latency on the catalog + FAQ corpus.
+
+Embeds every indexed document (rag_store1.load_products_csv + load_faqs_json) and a
+query set (FAQ questions, product titles, and the placeholder-free utterances of
+benchmarks/corpus.jsonl) with each backend, then reports
+
+    load_s / docs_per_s           model load time, document (index build) throughput
+    query p50 / p95 ms            single-query latency, as on the request path
+    cos_mean / cos_min            per-document cosine with the reference backend's vector
+    top1 / recall@k               query neighbours agreeing with the reference backend
+    faq_self_top1                 FAQ questions whose nearest document is their own FAQ
+
+    python -m benchmarks.embeddings                          # products.csv / faqs.json here
+    python -m benchmarks.embeddings --synthetic 2000         # synthetic catalog in a temp dir
+    python -m benchmarks.embeddings --backends hf,onnx,onnx-fp32 --threads 4 --json emb.json
+
+The first backend is the reference (default hf, the current production backend).
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from benchmarks import synthetic
+from benchmarks.replay import DEFAULT_CORPUS, REPO_DIR, load_corpus, percentile
+
+BACKENDS = ("hf", "onnx", "onnx-fp32", "hash")
+
+
+def build_backend(name: str, threads: int):
+    import rag_store1
+    if name == "hf":
+        import torch
+        torch.set_num_threads(threads)
+        return rag_store1.build_embeddings("hf")
+    if name in ("onnx", "onnx-fp32"):
+        from onnx_embeddings import OnnxEmbeddings, default_model_dir
+        return OnnxEmbeddings(rag_store1.HF_EMBEDDING_MODEL, model_dir=default_model_dir(rag_store1.HF_EMBEDDING_MODEL),
+                              quantize=name == "onnx", threads=threads)
+    if name == "hash":
+        return rag_store1.HashEmbeddings()
+    raise ValueError(f"unknown backend {name!r}; expected one of {BACKENDS}")
+
+
+def load_texts(max_queries: int, seed: int):
+    import rag_store1
+    docs = rag_store1.load_products_csv("products.csv") + rag_store1.load_faqs_json("faqs.json")
+    texts = [d.page_content for d in docs]
+    faq_rows = {d.metadata["index"]: i for i, d in enumerate(docs) if d.metadata.get("source") == "faqs"}
+    faq_queries = [(d.metadata["question"], faq_rows[d.metadata["index"]])
+                   for d in docs if d.metadata.get("source") == "faqs" and d.metadata.get("question")]
+    titles = [d.metadata["title"] for d in docs if d.metadata.get("source") == "products" and d.metadata.get("title")]
+    utterances = [item["text"] for item in load_corpus(DEFAULT_CORPUS) if "{" not in item["text"]]
+    rng = random.Random(seed)
+    rng.shuffle(titles)
+    queries = [q for q, _ in faq_queries] + utterances
+    queries += titles[:max(0, max_queries - len(queries))]
+    return texts, queries[:max_queries], faq_queries
+
+
+def top_k(doc_vectors: np.ndarray, query_vectors: np.ndarray, k: int) -> np.ndarray:
+    scores = query_vectors @ doc_vectors.T
+    return np.argsort(-scores, axis=1, kind="stable")[:, :k]
+
+
+def normalise(m: np.ndarray) -> np.ndarray:
+    return m / np.maximum(np.linalg.norm(m, axis=1, keepdims=True), 1e-12)
+
+
+def measure(name: str, texts: List[str], queries: List[str], threads: int, batch_size: int) -> Dict:
+    t0 = time.perf_counter()
+    emb = build_backend(name, threads)
+    load_s = time.perf_counter() - t0
+    emb.embed_query("warmup query")
+
+    t0 = time.perf_counter()
+    doc_vectors = []
+    for i in range(0, len(texts), batch_size):
+        doc_vectors.extend(emb.embed_documents(texts[i:i + batch_size]))
+    build_s = time.perf_counter() - t0
+
+    latencies, query_vectors = [], []
+    for q in queries:
+        t = time.perf_counter()
+        query_vectors.append(emb.embed_query(q))
+        latencies.append((time.perf_counter() - t) * 1000)
+    return {
+        "name": name,
+        "load_s": round(load_s, 3),
+        "build_s": round(build_s, 3),
+        "docs_per_s": round(len(texts) / build_s, 1) if build_s else None,
+        "query_p50_ms": round(percentile(latencies, 50), 3),
+        "query_p95_ms": round(percentile(latencies, 95), 3),
+        "docs": normalise(np.asarray(doc_vectors, dtype=np.float32)),
+        "queries": normalise(np.asarray(query_vectors, dtype=np.float32)),
+    }
+
+
+def compare(results: List[Dict], faq_queries, n_faq: int, k: int) -> List[Dict]:
+    ref = results[0]
+    ref_top = top_k(ref["docs"], ref["queries"], k)
+    rows = []
+    for r in results:
+        row = {key: r[key] for key in ("name", "load_s", "build_s", "docs_per_s", "query_p50_ms", "query_p95_ms")}
+        if r["docs"].shape == ref["docs"].shape:
+            cos = np.sum(r["docs"] * ref["docs"], axis=1)
+            row["cos_mean"] = round(float(cos.mean()), 4)
+            row["cos_min"] = round(float(cos.min()), 4)
+        else:
+            row["cos_mean"] = row["cos_min"] = None  # different embedding space
+        top = top_k(r["docs"], r["queries"], k)
+        row["top1"] = round(float(np.mean(top[:, 0] == ref_top[:, 0])), 4)
+        row[f"recall@{k}"] = round(float(np.mean([len(set(a) & set(b)) / k for a, b in zip(top, ref_top)])), 4)
+        if n_faq:
+            own = np.asarray([row_idx for _, row_idx in faq_queries[:n_faq]])
+            row["faq_self_top1"] = round(float(np.mean(top[:n_faq, 0] == own)), 4)
+        rows.append(row)
+    return rows
+
+
+def print_report(rows: List[Dict], k: int, n_docs: int, n_queries: int):
+    print(f"\n{n_docs} documents, {n_queries} queries (reference: {rows[0]['name']})\n")
+    cols = ["name", "load_s", "docs_per_s", "query_p50_ms", "query_p95_ms", "cos_mean", "cos_min",
+            "top1", f"recall@{k}", "faq_self_top1"]
+    print("".join(f"{c:>14}" for c in cols))
+    print("-" * 14 * len(cols))
+    for row in rows:
+        print("".join(f"{str(row.get(c, '-')):>14}" for c in cols))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare embedding backends: accuracy vs latency")
+    parser.add_argument("--backends", default="hf,onnx", help=f"comma list of {', '.join(BACKENDS)}; first is the reference")
+    parser.add_argument("--threads", type=int, default=min(4, os.cpu_count() or 1))
+    parser.add_argument("--batch-size", type=int, default=64, help="documents per embed_documents call")
+    parser.add_argument("--queries", type=int, default=300, help="max queries")
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--synthetic", type=int, default=0, help="use a synthetic catalog with this many products")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", default=None, help="write the report as JSON to this path")
+    args = parser.parse_args(argv)
+    if args.json:
+        args.json = os.path.abspath(args.json)
+
+    if REPO_DIR not in sys.path:
+        sys.path.insert(0, REPO_DIR)
+    if args.synthetic:
+        workdir = tempfile.mkdtemp(prefix="ecom-emb-")
+        synthetic.write_dataset(workdir, n_products=args.synthetic, seed=args.seed, repo_dir=REPO_DIR)
+        os.chdir(workdir)
+
+    texts, queries, faq_queries = load_texts(args.queries, args.seed)
+    n_faq = min(len(faq_queries), len(queries))  # FAQ questions come first in the query set
+    results = [measure(name.strip(), texts, queries, args.threads, args.batch_size)
+               for name in args.backends.split(",") if name.strip()]
+    rows = compare(results, faq_queries, n_faq, args.k)
+    print_report(rows, args.k, len(texts), len(queries))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"documents": len(texts), "queries": len(queries), "threads": args.threads,
+                       "k": args.k, "backends": rows}, f, indent=2)
+        print(f"\n[bench] wrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
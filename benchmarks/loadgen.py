@@ -0,0 +1,335 @@
+# benchmarks/loadgen.py
+"""
+Async HTTP load generator for app.main:app.
+
+By default it writes a synthetic dataset, builds the index, and starts a local uvicorn
+server with stub backends (LLM_BACKEND=fake, EMBEDDING_BACKEND=hash); pass --url to
+target a server that is already running instead.
+
+Traffic is open-loop: requests arrive as a Poisson process at each offered rate in
+--rates, independent of how fast the server answers, so queueing shows up as latency
+and errors instead of silently lowering the load. A /health probe runs alongside to
+expose event-loop blocking.
+
+    python -m benchmarks.loadgen --rates 5,10,20,40,80 --duration 20 --mix chat=0.6,search=0.3,order=0.1
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import httpx
+
+from benchmarks import synthetic
+from benchmarks.replay import DEFAULT_CORPUS, REPO_DIR, TemplateFiller, load_corpus, percentile
+
+ENDPOINTS = ("chat", "search", "order")
+SEARCH_QUERIES = [
+    "wireless headphones", "running shoes", "smart watch", "laptop bag", "backpack for travel",
+    "yoga mat", "kettle", "jacket", "phone under 20000", "sneakers",
+]
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise ValueError(f"unknown endpoint '{name}' (expected one of {ENDPOINTS})")
+        mix[name] = float(weight or 1)
+    total = sum(mix.values())
+    return {k: v / total for k, v in mix.items()}
+
+
+# --------------------------------------------------
+# LOCAL SERVER
+# --------------------------------------------------
+class LocalServer:
+    """Synthetic data + index build + uvicorn subprocess with stub backends."""
+
+    def __init__(self, args):
+        self.args = args
+        self.workdir = args.workdir or tempfile.mkdtemp(prefix="ecom-load-")
+        self.proc: Optional[subprocess.Popen] = None
+        self.data = None
+
+    def env(self) -> Dict[str, str]:
+        env = dict(os.environ)
+        env.update({
+            "LLM_BACKEND": "fake",
+            "EMBEDDING_BACKEND": "hash",
+            "FAKE_LLM_LATENCY_MS": str(self.args.llm_latency_ms),
+            "TRACING_MODE": env.get("TRACING_MODE", "off"),
+            "PYTHONPATH": REPO_DIR + os.pathsep + env.get("PYTHONPATH", ""),
+        })
+        return env
+
+    def start(self) -> str:
+        self.data = synthetic.write_dataset(
+            self.workdir, n_products=self.args.products, n_orders=self.args.orders,
+            n_returns=self.args.returns, seed=self.args.seed, repo_dir=REPO_DIR,
+        )
+        print(f"[loadgen] workdir: {self.workdir}")
+        subprocess.run(
+            [sys.executable, "-c", "import rag_store1; rag_store1.build_vectorstore()"],
+            cwd=self.workdir, env=self.env(), check=True,
+        )
+        if self.args.prefork:
+            cmd = [sys.executable, os.path.join(REPO_DIR, "serve.py"), "--port", str(self.args.port),
+                   "--workers", str(self.args.workers), "--memory-report-s", "0"]
+        else:
+            cmd = [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1",
+                   "--port", str(self.args.port), "--log-level", "warning",
+                   "--workers", str(self.args.workers)]
+        self.proc = subprocess.Popen(cmd, cwd=self.workdir, env=self.env())
+        return f"http://127.0.0.1:{self.args.port}"
+
+    def stop(self):
+        if self.proc and self.proc.poll() is None:
+            self.proc.terminate()
+            try:
+                self.proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+
+
+async def wait_until_up(client: httpx.AsyncClient, timeout_s: float = 120.0):
+    deadline = time.monotonic() + timeout_s
+    while time.monotonic() < deadline:
+        try:
+            r = await client.get("/ready")
+            if r.status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(0.5)
+    raise RuntimeError("server did not become ready in time")
+
+
+# --------------------------------------------------
+# LOAD
+# --------------------------------------------------
+class StepResult:
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.status: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self.client_dropped = 0
+        self.probe_ms: List[float] = []
+        self.sent = 0
+        self.completed = 0
+        self.duration_s = 0.0
+
+    def summary(self) -> dict:
+        out = {
+            "offered_rps": self.rate,
+            "achieved_rps": round(self.completed / self.duration_s, 2) if self.duration_s else 0.0,
+            "sent": self.sent,
+            "client_dropped": self.client_dropped,
+            "health_probe_p99_ms": round(percentile(self.probe_ms, 99), 2),
+            "endpoints": {},
+        }
+        all_lat, errors, total = [], 0, 0
+        for ep in sorted(set(self.latencies) | set(self.status)):
+            lat = self.latencies[ep]
+            counts = dict(self.status[ep])
+            n = sum(counts.values())
+            ep_errors = sum(c for s, c in counts.items() if not s.startswith("2"))
+            all_lat.extend(lat)
+            errors += ep_errors
+            total += n
+            out["endpoints"][ep] = {
+                "n": n,
+                "p50_ms": round(percentile(lat, 50), 2),
+                "p95_ms": round(percentile(lat, 95), 2),
+                "p99_ms": round(percentile(lat, 99), 2),
+                "error_rate": round(ep_errors / n, 4) if n else 0.0,
+                "status": counts,
+            }
+        out["p50_ms"] = round(percentile(all_lat, 50), 2)
+        out["p99_ms"] = round(percentile(all_lat, 99), 2)
+        out["error_rate"] = round(errors / total, 4) if total else 0.0
+        return out
+
+
+class LoadGenerator:
+    def __init__(self, client: httpx.AsyncClient, mix: Dict[str, float], filler: TemplateFiller,
+                 corpus: List[Dict], order_ids: List[str], sessions: int, max_inflight: int, rng: random.Random):
+        self.client = client
+        self.mix = mix
+        self.filler = filler
+        self.corpus = [c for c in corpus if c["text"].strip()]
+        self.order_ids = order_ids
+        self.sessions = [f"load-{i}" for i in range(max(1, sessions))]
+        self.max_inflight = max_inflight
+        self.rng = rng
+        self.inflight = 0
+
+    def _pick(self) -> str:
+        r, acc = self.rng.random(), 0.0
+        for name, w in self.mix.items():
+            acc += w
+            if r <= acc:
+                return name
+        return next(iter(self.mix))
+
+    async def _one(self, endpoint: str, result: StepResult):
+        start = time.perf_counter()
+        try:
+            if endpoint == "chat":
+                item = self.rng.choice(self.corpus)
+                body = {
+                    "text": self.filler.fill(item["text"]),
+                    "session_id": self.rng.choice(self.sessions),
+                    "channel": self.rng.choice(["text", "text", "voice"]),
+                }
+                r = await self.client.post("/chat", json=body)
+            elif endpoint == "search":
+                r = await self.client.get("/search", params={"q": self.rng.choice(SEARCH_QUERIES), "k": 5})
+            else:
+                r = await self.client.get(f"/orders/{self.rng.choice(self.order_ids)}")
+            status = str(r.status_code)
+        except httpx.TimeoutException:
+            status = "timeout"
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+        finally:
+            self.inflight -= 1
+        result.latencies[endpoint].append((time.perf_counter() - start) * 1000)
+        result.status[endpoint][status] += 1
+        result.completed += 1
+
+    async def _probe(self, result: StepResult, stop: asyncio.Event):
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                await self.client.get("/health")
+                result.probe_ms.append((time.perf_counter() - start) * 1000)
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.1)
+
+    async def run_step(self, rate: float, duration_s: float) -> StepResult:
+        result = StepResult(rate)
+        stop = asyncio.Event()
+        probe = asyncio.create_task(self._probe(result, stop))
+        tasks = []
+        start = time.perf_counter()
+        next_at = start
+        while True:
+            next_at += self.rng.expovariate(rate)
+            if next_at - start >= duration_s:
+                break
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if self.inflight >= self.max_inflight:
+                result.client_dropped += 1
+                continue
+            self.inflight += 1
+            result.sent += 1
+            tasks.append(asyncio.create_task(self._one(self._pick(), result)))
+        if tasks:
+            await asyncio.gather(*tasks)
+        result.duration_s = time.perf_counter() - start
+        stop.set()
+        await probe
+        return result
+
+
+def find_knee(steps: List[dict], latency_factor: float = 3.0, min_efficiency: float = 0.9) -> Optional[float]:
+    """First offered rate where p99 blows past `latency_factor` x the lightest step, or throughput stops tracking load."""
+    if not steps:
+        return None
+    base_p99 = max(steps[0]["p99_ms"], 1.0)
+    for s in steps:
+        if s["p99_ms"] > latency_factor * base_p99 or s["achieved_rps"] < min_efficiency * s["offered_rps"] \
+                or s["error_rate"] > 0.01:
+            return s["offered_rps"]
+    return None
+
+
+def print_report(steps: List[dict], knee: Optional[float]):
+    header = f"{'offered':>8}{'achieved':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}{'dropped':>9}{'probe p99':>11}"
+    print()
+    print(header)
+    print("-" * len(header))
+    for s in steps:
+        print(f"{s['offered_rps']:>8}{s['achieved_rps']:>10}{s['p50_ms']:>10}{s['p99_ms']:>10}"
+              f"{s['error_rate']:>8.2%}{s['client_dropped']:>9}{s['health_probe_p99_ms']:>11}")
+    print()
+    print(f"knee of the throughput curve: {knee if knee is not None else 'not reached'} req/s")
+
+
+async def main_async(args) -> dict:
+    server = None
+    rng = random.Random(args.seed)
+    if args.url:
+        base_url = args.url.rstrip("/")
+        data = synthetic.write_dataset(tempfile.mkdtemp(prefix="ecom-load-"), n_products=args.products,
+                                       n_orders=args.orders, n_returns=args.returns, seed=args.seed)
+    else:
+        server = LocalServer(args)
+        base_url = server.start()
+        data = server.data
+
+    limits = httpx.Limits(max_connections=args.max_inflight, max_keepalive_connections=args.max_inflight)
+    try:
+        async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+            await wait_until_up(client)
+            gen = LoadGenerator(
+                client, parse_mix(args.mix), TemplateFiller(data, rng), load_corpus(args.corpus),
+                [o["order_id"] for o in data["orders"]], args.sessions, args.max_inflight, rng,
+            )
+            steps = []
+            for rate in [float(r) for r in args.rates.split(",")]:
+                print(f"[loadgen] {rate} req/s for {args.duration}s ...")
+                steps.append((await gen.run_step(rate, args.duration)).summary())
+    finally:
+        if server:
+            server.stop()
+
+    knee = find_knee(steps)
+    print_report(steps, knee)
+    return {"base_url": base_url, "mix": args.mix, "steps": steps, "knee_rps": knee}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Open-loop HTTP load generator for app.main:app")
+    parser.add_argument("--url", default=None, help="target an already running server instead of starting one")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for the local server")
+    parser.add_argument("--prefork", action="store_true", help="start the local server with serve.py (shared model/index)")
+    parser.add_argument("--rates", default="2,5,10,20,40", help="comma-separated offered rates (req/s)")
+    parser.add_argument("--duration", type=float, default=15.0, help="seconds per rate step")
+    parser.add_argument("--mix", default="chat=0.6,search=0.3,order=0.1")
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--max-inflight", type=int, default=256)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS)
+    parser.add_argument("--products", type=int, default=500)
+    parser.add_argument("--orders", type=int, default=300)
+    parser.add_argument("--returns", type=int, default=100)
+    parser.add_argument("--llm-latency-ms", type=float, default=300.0, help="simulated fake LLM latency")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--workdir", default=None)
+    parser.add_argument("--json", default=None, help="write the report as JSON to this path")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(main_async(args))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"[loadgen] wrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+# benchmarks/replay.py
+"""
+Offline replay benchmark for EcommerceLLM.process.
+
+Replays benchmarks/corpus.jsonl (one utterance per intent branch, with {placeholders}
+filled from the synthetic data) against the deterministic fake LLM and hash-based
+embeddings over a synthetic catalog, so no network, API key or model download is needed.
+
+    python -m benchmarks.replay --products 2000 --orders 1000 --iterations 20
+    python -m benchmarks.replay --memory --json bench.json
+
+Reports p50/p95/p99 latency, throughput and per-request allocation peak per routed intent.
+"""
+import argparse
+import json
+import math
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+from typing import Dict, List
+
+from benchmarks import synthetic
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_CORPUS = os.path.join(REPO_DIR, "benchmarks", "corpus.jsonl")
+
+
+def percentile(values: List[float], p: float) -> float:
+    """Nearest-rank percentile (p in 0..100)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = max(0, min(len(ordered) - 1, math.ceil(p / 100.0 * len(ordered)) - 1))
+    return ordered[idx]
+
+
+def load_corpus(path: str) -> List[Dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+class TemplateFiller:
+    """Fills {order_id}, {delivered_order}, {product}, {brand}, {category} from the synthetic dataset."""
+
+    def __init__(self, data: Dict, rng: random.Random):
+        self.rng = rng
+        self.products = data["products"]
+        self.orders = data["orders"]
+        returned = {r["order_id"] for r in data["returns"]}
+        self.delivered = [o for o in self.orders if o["status"] == "Delivered" and o["order_id"] not in returned]
+
+    def fill(self, text: str) -> str:
+        product = self.rng.choice(self.products)
+        values = {
+            "order_id": self.rng.choice(self.orders)["order_id"],
+            "delivered_order": self.rng.choice(self.delivered or self.orders)["order_id"],
+            "product": product["title"],
+            "brand": product["brand"],
+            "category": json.loads(product["categories"])[-1].lower(),
+        }
+        return text.format(**values)
+
+
+def setup_environment(args) -> Dict:
+    workdir = args.workdir or tempfile.mkdtemp(prefix="ecom-bench-")
+    data = synthetic.write_dataset(
+        workdir, n_products=args.products, n_orders=args.orders, n_returns=args.returns,
+        seed=args.seed, repo_dir=REPO_DIR,
+    )
+    # backends are chosen at import time, so set them before importing the app modules
+    os.environ["LLM_BACKEND"] = "fake"
+    os.environ["EMBEDDING_BACKEND"] = args.embeddings
+    os.environ["FAKE_LLM_LATENCY_MS"] = str(args.llm_latency_ms)
+    os.environ.setdefault("TRACING_MODE", "off")
+    if REPO_DIR not in sys.path:
+        sys.path.insert(0, REPO_DIR)
+    # orders.py / returns.py / Bot_prompt.txt use paths relative to the working directory
+    os.chdir(workdir)
+    print(f"[bench] workdir: {workdir}")
+    return data
+
+
+def run(args) -> Dict:
+    data = setup_environment(args)
+
+    import rag_store1
+    t0 = time.perf_counter()
+    rag_store1.build_vectorstore()
+    index_build_s = time.perf_counter() - t0
+
+    from ecommerce_llm import EcommerceLLM
+    t0 = time.perf_counter()
+    llm = EcommerceLLM()
+    init_s = time.perf_counter() - t0
+
+    rng = random.Random(args.seed)
+    filler = TemplateFiller(data, rng)
+    corpus = load_corpus(args.corpus)
+
+    for _ in range(args.warmup):
+        for item in corpus:
+            llm.process(filler.fill(item["text"]))
+
+    latencies = defaultdict(list)
+    mismatches = defaultdict(int)
+    started = time.perf_counter()
+    total = 0
+    for _ in range(args.iterations):
+        items = list(corpus)
+        rng.shuffle(items)
+        for item in items:
+            text = filler.fill(item["text"])
+            t = time.perf_counter()
+            llm.process(text)
+            latencies[llm.last_intent].append((time.perf_counter() - t) * 1000)
+            if llm.last_intent != item["intent"]:
+                mismatches[f"{item['intent']} -> {llm.last_intent}"] += 1
+            total += 1
+    wall_s = time.perf_counter() - started
+
+    alloc_peaks = defaultdict(list)
+    if args.memory:
+        # separate pass: tracemalloc slows Python down, so it must not skew the latency numbers
+        tracemalloc.start()
+        for item in corpus:
+            text = filler.fill(item["text"])
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+            llm.process(text)
+            alloc_peaks[llm.last_intent].append((tracemalloc.get_traced_memory()[1] - base) / 1024)
+        tracemalloc.stop()
+
+    per_intent = {}
+    for intent, values in sorted(latencies.items()):
+        busy_s = sum(values) / 1000
+        per_intent[intent] = {
+            "n": len(values),
+            "p50_ms": round(percentile(values, 50), 3),
+            "p95_ms": round(percentile(values, 95), 3),
+            "p99_ms": round(percentile(values, 99), 3),
+            "mean_ms": round(sum(values) / len(values), 3),
+            "throughput_rps": round(len(values) / busy_s, 1) if busy_s else None,
+            "alloc_peak_kb": round(percentile(alloc_peaks[intent], 50), 1) if alloc_peaks.get(intent) else None,
+        }
+
+    all_values = [v for values in latencies.values() for v in values]
+    return {
+        "config": {
+            "products": args.products, "orders": args.orders, "returns": args.returns,
+            "iterations": args.iterations, "embeddings": args.embeddings,
+            "llm_latency_ms": args.llm_latency_ms, "seed": args.seed,
+        },
+        "index_build_s": round(index_build_s, 3),
+        "init_s": round(init_s, 3),
+        "requests": total,
+        "wall_s": round(wall_s, 3),
+        "throughput_rps": round(total / wall_s, 1) if wall_s else None,
+        "overall": {
+            "p50_ms": round(percentile(all_values, 50), 3),
+            "p95_ms": round(percentile(all_values, 95), 3),
+            "p99_ms": round(percentile(all_values, 99), 3),
+        },
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "per_intent": per_intent,
+        "intent_mismatches": dict(mismatches),
+    }
+
+
+def print_report(report: Dict):
+    print()
+    print(f"requests={report['requests']}  wall={report['wall_s']}s  throughput={report['throughput_rps']} req/s  "
+          f"index_build={report['index_build_s']}s  init={report['init_s']}s  max_rss={report['max_rss_mb']}MB")
+    o = report["overall"]
+    print(f"overall p50={o['p50_ms']}ms p95={o['p95_ms']}ms p99={o['p99_ms']}ms")
+    print()
+    header = f"{'intent':<16}{'n':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'mean ms':>10}{'req/s':>10}{'alloc KB':>10}"
+    print(header)
+    print("-" * len(header))
+    for intent, r in report["per_intent"].items():
+        alloc = "-" if r["alloc_peak_kb"] is None else r["alloc_peak_kb"]
+        print(f"{intent:<16}{r['n']:>6}{r['p50_ms']:>10}{r['p95_ms']:>10}{r['p99_ms']:>10}"
+              f"{r['mean_ms']:>10}{str(r['throughput_rps']):>10}{str(alloc):>10}")
+    if report["intent_mismatches"]:
+        print()
+        print("routing mismatches (expected -> routed):")
+        for k, n in sorted(report["intent_mismatches"].items()):
+            print(f"  {k}: {n}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline replay benchmark for EcommerceLLM.process")
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS)
+    parser.add_argument("--products", type=int, default=500)
+    parser.add_argument("--orders", type=int, default=300)
+    parser.add_argument("--returns", type=int, default=100)
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--embeddings", default="hash", help="hash (offline) or hf")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="simulated fake LLM latency")
+    parser.add_argument("--memory", action="store_true", help="also measure per-request allocation peaks")
+    parser.add_argument("--workdir", default=None, help="where to write synthetic data (default: temp dir)")
+    parser.add_argument("--json", default=None, help="write the report as JSON to this path")
+    args = parser.parse_args(argv)
+    if args.json:
+        args.json = os.path.abspath(args.json)
+
+    report = run(args)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n[bench] wrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
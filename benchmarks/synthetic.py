@@ -0,0 +1,196 @@
+# benchmarks/synthetic.py
+"""
+Synthetic catalog / FAQ / orders / returns generator for offline benchmarks.
+Column layouts match what rag_store1, orders.py and returns.py read in production.
+"""
+import ast
+import csv
+import json
+import os
+import random
+import shutil
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+CATEGORIES = [
+    ["Electronics", "Headphones"],
+    ["Electronics", "Mobiles"],
+    ["Electronics", "Laptops"],
+    ["Fashion", "Shoes"],
+    ["Fashion", "Watches"],
+    ["Fashion", "Jackets"],
+    ["Bags", "Backpacks"],
+    ["Home", "Kitchen"],
+    ["Sports", "Fitness"],
+    ["Books", "Fiction"],
+]
+BRANDS = ["Sonix", "Boltra", "Kalpa", "Zenvo", "Auric", "Nimbus", "Trekka", "Veloce", "Orbit", "Lumo"]
+ADJECTIVES = ["Wireless", "Classic", "Pro", "Ultra", "Lite", "Sport", "Premium", "Compact", "Smart", "Everyday"]
+NOUNS = {
+    "Headphones": ["Headphones", "Earbuds", "Headset"],
+    "Mobiles": ["Phone", "Smartphone"],
+    "Laptops": ["Laptop", "Workstation"],
+    "Shoes": ["Running Shoes", "Sneakers", "Loafers"],
+    "Watches": ["Analog Watch", "Smart Watch", "Chronograph"],
+    "Jackets": ["Jacket", "Windcheater", "Parka"],
+    "Backpacks": ["Backpack", "Laptop Bag", "Daypack"],
+    "Kitchen": ["Blender", "Kettle", "Pan Set"],
+    "Fitness": ["Yoga Mat", "Dumbbell Set", "Skipping Rope"],
+    "Fiction": ["Novel", "Paperback"],
+}
+ORDER_STATUSES = ["Placed", "Shipped", "Out for delivery", "Delivered", "Delivered", "Returned"]
+RETURN_REASONS = ["Wrong item", "Damaged", "Size issue", "Not as described", "Changed mind", ""]
+
+PRODUCT_FIELDS = [
+    "title", "brand", "description", "initial_price", "final_price", "currency", "availability",
+    "reviews_count", "categories", "buybox_seller", "number_of_sellers", "domain", "url", "rating",
+    "seller_id", "model_number", "manufacturer", "department", "delivery",
+]
+ORDER_FIELDS = [
+    "order_id", "user_email", "user_name", "items", "total_amount", "currency", "status",
+    "placed_date", "estimated_delivery",
+]
+RETURN_FIELDS = [
+    "order_id", "product_id", "User_ID", "Order_Date", "Return_Date", "Product_Category", "Product_Price",
+    "Order_Quantity", "Return_Reason", "Return_Status", "Days_to_Return", "User_Age", "User_Gender",
+    "User_Location", "Payment_Method", "Shipping_Method", "Discount_Applied",
+]
+
+DEFAULT_FAQS = [
+    ("What is your return policy?", "You can return most items within 30 days of delivery for a full refund."),
+    ("How can I track my order?", "Log in and open Order History to see tracking details for each shipment."),
+    ("What payment methods do you accept?", "We accept credit cards, debit cards, UPI and net banking."),
+    ("How long does delivery take?", "Standard delivery takes 3-7 business days; express takes 1-2 days."),
+    ("How do I contact customer support?", "Reach support by chat or email at support@example.com, 9am-9pm."),
+    ("How can I create an account?", "Click Sign Up at the top right and follow the registration steps."),
+    ("When will I get my refund?", "Refunds are issued to the original payment method within 5-7 days of pickup."),
+    ("Can I change my delivery address?", "You can change the address before the order ships from Order History."),
+]
+
+
+def generate_products(n: int, rng: random.Random) -> List[Dict]:
+    rows = []
+    for i in range(n):
+        cats = rng.choice(CATEGORIES)
+        brand = rng.choice(BRANDS)
+        title = f"{brand} {rng.choice(ADJECTIVES)} {rng.choice(NOUNS[cats[1]])} {100 + i % 900}"
+        initial = round(rng.uniform(299, 89999), 2)
+        final = round(initial * rng.uniform(0.6, 1.0), 2)
+        rows.append({
+            "title": title,
+            "brand": brand,
+            "description": f"{title} from {brand}. Great for everyday use in the {cats[1].lower()} range.",
+            "initial_price": initial,
+            "final_price": final,
+            "currency": "INR",
+            "availability": rng.choice(["In Stock", "In Stock", "Only 3 left", "Out of Stock"]),
+            "reviews_count": rng.randint(0, 25000),
+            "categories": json.dumps(cats),
+            "buybox_seller": f"Seller{rng.randint(1, 200)}",
+            "number_of_sellers": rng.randint(1, 8),
+            "domain": "shop.example.com",
+            "url": f"https://shop.example.com/p/MDL{i:06d}",
+            "rating": round(rng.uniform(2.5, 5.0), 1),
+            "seller_id": f"S{rng.randint(1000, 9999)}",
+            "model_number": f"MDL{i:06d}",
+            "manufacturer": brand,
+            "department": cats[0],
+            "delivery": rng.choice(["FREE delivery in 2 days", "FREE delivery in 5 days", "Express delivery"]),
+        })
+    return rows
+
+
+def generate_orders(n: int, products: List[Dict], rng: random.Random) -> List[Dict]:
+    rows = []
+    today = datetime.today()
+    for i in range(n):
+        picks = rng.sample(products, k=min(len(products), rng.randint(1, 3)))
+        items = [{"prod_id": p["model_number"], "qty": rng.randint(1, 3)} for p in picks]
+        total = sum(p["final_price"] * it["qty"] for p, it in zip(picks, items))
+        placed = today - timedelta(days=rng.randint(1, 400))
+        rows.append({
+            "order_id": f"ORD{10001 + i}",
+            "user_email": f"user{i + 1}@example.com",
+            "user_name": f"User {i + 1}",
+            "items": str(items),
+            "total_amount": round(total, 2),
+            "currency": "INR",
+            "status": rng.choice(ORDER_STATUSES),
+            "placed_date": placed.strftime("%d-%m-%Y"),
+            "estimated_delivery": (placed + timedelta(days=rng.randint(2, 9))).strftime("%d-%m-%Y"),
+        })
+    return rows
+
+
+def generate_returns(n: int, orders: List[Dict], products: List[Dict], rng: random.Random) -> List[Dict]:
+    rows = []
+    by_id = {p["model_number"]: p for p in products}
+    # only a prefix of orders gets return rows, so the rest stay eligible for new returns
+    for o in orders[:n]:
+        item = ast.literal_eval(o["items"])[0]
+        product = by_id[item["prod_id"]]
+        returned = rng.random() < 0.4
+        placed = datetime.strptime(o["placed_date"], "%d-%m-%Y")
+        days = rng.randint(1, 30)
+        rows.append({
+            "order_id": o["order_id"],
+            "product_id": item["prod_id"],
+            "User_ID": o["user_email"],
+            "Order_Date": o["placed_date"],
+            "Return_Date": (placed + timedelta(days=days)).strftime("%d-%m-%Y") if returned else "",
+            "Product_Category": json.loads(product["categories"])[1],
+            "Product_Price": product["final_price"],
+            "Order_Quantity": item["qty"],
+            "Return_Reason": rng.choice(RETURN_REASONS[:-1]) if returned else "",
+            "Return_Status": "Returned" if returned else "Not Returned",
+            "Days_to_Return": days if returned else "",
+            "User_Age": rng.randint(18, 70),
+            "User_Gender": rng.choice(["Male", "Female"]),
+            "User_Location": f"City{rng.randint(1, 100)}",
+            "Payment_Method": rng.choice(["Credit Card", "Debit Card", "PayPal", "Gift Card"]),
+            "Shipping_Method": rng.choice(["Standard", "Express", "Next-Day"]),
+            "Discount_Applied": round(rng.uniform(0, 50), 2),
+        })
+    return rows
+
+
+def _write_csv(path: str, fields: List[str], rows: List[Dict]):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def write_dataset(workdir: str, n_products: int = 500, n_orders: int = 300, n_returns: int = 100,
+                  seed: int = 7, repo_dir: str = None) -> Dict[str, List[Dict]]:
+    """
+    Write products.csv, faqs.json, orders.csv, returns.csv and Bot_prompt.txt into `workdir`.
+    Uses the repo's own faqs.json / Bot_prompt.txt when `repo_dir` has them.
+    Returns the generated rows so callers can fill utterance templates.
+    """
+    rng = random.Random(seed)
+    os.makedirs(workdir, exist_ok=True)
+
+    products = generate_products(n_products, rng)
+    orders = generate_orders(n_orders, products, rng)
+    returns = generate_returns(min(n_returns, n_orders), orders, products, rng)
+
+    _write_csv(os.path.join(workdir, "products.csv"), PRODUCT_FIELDS, products)
+    _write_csv(os.path.join(workdir, "orders.csv"), ORDER_FIELDS, orders)
+    _write_csv(os.path.join(workdir, "returns.csv"), RETURN_FIELDS, returns)
+
+    repo_faqs = os.path.join(repo_dir or "", "faqs.json")
+    if repo_dir and os.path.exists(repo_faqs):
+        shutil.copy(repo_faqs, os.path.join(workdir, "faqs.json"))
+    else:
+        with open(os.path.join(workdir, "faqs.json"), "w", encoding="utf-8") as f:
+            json.dump({"questions": [{"question": q, "answer": a} for q, a in DEFAULT_FAQS]}, f, indent=2)
+
+    repo_prompt = os.path.join(repo_dir or "", "Bot_prompt.txt")
+    if repo_dir and os.path.exists(repo_prompt):
+        shutil.copy(repo_prompt, os.path.join(workdir, "Bot_prompt.txt"))
+    else:
+        with open(os.path.join(workdir, "Bot_prompt.txt"), "w", encoding="utf-8") as f:
+            f.write("You are an ecommerce customer support assistant. Keep replies short.")
+
+    return {"products": products, "orders": orders, "returns": returns}
@@ -0,0 +1,168 @@
+# catalog_watcher.py
+"""
+Hot reload of the product catalog / FAQ index.
+
+A background thread polls products.csv and faqs.json (mtime + size). When they change
+and have stopped changing for one poll interval, it builds the next index generation
+(rag_store1.build_generation: unchanged documents keep their vectors, so only edited
+rows are re-embedded) and swaps it in with rag_store1.activate_generation. Requests
+already running finish on the old generation; new ones see the new one.
+
+With several worker processes only one of them builds (non-blocking file lock); the
+others notice the new GENERATIONS_DIR/CURRENT and activate the same generation. Each
+worker records the generation it serves under GENERATIONS_DIR/workers, and an old
+generation's directory is only deleted once no live worker serves it and no request in
+this process still holds its store (checked again on every poll).
+
+    CATALOG_WATCH_S   poll interval in seconds (default 10, 0 disables the watcher)
+"""
+import os
+import time
+import threading
+from typing import List, Optional
+
+import metrics
+import rag_store1
+
+try:
+    import fcntl
+except ImportError:  # non-POSIX: single-process only
+    fcntl = None
+
+POLL_INTERVAL_S = float(os.getenv("CATALOG_WATCH_S", "10"))
+DEFAULT_SOURCES = ["products.csv", "faqs.json"]
+
+
+class CatalogWatcher:
+    def __init__(self, sources: Optional[List[str]] = None, interval_s: float = POLL_INTERVAL_S):
+        self.sources = list(sources or DEFAULT_SOURCES)
+        self.interval_s = interval_s
+        gen = rag_store1.active_generation()
+        # a generation records what it was built from; generation 0 is assumed current
+        self._built_from = {p: list(v) for p, v in gen.sources.items()} or rag_store1.source_signature(self.sources)
+        self._pending = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.reloads = 0
+        self.failures = 0
+        self.last_build_s = None
+        self.last_error = None
+
+    def start(self) -> "CatalogWatcher":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="catalog-watcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval_s):
+            try:
+                self.check_once()
+            except Exception as e:
+                self.failures += 1
+                self.last_error = f"{type(e).__name__}: {e}"
+                print(f"[catalog] reload failed: {e}")
+
+    def check_once(self) -> bool:
+        """One poll; returns True if a new generation was activated."""
+        # generations retired while still being read are deleted once nobody uses them
+        rag_store1.collect_generations()
+        # another worker already published a newer generation: follow it
+        published = rag_store1.published_generation()
+        if published > rag_store1.active_generation().number:
+            gen = rag_store1.IndexGeneration.load(published)
+            rag_store1.activate_generation(gen, publish=False)
+            self._built_from = {p: list(v) for p, v in gen.sources.items()}
+            self.reloads += 1
+            return True
+
+        current = rag_store1.source_signature(self.sources)
+        if current == self._built_from:
+            self._pending = None
+            return False
+        if current != self._pending:
+            # changed since the last poll: wait until the writer is done
+            self._pending = current
+            return False
+
+        with _build_lock() as acquired:
+            if not acquired:
+                return False
+            t0 = time.perf_counter()
+            gen = rag_store1.build_generation(*self.sources)
+            rag_store1.activate_generation(gen)
+            self.last_build_s = round(time.perf_counter() - t0, 3)
+        self._built_from = current
+        self._pending = None
+        self.reloads += 1
+        self.last_error = None
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "generation": rag_store1.active_generation().number,
+            "sources": self.sources,
+            "interval_s": self.interval_s,
+            "reloads": self.reloads,
+            "failures": self.failures,
+            "last_build_s": self.last_build_s,
+            "last_error": self.last_error,
+            "pending_change": self._pending is not None,
+        }
+
+
+class _build_lock:
+    """Non-blocking cross-process lock on GENERATIONS_DIR/.build.lock (always acquired without fcntl)."""
+
+    def __enter__(self) -> bool:
+        self._f = None
+        if fcntl is None:
+            return True
+        os.makedirs(rag_store1.GENERATIONS_DIR, exist_ok=True)
+        self._f = open(os.path.join(rag_store1.GENERATIONS_DIR, ".build.lock"), "w")
+        try:
+            fcntl.flock(self._f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except OSError:
+            self._f.close()
+            self._f = None
+            return False
+
+    def __exit__(self, *exc):
+        if self._f is not None:
+            fcntl.flock(self._f, fcntl.LOCK_UN)
+            self._f.close()
+
+
+_watcher: Optional[CatalogWatcher] = None
+_watcher_pid = None
+
+
+def start(sources: Optional[List[str]] = None, interval_s: float = POLL_INTERVAL_S) -> Optional[CatalogWatcher]:
+    global _watcher, _watcher_pid
+    if interval_s <= 0:
+        return None
+    # a watcher inherited through fork() has no thread in this process
+    if _watcher is None or _watcher_pid != os.getpid():
+        _watcher = CatalogWatcher(sources, interval_s).start()
+        _watcher_pid = os.getpid()
+    return _watcher
+
+
+def stats() -> Optional[dict]:
+    return _watcher.stats() if _watcher else None
+
+
+@metrics.register_collector
+def _catalog_metrics():
+    lines = metrics.sample_lines("ecom_index_generation", "Active vector index generation",
+                                 {(): rag_store1.active_generation().number} if _watcher else {})
+    if _watcher:
+        lines += metrics.sample_lines(
+            "ecom_catalog_reloads_total", "Catalog index reloads by result",
+            {(("result", "ok"),): _watcher.reloads, (("result", "failed"),): _watcher.failures},
+            metric_type="counter")
+    return lines
@@ -2,12 +2,17 @@
 from dotenv import load_dotenv
 load_dotenv()
 import os
+import copy
 import time
 import re
-from typing import Optional
+import threading
+from collections import OrderedDict
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterator, List, Optional
 from xml.sax.saxutils import escape as xml_escape
-from langsmith import traceable
-from langchain.memory import ConversationBufferWindowMemory
+import tracing
+from langchain.memory import ConversationBufferWindowMemory, ConversationSummaryBufferMemory
 from langchain.prompts import (
     ChatPromptTemplate,
     SystemMessagePromptTemplate,
@@ -15,11 +20,19 @@ from langchain.prompts import (
     HumanMessagePromptTemplate,
 )
 from langchain.chains import LLMChain
-from langchain_groq import ChatGroq
-from rag_store1 import get_retriever
+from llm_gateway import LLMGateway, GatewayError, build_chat_model
+import singleflight
+import metrics
+from rag_store1 import (get_retriever, retrieve_documents, embed_queries, use_query_vectors, precomputed_vector,
+                        active_generation)
+from admission import priority_scope
 from orders import get_order_status, create_order
+from product_catalog import get_catalog
+from faq_index import get_faq_index
 from tools import search_products
 from returns import get_return_by_order, create_return_request
+from planner import Speculator, get_planner
+from fast_responder import FastResponder
 
 SYSTEM_PROMPT_FILE = "Bot_prompt.txt"
 PLACE_ORDER_KEYWORDS = [
@@ -39,12 +52,10 @@ RETURN_KEYWORDS = [
     "return", "refund", "send back","return order",
      "want to return","how to return","refund my order"
     ]
-SMALL_TALK_KEYWORDS = [
-    "hi", "hello", "hey", "hiii",
-    "thank you", "thanks", "ok thanks",
-    "ok", "okay","hi can you help me","hey are you there","thank you so much",
-    "can you help", "help me",
-    "good morning", "good evening","goodbye"
+ORDER_TRACKING_KEYWORDS = [
+    "track order", "order status", "where is my order", "track my order",
+    "order update", "order id", "order #", "order details", "order info",
+    "order information", "tell me about order", "details of order"
 ]
 FAQ_KEYWORDS = [
     "how can i", "how do i", "what is", "policy",
@@ -54,6 +65,32 @@ FAQ_KEYWORDS = [
     "account", "login"
 ]
 
+# Upper bound on retrieved context injected per turn (characters)
+MAX_CONTEXT_CHARS = 6000
+
+# Upper bound on parallel pipelines for process_batch
+MAX_BATCH_CONCURRENCY = 16
+
+# Shards searched per intent (rag_store1.route_shards); unlisted intents search every shard.
+# Generic "faq" questions stay unrestricted: they include product reviews / ratings.
+RETRIEVAL_SOURCES = {"return_policy": "faqs"}
+
+# Sessions whose last partial transcript is remembered for stability checks
+MAX_TRACKED_PARTIALS = 10000
+
+# Served when the LLM gateway is failing or its circuit breaker is open
+DEGRADED_REPLIES = {
+    "small_talk": "Hello 😊 I can help with products, orders, and returns.",
+    # states no policy: the stored FAQ answer is served instead whenever one was retrieved
+    "return_policy": (
+        "I'm having trouble answering right now. Please try again shortly, or share your "
+        "order ID and reason to start a return."
+    ),
+    "products": "I'm having trouble answering right now. Here are some matching products: {products}",
+    "no_products": "I'm having trouble answering right now. Please try your search again shortly.",
+    "faq": "I'm having trouble answering right now. Please check our help center.",
+}
+
 # Order extraction regexes
 ORDER_STRICT = re.compile(r"\bORD\d+\b", flags=re.IGNORECASE)    # matches ORD10009
 ORDER_LOOSE = re.compile(r"(?:order\s*(?:#|id)?\s*[:#]?\s*)([A-Za-z0-9\-_]+)", flags=re.IGNORECASE)
@@ -121,16 +158,19 @@ def text_to_ssml(text: str, lang: str = "en-US", break_ms: int = 350) -> str:
     return ssml
 
 class EcommerceLLM:
-    def __init__(self, model_name: str = "llama-3.1-8b-instant", temperature: float = 0.0, retriever_k: int = 4):
-        groq_key = os.getenv("GROQ_API_KEY")
-        if not groq_key:
-            raise ValueError("GROQ_API_KEY missing in environment")
+    def __init__(self, model_name: str = "llama-3.1-8b-instant", temperature: float = 0.0, retriever_k: int = 4,
+                 history_turns: int = 2, summarize_history: bool = False, summary_token_limit: int = 400):
+        # Gateway owns deadlines / retries / hedging / circuit breaking for every LLM call
+        self.gateway = LLMGateway.from_env()
 
-        # LLM
-        self.llm = ChatGroq(temperature=temperature, model_name=model_name, groq_api_key=groq_key)
+        # LLM (ChatGroq, or the deterministic fake when LLM_BACKEND=fake)
+        self.llm = build_chat_model(model_name, temperature, timeout_s=self.gateway.timeout_s)
 
-        # Memory for conversation (keeps short term chat history)
-        self.memory = ConversationBufferWindowMemory(memory_key="chat_history", return_messages=True,k=2)
+        # Memory for conversation (keeps short term chat history).
+        # input_key pins what gets saved to the raw user utterance; retrieved
+        # context travels in the separate {context} variable and is never stored.
+        self._memory_config = (history_turns, summarize_history, summary_token_limit)
+        self.memory = self._new_memory()
 
         # Load system prompt
         if not os.path.exists(SYSTEM_PROMPT_FILE):
@@ -138,29 +178,91 @@ class EcommerceLLM:
         with open(SYSTEM_PROMPT_FILE, "r", encoding="utf-8") as f:
             system_prompt = f.read().strip()
 
-        # Single {input} variable to keep LangChain memory compatible
+        # {input} is the raw utterance (what memory records); {context} carries the
+        # per-turn retrieved docs / tool output and is rebuilt on every call
         self.prompt = ChatPromptTemplate.from_messages([
             SystemMessagePromptTemplate.from_template(system_prompt),
             MessagesPlaceholder(variable_name="chat_history"),
+            SystemMessagePromptTemplate.from_template("{context}"),
             HumanMessagePromptTemplate.from_template("{input}")
         ])
 
-        self.chain = LLMChain(llm=self.llm, prompt=self.prompt, memory=self.memory)
+        # Memory is read/written around the gateway call (not attached to the chain),
+        # so retried or hedged attempts never record the same turn twice.
+        self.chain = LLMChain(llm=self.llm, prompt=self.prompt)
+
+        # Retriever (Chroma), re-resolved whenever the catalog watcher swaps index generations
+        self.retriever_k = retriever_k
+        self._retriever = None
+        self._retriever_generation = None
+        self._current_retriever()
+
+        # Concurrent identical work is collapsed into one in-flight computation
+        self._retrieval_flight = singleflight.get_group("retrieval")
+        self._faq_flight = singleflight.get_group("faq_answer")
+
+        # Independent tool calls / retrievals run concurrently on the shared planner pool;
+        # work started before it is known to be needed waits in the speculator
+        self.planner = get_planner()
+        self._speculator = Speculator(self.planner)
+        self._partials: "OrderedDict[Optional[str], tuple]" = OrderedDict()  # session -> (partial, keys)
+        self._partials_lock = threading.Lock()
 
-        # Retriever (Chroma)
-        self.retriever = get_retriever(k=retriever_k)
+        # greetings / thanks / clarification prompts come from the template catalog
+        self.responder = FastResponder.from_file(text_to_ssml)
 
         # placeholders for telemetry / debugging
         self.last_retrieved = None
         self.last_tool = None
         self.last_response_time_ms = None
+        self.last_intent = None
             # inside EcommerceLLM class (paste after __init__)
 
+    def _new_memory(self):
+        history_turns, summarize_history, summary_token_limit = self._memory_config
+        if summarize_history:
+            # older turns are folded into a rolling summary once the buffer exceeds the token limit
+            return ConversationSummaryBufferMemory(
+                llm=self.llm, memory_key="chat_history", input_key="input",
+                return_messages=True, max_token_limit=summary_token_limit
+            )
+        return ConversationBufferWindowMemory(
+            memory_key="chat_history", input_key="input", return_messages=True, k=history_turns
+        )
+
+    def session(self) -> "EcommerceLLM":
+        """
+        A per-conversation view of this engine: shares the model, gateway, chain and
+        retriever (the expensive, thread-safe parts) but has its own memory and last_*
+        telemetry, so many concurrent conversations can run on one loaded engine.
+        """
+        view = self.turn()
+        view.memory = self._new_memory()
+        return view
+
+    def turn(self) -> "EcommerceLLM":
+        """
+        A view for a single request: same engine and conversation memory, but its own
+        last_* telemetry, so a caller reading last_tool / last_retrieved after process()
+        sees its own turn while other requests run on the same engine.
+        """
+        view = copy.copy(self)
+        view.last_retrieved = None
+        view.last_tool = None
+        view.last_response_time_ms = None
+        view.last_intent = None
+        return view
+
     def text_to_ssml(self, text: str, lang: str = "en-US", break_ms: int = 350) -> str:
         """
         Instance wrapper for the module-level text_to_ssml helper so callers
         (e.g., FastAPI) can call llm.text_to_ssml(reply).
+        Template replies come with SSML rendered when the catalog was loaded.
         """
+        if lang == "en-US" and break_ms == 350:
+            ssml = self.responder.ssml_for(text)
+            if ssml is not None:
+                return ssml
         try:
             return text_to_ssml(text, lang=lang, break_ms=break_ms)
         except Exception as e:
@@ -197,64 +299,314 @@ class EcommerceLLM:
             return int(m.group(1))
         return 1
 
+    def _current_retriever(self):
+        """(generation number, retriever) for the active index generation."""
+        generation, retriever = self._retriever_generation, self._retriever
+        active = active_generation().number
+        if retriever is None or generation != active:
+            retriever, generation = get_retriever(k=self.retriever_k), active
+            self._retriever, self._retriever_generation = retriever, generation
+        return generation, retriever
+
+    @property
+    def retriever(self):
+        return self._current_retriever()[1]
+
+    def _retrieval_key(self, text: str, source: Optional[str] = None):
+        # the generation is part of the key, so nobody joins a retrieval on a swapped-out index
+        generation, retriever = self._current_retriever()
+        return (generation, self.retriever_k, source, singleflight.normalize_key(text)), retriever
+
+    def _retrieve(self, text: str, source: Optional[str] = None):
+        """Top retriever_k documents for `text`; `source` ("faqs" / "products") limits the shards searched."""
+        key, retriever = self._retrieval_key(text, source)
+        speculative = self._claim(("retrieval",) + key)
+        if speculative is not None:
+            return speculative
+        return self._retrieval_flight.do(key, retrieve_documents, retriever, text, source)
+
+    def _search_products(self, text: str, k: int = 5):
+        speculative = self._claim(("search", active_generation().number, k, singleflight.normalize_key(text)))
+        if speculative is not None:
+            return speculative
+        return search_products(text, k=k)
+
+    def _claim(self, key):
+        """Result of speculative work started for `key`, or None if there is none (or it failed)."""
+        pending = self._speculator.take(key)
+        if pending is None or pending.cancelled():
+            return None
+        try:
+            return pending.result()
+        except Exception as e:
+            print(f"[ecommerce_llm] speculative {key[0]} failed, recomputing: {e}")
+            return None
+
+    def _speculate_retrieval(self, text: str, source: Optional[str] = None) -> Optional[tuple]:
+        key, retriever = self._retrieval_key(text, source)
+        key = ("retrieval",) + key
+        started = self._speculator.start(key, self._retrieval_flight.do, key[1:], retrieve_documents,
+                                         retriever, text, source)
+        return key if started else None
+
+    def _speculate_search(self, text: str, k: int = 5) -> Optional[tuple]:
+        key = ("search", active_generation().number, k, singleflight.normalize_key(text))
+        return key if self._speculator.start(key, search_products, text, k) else None
+
+    def _shared_query_vector(self, text: str, source: Optional[str] = None):
+        """Scope in which every step for `text` reuses one query embedding."""
+        key, _ = self._retrieval_key(text, source)
+        if precomputed_vector(text) is not None or ("retrieval",) + key in self._speculator:
+            return nullcontext()  # already embedded by a batch, or a speculative retrieval is pending
+        with metrics.stage("embedding"):
+            vector = embed_queries([text])[0]
+        return use_query_vectors({text: vector})
+
+    def _classify_intent(self, text: str) -> str:
+        """Routing branch for `text` (keyword rules, checked in priority order)."""
+        lower = text.lower().strip()
+        if self.responder.is_canned(text):
+            return "small_talk"
+        if any(k in lower for k in RETURN_KEYWORDS):
+            return "return_action" if self._extract_order_id(text) else "return_policy"
+        if any(w in lower for w in ORDER_TRACKING_KEYWORDS):
+            return "order_status"
+        if any(k in lower for k in PLACE_ORDER_KEYWORDS):
+            return "place_order"
+        if any(k in lower for k in ECOMMERCE_KEYWORDS):
+            return "product_search"
+        if any(k in lower for k in FAQ_KEYWORDS):
+            return "faq"
+        # a greeting followed by other words ("hey, are you a robot?"): conversational reply
+        if self.responder.opens_with_canned(text):
+            return "small_talk"
+        return "out_of_scope"
 
-    @traceable(name="ecommerce_llm_process")
-    def process(self, text: str) -> str:
+    def prefetch(self, partial_text: str, session_id: Optional[str] = None, stable: bool = False) -> Dict:
+        """
+        Speculatively start the retrieval work the final turn will likely need, from a
+        partial (interim) voice transcript. A partial counts as stable when the client says
+        so or when the same text arrives twice in a row for the session; unstable partials
+        only update the tracker. If the final transcript normalises to the same text,
+        process() picks up the pending results instead of starting over; superseded or
+        unclaimed work is cancelled (or, if already running, ignored and expired).
+        """
+        norm = singleflight.normalize_key(partial_text or "")
+        if not norm:
+            return {"stable": False, "intent": None, "started": []}
+        with self._partials_lock:
+            previous, keys = self._partials.pop(session_id, (None, ()))
+            stale = keys if previous != norm else ()
+            self._partials[session_id] = (norm, () if stale else keys)
+            while len(self._partials) > MAX_TRACKED_PARTIALS:
+                self._partials.popitem(last=False)
+        # the user kept talking: whatever was speculated for the older partial is unused
+        for key in stale:
+            self._speculator.discard(key)
+        if not (stable or previous == norm):
+            return {"stable": False, "intent": None, "started": []}
+
+        intent = self._classify_intent(partial_text)
+        started = []
+        if intent in ("product_search", "return_policy", "faq"):
+            started.append(self._speculate_retrieval(partial_text, RETRIEVAL_SOURCES.get(intent)))
+        if intent == "product_search":
+            started.append(self._speculate_search(partial_text))
+        started = tuple(k for k in started if k)
+        with self._partials_lock:
+            entry = self._partials.get(session_id)
+            if entry is not None and entry[0] == norm:
+                self._partials[session_id] = (norm, entry[1] + started)
+        return {"stable": True, "intent": intent, "started": [k[0] for k in started]}
+
+    def speculation_stats(self) -> Dict:
+        return self._speculator.stats()
+
+    def _chat_history(self, remember: bool = True) -> list:
+        if not remember:
+            return []
+        return self.memory.load_memory_variables({})["chat_history"]
+
+    def _history_key(self, remember: bool = True) -> int:
+        messages = self._chat_history(remember)
+        return hash((remember, tuple(str(getattr(m, "content", m)) for m in messages)))
+
+    def _answer_faq(self, text: str, remember: bool = True):
+        """
+        (reply, docs, answered). Shared by coalesced callers, so it never writes memory:
+        each caller saves the turn to its own memory when `answered` (an LLM reply).
+        """
+        docs = self._retrieve(text)
+        rag_text = "\n\n".join(d.page_content for d in docs) if docs else ""
+
+        if not rag_text:
+            return "I don’t have that information right now. Please check our help center.", docs, False
+
+        fallback = self._degraded_faq_reply(docs)
+        reply = self._answer_with_context(
+            text,
+            f"FAQ documents:\n{rag_text}",
+            "Answer clearly and concisely using only the documents.",
+            fallback=fallback,
+            remember=remember,
+            save=False,
+        )
+        # the fallback object itself comes back only when the gateway gave up
+        return reply, docs, reply is not fallback
+
+    def _direct_faq(self, text: str, remember: bool = True) -> Optional[str]:
+        """Stored FAQ answer for a close enough question match (no retrieval, no LLM), else None."""
+        hit = get_faq_index().match(text)
+        if hit is None:
+            return None
+        reply = normalize_whitespace(hit.answer)
+        self.last_retrieved = [hit.document()]
+        self.last_tool = {"type": "faq_direct",
+                          "result": {"doc_id": hit.doc_id, "question": hit.question, "score": round(hit.score, 4)}}
+        if remember:
+            self.memory.save_context({"input": text}, {"text": reply})
+        return reply
+
+    def _degraded_products_reply(self, results) -> str:
+        named = [
+            f"{r['title']} ({r['final_price']} {r['currency']})"
+            for r in results if r.get("prod_id")
+        ][:3]
+        if not named:
+            return DEGRADED_REPLIES["no_products"]
+        return DEGRADED_REPLIES["products"].format(products="; ".join(named))
+
+    def _degraded_faq_reply(self, docs, default: str = "faq") -> str:
+        # FAQ docs are stored as "Q: ...\nA: ..." so the stored answer can be served verbatim
+        for d in docs or []:
+            if (d.metadata or {}).get("source") == "faqs" and "\nA:" in d.page_content:
+                return normalize_whitespace(d.page_content.split("\nA:", 1)[1])
+        return DEGRADED_REPLIES[default]
+
+    def _answer_with_context(self, text: str, context: str, instruction: str, fallback: str,
+                             remember: bool = True, save: Optional[bool] = None) -> str:
+        """
+        Run the conversational chain with retrieved context passed separately from the
+        user's utterance, so memory only keeps `text` and the reply.
+        Returns `fallback` (a degraded template answer) if the LLM gateway gives up.
+        With remember=False the turn neither reads nor writes conversation memory;
+        save=False reads history but leaves saving the turn to the caller.
+        """
+        if len(context) > MAX_CONTEXT_CHARS:
+            context = context[:MAX_CONTEXT_CHARS] + " ...[truncated]"
+
+        inputs = {
+            "input": text,
+            "context": f"{context}\n\n{instruction}",
+            "chat_history": self._chat_history(remember),
+        }
+        try:
+            resp = self.gateway.call(self.chain.invoke, inputs, hedge=True)
+        except GatewayError as e:
+            print(f"[ecommerce_llm] degraded answer: {e}")
+            return fallback
+
+        out = resp.get("text") if isinstance(resp, dict) else str(resp)
+        out = normalize_whitespace(strip_markdown(out))
+        if remember if save is None else save:
+            self.memory.save_context({"input": text}, {"text": out})
+        return out
+
+
+    @tracing.span("ecommerce_llm_process")
+    def process(self, text: str, remember: bool = True) -> str:
+        start = time.perf_counter()
+        with metrics.intent_scope():
+            try:
+                return self._route(text, remember)
+            finally:
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                self.last_response_time_ms = int(elapsed_ms)
+                self.last_intent = metrics.current_intent()
+                metrics.PROCESS_LATENCY.observe(elapsed_ms, intent=metrics.current_intent())
+
+    def _route(self, text: str, remember: bool) -> str:
         if not text or not text.strip():
-            return "Please provide a query."
-
-        lower = text.lower().strip()
+            metrics.set_intent("empty")
+            return self.responder.render("empty_query")
 
         # --------------------------------------------------
         # 1️⃣ SMALL TALK
         # --------------------------------------------------
-        if any(k in lower for k in SMALL_TALK_KEYWORDS):
+        # nothing but a greeting / thanks / goodbye: canned reply, no LLM call
+        canned = self.responder.match(text)
+        if canned is not None:
+            metrics.set_intent("small_talk")
+            self.last_tool = {"type": "template", "template": canned.template}
+            self.last_retrieved = []
+            return canned.text
+
+        lower = text.lower().strip()
+        intent = self._classify_intent(text)
+
+        # small talk with real content beyond the canned pattern goes to the LLM
+        if intent == "small_talk":
+            metrics.set_intent("small_talk")
             try:
-                resp = self.llm.invoke([
+                resp = self.gateway.call(self.llm.invoke, [
                     ("system", "You are a polite ecommerce assistant."),
                     ("human", text)
-                ])
+                ], hedge=True)
                 return normalize_whitespace(strip_markdown(resp.content))
-            except Exception:
-                return "Hello 😊 I can help with products, orders, and returns."
+            except GatewayError:
+                return DEGRADED_REPLIES["small_talk"]
             
         # --------------------------------------------------
         # 2️⃣ RETURN / REFUND INTENT
         # --------------------------------------------------
-        if any(k in lower for k in RETURN_KEYWORDS):
+        if intent in ("return_policy", "return_action"):
 
             order_id = self._extract_order_id(text)
 
             # ✅ CASE A: FAQ / POLICY QUESTION (NO ORDER ID)
             # Example: "How can I return an item?"
             if not order_id:
-                docs = self.retriever.get_relevant_documents(text)
+                metrics.set_intent("return_policy")
+                # retrieval starts now (on the same query embedding), in case the
+                # direct FAQ match falls short
+                source = RETRIEVAL_SOURCES["return_policy"]
+                with self._shared_query_vector(text, source):
+                    speculative = self._speculate_retrieval(text, source)
+                    direct = self._direct_faq(text, remember)
+                if direct is not None:
+                    if speculative:
+                        self._speculator.discard(speculative)
+                    return direct
+                docs = self._retrieve(text, source)
                 self.last_retrieved = docs
 
                 rag_text = "\n\n".join(d.page_content for d in docs) if docs else ""
 
-                resp = self.chain.invoke({
-                    "input": (
-                        f"User question: {text}\n\n"
-                        f"Return policy documents:\n{rag_text}\n\n"
-                        "Answer clearly and concisely. "
-                        "Do not ask for order ID unless the user wants to create a return."
-                    )
-                })
-
-                out = resp.get("text") if isinstance(resp, dict) else str(resp)
-                return normalize_whitespace(strip_markdown(out))
+                return self._answer_with_context(
+                    text,
+                    f"Return policy documents:\n{rag_text}",
+                    "Answer clearly and concisely. "
+                    "Do not ask for order ID unless the user wants to create a return.",
+                    fallback=self._degraded_faq_reply(docs, "return_policy"),
+                    remember=remember
+                )
 
             # ✅ CASE B: RETURN ACTION (ORDER ID PRESENT)
-            order = get_order_status(order_id)
+            metrics.set_intent("return_action")
+            # the order and any existing return are independent lookups: run them together
+            with metrics.stage("parallel_tools"):
+                found = self.planner.run({
+                    "order": (get_order_status, order_id),
+                    "existing": (get_return_by_order, order_id),
+                })
+            order, existing = found["order"], found["existing"]
             if not order:
-                return f"I could not find order {order_id}. Please verify the order ID."
+                return self.responder.render("return_order_not_found", order_id=order_id)
 
             # Optional but realistic check
             if order["status"].lower() != "delivered":
-                return "Only delivered orders are eligible for return."
+                return self.responder.render("return_not_eligible")
 
-            existing = get_return_by_order(order_id)
             if existing:
                 return normalize_whitespace(
                     f"A return already exists for order {order_id}. "
@@ -262,7 +614,7 @@ class EcommerceLLM:
                 )
 
             if "because" not in lower:
-                return "Please tell me the reason for return (for example: damaged item, wrong size)."
+                return self.responder.render("ask_return_reason")
 
             reason = text.split("because", 1)[1].strip()
 
@@ -281,56 +633,49 @@ class EcommerceLLM:
         # --------------------------------------------------
         # 3️⃣ ORDER TRACKING INTENT
         # --------------------------------------------------
-        if any(w in lower for w in [
-            "track order",
-            "order status",
-            "where is my order",
-            "track my order",
-            "order update",
-            "order id",
-            "order #",
-            "order status",
-            "order details",
-            "order info",
-            "order information",
-            "tell me about order",
-            "where is my order",
-            "track my order",
-            "order update",
-            "order id",
-            "order #",
-            "details of order"
-        ]):
+        if intent == "order_status":
+            metrics.set_intent("order_status")
             order_id = self._extract_order_id(text)
             if not order_id:
-                return "Sure — please provide your order ID (for example ORD10023)."
+                return self.responder.render("ask_order_id")
 
             status = get_order_status(order_id)
             if not status:
-                return f"I couldn't find an order with id {order_id}."
+                return self.responder.render("order_not_found", order_id=order_id)
 
+            # name the items from the catalog (orders only store prod_id / qty)
+            items = get_catalog().enrich_items(status.get("items"))
+            status = dict(status, items=items)
             self.last_tool = {"type": "order_status", "result": status}
             self.last_retrieved = []
 
+            named = [f"{it.get('qty', 1)} x {it['title']}" for it in items if it.get("title")]
             return normalize_whitespace(
                 f"Order {status['order_id']} is currently {status['status']}. "
-                f"Placed on {status['placed_date']}. "
+                + (f"Items: {'; '.join(named)}. " if named else "")
+                + f"Placed on {status['placed_date']}. "
                 f"Estimated delivery: {status['estimated_delivery']}. "
                 f"Total: {status['total_amount']} {status['currency']}."
             )
         
 
         # ------------------ PLACE ORDER (NEW) ------------------
-        if any(k in lower for k in PLACE_ORDER_KEYWORDS):
+        if intent == "place_order":
+            metrics.set_intent("place_order")
             qty = self._extract_quantity(text)
             if not qty:
-                return "How many units would you like to order?"
+                return self.responder.render("ask_quantity")
 
-            products = search_products(text, k=1)
+            catalog = get_catalog()
+            # an exact product id in the utterance skips the semantic search
+            exact = catalog.find_ids(text)
+            products = [catalog.product(exact[0])] if exact else self._search_products(text, k=1)
             if not products:
-                return "I could not find a matching product."
+                return self.responder.render("product_not_found")
 
             product = products[0]
+            if catalog.in_stock(product["prod_id"]) is False:
+                return self.responder.render("product_unavailable", title=product["title"])
 
             order = create_order(
                 product=product,
@@ -351,15 +696,19 @@ class EcommerceLLM:
         # --------------------------------------------------
         # 4️⃣ PRODUCT / SEARCH INTENT
         # --------------------------------------------------
-        if any(k in lower for k in ECOMMERCE_KEYWORDS):
+        if intent == "product_search":
+            metrics.set_intent("product_search")
+            # product search and document retrieval are independent: run them side by
+            # side on one query embedding, so the branch costs the slower of the two
+            with self._shared_query_vector(text):
+                products = self.planner.submit(self._search_products, text, 5)
+                docs = self._retrieve(text)
             try:
-                results = search_products(text, k=5)
+                results = products.result()
             except Exception:
                 results = []
 
             self.last_tool = {"type": "search_products", "query": text, "results": results}
-
-            docs = self.retriever.get_relevant_documents(text)
             self.last_retrieved = docs
 
             structured_context = "\n".join(
@@ -369,48 +718,72 @@ class EcommerceLLM:
 
             rag_docs_text = "\n\n".join(d.page_content for d in docs) if docs else ""
 
-            resp = self.chain.invoke({
-                "input": (
-                    f"User query: {text}\n\n"
-                    f"Products:\n{structured_context}\n\n"
-                    f"Reference docs:\n{rag_docs_text}\n\n"
-                    "Answer clearly and concisely."
-                )
-            })
-
-            out = resp.get("text") if isinstance(resp, dict) else str(resp)
-            return normalize_whitespace(strip_markdown(out))
+            return self._answer_with_context(
+                text,
+                f"Products:\n{structured_context}\n\n"
+                f"Reference docs:\n{rag_docs_text}",
+                "Answer clearly and concisely.",
+                fallback=self._degraded_products_reply(results),
+                remember=remember
+            )
         
 
         # --------------------------------------------------
         # 4️⃣ GENERIC FAQ / POLICY (RAG ONLY)
         # --------------------------------------------------
-        if any(k in lower for k in FAQ_KEYWORDS):
-            docs = self.retriever.get_relevant_documents(text)
+        if intent == "faq":
+            metrics.set_intent("faq")
+            with self._shared_query_vector(text):
+                speculative = self._speculate_retrieval(text)
+                direct = self._direct_faq(text, remember)
+            if direct is not None:
+                if speculative:
+                    self._speculator.discard(speculative)
+                return direct
+            # identical FAQ questions asked at the same time (with the same chat history)
+            # share one retrieval + LLM completion
+            key = (active_generation().number, singleflight.normalize_key(text), self._history_key(remember))
+            reply, docs, answered = self._faq_flight.do(key, self._answer_faq, text, remember)
+            # the leader's engine view may hold another conversation's memory: every
+            # caller (leader or coalesced follower) records the turn in its own
+            if remember and answered:
+                self.memory.save_context({"input": text}, {"text": reply})
             self.last_retrieved = docs
             self.last_tool = None
-
-            rag_text = "\n\n".join(d.page_content for d in docs) if docs else ""
-
-            if not rag_text:
-                return "I don’t have that information right now. Please check our help center."
-
-            resp = self.chain.invoke({
-                "input": (
-                    f"User question: {text}\n\n"
-                    f"FAQ documents:\n{rag_text}\n\n"
-                    "Answer clearly and concisely using only the documents."
-                )
-            })
-
-            out = resp.get("text") if isinstance(resp, dict) else str(resp)
-            return normalize_whitespace(strip_markdown(out))
+            return reply
         
 
         # --------------------------------------------------
         # 5️⃣ OUT OF SCOPE
         # --------------------------------------------------
-        return (
-            "I can help with ecommerce-related questions such as products, "
-            "orders, returns, and delivery information."
-        )
+        metrics.set_intent("out_of_scope")
+        return self.responder.render("out_of_scope")
+
+    def process_batch(self, texts: List[str], max_concurrency: int = 4) -> Iterator[Dict]:
+        """
+        Run many independent queries through the pipeline (offline QA / replay jobs).
+        All queries are embedded in one batched model call up front, then the per-query
+        pipelines fan out over at most `max_concurrency` threads with "batch" LLM priority.
+        Batch turns do not read or write conversation memory.
+        Yields {"index", "text", "reply"} (or "error") as each item completes.
+        """
+        texts = list(texts)
+        if not texts:
+            return
+
+        distinct = [t for t in dict.fromkeys(texts) if t and t.strip()]
+        vectors = dict(zip(distinct, embed_queries(distinct)))
+
+        def run_one(text: str) -> str:
+            with use_query_vectors(vectors), priority_scope("batch"):
+                return self.turn().process(text, remember=False)
+
+        workers = max(1, min(max_concurrency, MAX_BATCH_CONCURRENCY))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="llm-batch") as pool:
+            futures = {pool.submit(run_one, t): i for i, t in enumerate(texts)}
+            for fut in as_completed(futures):
+                i = futures[fut]
+                try:
+                    yield {"index": i, "text": texts[i], "reply": fut.result()}
+                except Exception as e:
+                    yield {"index": i, "text": texts[i], "error": str(e)}
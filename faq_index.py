@@ -0,0 +1,122 @@
+# faq_index.py
+"""
+Direct FAQ answers without the LLM.
+
+faqs.json is a closed set of question/answer pairs, so the questions are embedded once
+into a normalised [n, dim] matrix. A query is embedded (or reuses the vector a batch
+call already computed) and compared with every question by one matrix-vector product.
+If the best cosine similarity reaches FAQ_DIRECT_THRESHOLD the stored answer is served
+verbatim with its doc id; below it the caller falls back to retrieval + LLM.
+
+    FAQ_DIRECT_THRESHOLD   minimum cosine similarity for a direct answer (default 0.82;
+                           0 or negative disables direct answers)
+
+The threshold is embedding-specific: tune it with the hf model against real traffic.
+"""
+import os
+import json
+import threading
+from typing import List, NamedTuple, Optional
+
+import numpy as np
+from langchain_core.documents import Document
+
+import metrics
+import rag_store1
+
+FAQ_JSON = "faqs.json"
+DIRECT_THRESHOLD = float(os.getenv("FAQ_DIRECT_THRESHOLD", "0.82"))
+
+
+def faq_doc_id(index: int) -> str:
+    return f"faq-{index}"
+
+
+class FaqMatch(NamedTuple):
+    doc_id: str
+    index: int
+    question: str
+    answer: str
+    score: float
+
+    def document(self) -> Document:
+        return Document(
+            page_content=f"Q: {self.question}\nA: {self.answer}",
+            metadata={"source": "faqs", "index": self.index, "question": self.question, "doc_id": self.doc_id},
+        )
+
+
+class FaqIndex:
+    def __init__(self, questions: List[str], answers: List[str], indices: List[int], embeddings):
+        self.questions = questions
+        self.answers = answers
+        self.indices = indices
+        self.embeddings = embeddings
+        if questions:
+            m = np.asarray(embeddings.embed_documents(questions), dtype=np.float32)
+            m /= np.maximum(np.linalg.norm(m, axis=1, keepdims=True), 1e-12)
+        else:
+            m = np.zeros((0, 0), dtype=np.float32)
+        self.matrix = m
+
+    @classmethod
+    def from_json(cls, json_path: str = FAQ_JSON, embeddings=None) -> "FaqIndex":
+        questions, answers, indices = [], [], []
+        if os.path.exists(json_path):
+            with open(json_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            # same enumeration as rag_store1.load_faqs_json, so indices / doc ids agree
+            for i, qa in enumerate(data.get("questions", [])):
+                q = qa.get("question", "").strip()
+                a = qa.get("answer", "").strip()
+                if q and a:
+                    questions.append(q)
+                    answers.append(a)
+                    indices.append(i)
+        return cls(questions, answers, indices, embeddings or rag_store1.get_embeddings())
+
+    def __len__(self) -> int:
+        return len(self.questions)
+
+    def nearest(self, text: str) -> Optional[FaqMatch]:
+        if not self.questions:
+            return None
+        vec = rag_store1.precomputed_vector(text)
+        if vec is None:
+            with metrics.stage("embedding"):
+                vec = self.embeddings.embed_query(text)
+        q = np.asarray(vec, dtype=np.float32)
+        scores = self.matrix @ (q / max(float(np.linalg.norm(q)), 1e-12))
+        best = int(np.argmax(scores))
+        i = self.indices[best]
+        return FaqMatch(faq_doc_id(i), i, self.questions[best], self.answers[best], float(scores[best]))
+
+    def match(self, text: str, threshold: float = None) -> Optional[FaqMatch]:
+        """The best FAQ if its similarity reaches the threshold, else None."""
+        threshold = DIRECT_THRESHOLD if threshold is None else threshold
+        if threshold <= 0:
+            return None
+        with metrics.stage("faq_match"):
+            hit = self.nearest(text)
+        ok = hit is not None and hit.score >= threshold
+        metrics.record_cache("faq_direct", ok)
+        return hit if ok else None
+
+
+_INDEX: Optional[FaqIndex] = None
+_LOCK = threading.Lock()
+
+
+def get_faq_index() -> FaqIndex:
+    global _INDEX
+    if _INDEX is None:
+        with _LOCK:
+            if _INDEX is None:
+                _INDEX = FaqIndex.from_json(FAQ_JSON)
+    return _INDEX
+
+
+@rag_store1.register_reload_hook
+def _reload_faqs(generation):
+    global _INDEX
+    _INDEX = FaqIndex.from_json(FAQ_JSON)
@@ -0,0 +1,174 @@
+# fast_responder.py
+"""
+Deterministic replies from a template catalog (no retrieval, no LLM).
+
+Two kinds of templates:
+
+  * canned-pattern templates (greeting, thanks, closing, ...) carry `patterns`. An
+    utterance made only of those phrases plus filler words ("hi there", "ok thanks so
+    much!", "bye") is answered from the template of the highest-priority kind it
+    contains (catalog order). Anything with real content left over ("hi, where is my
+    order") is not canned; the intent router handles it.
+  * prompt templates (ask_order_id, order_not_found, ...) are rendered by the tool
+    branches, with `{placeholders}` filled from str.format-style keyword arguments.
+
+Templates without placeholders are pre-rendered to plain text and SSML when the
+catalog loads, so serving one is a dictionary lookup; ssml_for(text) returns the
+pre-rendered SSML for a reply produced from the catalog.
+
+The built-in catalog below can be extended or overridden by a JSON file
+(REPLY_TEMPLATES_FILE, default reply_templates.json, optional) of the same shape:
+
+    {"greeting": {"patterns": ["hi", "hello"], "text": "Hello! How can I help?"},
+     "ask_order_id": {"text": "Please share your order ID.", "ssml": "<speak>...</speak>"}}
+
+An entry's "ssml" is optional; by default it is derived from "text".
+"""
+import os
+import re
+import json
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+import metrics
+
+REPLY_TEMPLATES_FILE = os.getenv("REPLY_TEMPLATES_FILE", "reply_templates.json")
+
+# canned kinds first, in priority order ("hi thanks bye" is a closing)
+DEFAULT_TEMPLATES: Dict[str, Dict] = {
+    "closing": {
+        "patterns": ["bye", "goodbye", "good bye", "bye bye", "see you", "see ya", "good night",
+                     "that's all", "that is all", "that's it", "nothing else"],
+        "text": "Thanks for shopping with us. Have a great day!",
+    },
+    "thanks": {
+        "patterns": ["thanks", "thank you", "thank u", "thx", "ty", "cheers", "appreciate it",
+                     "much appreciated", "great", "perfect", "awesome", "cool"],
+        "text": "You're welcome! Is there anything else I can help you with?",
+    },
+    "help": {
+        "patterns": ["help", "help me", "can you help", "can you help me", "i need help",
+                     "what can you do", "how can you help"],
+        "text": "Of course. I can help you find products, track an order, start a return, "
+                "or answer questions about payments and delivery. What would you like to do?",
+    },
+    "greeting": {
+        "patterns": ["hi", "hii", "hiii", "hello", "hey", "hey there", "hi there", "hello there",
+                     "good morning", "good afternoon", "good evening", "are you there", "anyone there",
+                     "yo", "greetings"],
+        "text": "Hello! How can I help you today? I can help with products, orders, and returns.",
+    },
+    # no bare yes / no / ok / sure: those usually answer the assistant's last question
+    # ("Would you like to place the order?") and must reach the conversation flow
+    "acknowledgement": {
+        "patterns": ["got it", "noted", "i see", "understood", "hmm", "ah"],
+        "text": "Okay. Let me know if there's anything else you need.",
+    },
+    # prompts and fixed replies used by the tool branches
+    "ask_order_id": {"text": "Sure — please provide your order ID (for example ORD10023)."},
+    "ask_return_reason": {"text": "Please tell me the reason for return (for example: damaged item, wrong size)."},
+    "ask_quantity": {"text": "How many units would you like to order?"},
+    "order_not_found": {"text": "I couldn't find an order with id {order_id}."},
+    "return_order_not_found": {"text": "I could not find order {order_id}. Please verify the order ID."},
+    "return_not_eligible": {"text": "Only delivered orders are eligible for return."},
+    "product_not_found": {"text": "I could not find a matching product."},
+    "product_unavailable": {"text": "Sorry, {title} is currently unavailable."},
+    "empty_query": {"text": "Please provide a query."},
+    "out_of_scope": {
+        "text": "I can help with ecommerce-related questions such as products, "
+                "orders, returns, and delivery information.",
+    },
+}
+
+# words that do not make an utterance "real content" on their own
+FILLER_WORDS = frozenset({
+    "so", "very", "much", "a", "lot", "lots", "please", "pls", "there", "again", "then",
+    "buddy", "friend", "bot", "assistant", "team", "guys", "everyone", "sir", "madam", "man",
+    "oh", "well", "and", "just", "for", "that", "the", "help", "your", "you", "u", "it", "all",
+    "really", "now", "today", "too", "also", "ok", "okay",
+})
+
+_NON_WORD = re.compile(r"[^a-z0-9' ]+")
+_SPACES = re.compile(r"\s+")
+_FIELD = re.compile(r"{[^{}]*}")
+
+
+def _normalise(text: str) -> str:
+    text = (text or "").lower().replace("’", "'")
+    return _SPACES.sub(" ", _NON_WORD.sub(" ", text)).strip()
+
+
+class Reply(NamedTuple):
+    template: str
+    text: str
+    ssml: str
+
+
+class FastResponder:
+    def __init__(self, templates: Dict[str, Dict], to_ssml: Callable[[str], str]):
+        self.to_ssml = to_ssml
+        self.templates: Dict[str, Dict] = {}
+        self._static: Dict[str, Reply] = {}       # name -> pre-rendered reply (no placeholders)
+        self._ssml_by_text: Dict[str, str] = {}   # reply text -> pre-rendered SSML
+        self._kind_of: Dict[str, str] = {}        # canned phrase -> template name
+        priority: List[str] = []
+        for name, spec in templates.items():
+            text = spec.get("text") or ""
+            self.templates[name] = spec
+            if not _FIELD.search(text):
+                reply = Reply(name, text, spec.get("ssml") or to_ssml(text))
+                self._static[name] = reply
+                self._ssml_by_text[text] = reply.ssml
+            if spec.get("patterns") and name in self._static:  # canned replies take no placeholders
+                priority.append(name)
+                for phrase in spec["patterns"]:
+                    phrase = _normalise(phrase)
+                    if phrase:
+                        self._kind_of.setdefault(phrase, name)
+        self._priority = {name: i for i, name in enumerate(priority)}
+        # longest phrases first, whole words only ("hi" must not match "this" or "shipping")
+        phrases = sorted(self._kind_of, key=len, reverse=True)
+        self._phrases = re.compile(r"\b(?:%s)\b" % "|".join(map(re.escape, phrases))) if phrases else None
+
+    @classmethod
+    def from_file(cls, to_ssml: Callable[[str], str], path: str = REPLY_TEMPLATES_FILE) -> "FastResponder":
+        """Built-in catalog, overridden / extended per template by `path` if it exists."""
+        templates = {name: dict(spec) for name, spec in DEFAULT_TEMPLATES.items()}
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for name, spec in json.load(f).items():
+                    templates[name] = dict(templates.get(name, {}), **spec)
+        return cls(templates, to_ssml)
+
+    def opens_with_canned(self, text: str) -> bool:
+        """True if `text` starts with a canned phrase ("hey, are you a bot?")."""
+        return bool(self._phrases and self._phrases.match(_normalise(text)))
+
+    def _canned_kind(self, text: str) -> Optional[str]:
+        norm = _normalise(text)
+        if not norm or self._phrases is None:
+            return None
+        kinds = [self._kind_of[m] for m in self._phrases.findall(norm)]
+        rest = self._phrases.sub(" ", norm).split()
+        if not kinds or not all(w in FILLER_WORDS for w in rest):
+            return None
+        return min(kinds, key=self._priority.__getitem__)
+
+    def is_canned(self, text: str) -> bool:
+        return self._canned_kind(text) is not None
+
+    def match(self, text: str) -> Optional[Reply]:
+        """The canned reply for an utterance made only of canned phrases and filler, else None."""
+        kind = self._canned_kind(text)
+        metrics.record_cache("reply_template", kind is not None)
+        return self._static[kind] if kind else None
+
+    def render(self, name: str, **values) -> str:
+        """Text of template `name`, placeholders filled from `values`."""
+        reply = self._static.get(name)
+        if reply is not None:
+            return reply.text
+        return self.templates[name]["text"].format(**values)
+
+    def ssml_for(self, text: str) -> Optional[str]:
+        """Pre-rendered SSML if `text` is a static template's reply."""
+        return self._ssml_by_text.get(text)
@@ -0,0 +1,229 @@
+# flat_index.py
+"""
+Read-only, memory-mapped flat vector index.
+
+Exported once from the Chroma collection (rag_store1.build_flat_index) into three files:
+
+    vectors.npy   float32 [n, dim], rows L2-normalised
+    docs.bin      concatenated UTF-8 JSON records {"t": page_content, "m": metadata}
+    offsets.npy   int64 [n + 1] byte offsets of each record in docs.bin
+
+All three are opened with mmap, so pages come from the OS page cache and are shared
+between every process that maps them (pre-forked workers, or independent processes on
+the same host); nothing is copied onto the Python heap until a hit is returned.
+Search is an exact dot-product scan, which for catalog-sized indexes (tens of thousands
+of rows) is a few milliseconds and avoids a per-process Chroma/SQLite client.
+
+Rows whose metadata carries a "shard" name (rag_store1.shard_name: "faqs",
+"products/<category>") are written grouped by shard, and meta.json records each shard's
+[start, end) row range. A search can then be restricted to some shards, each scanned as
+a zero-copy slice; once the slices add up to SHARD_FANOUT_MIN_ROWS rows they are scanned
+in parallel on a dedicated pool of SHARD_SCAN_WORKERS threads (NumPy releases the GIL)
+and the per-shard top-k lists merged by score.
+"""
+import os
+import json
+import mmap
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+FLAT_INDEX_DIR = "flat_index"
+_VECTORS = "vectors.npy"
+_DOCS = "docs.bin"
+_OFFSETS = "offsets.npy"
+_META = "meta.json"
+
+# multi-shard searches over at least this many rows fan out over the shard-scan pool
+SHARD_FANOUT_MIN_ROWS = int(os.getenv("SHARD_FANOUT_MIN_ROWS", "20000"))
+SHARD_SCAN_WORKERS = int(os.getenv("SHARD_SCAN_WORKERS", str(min(8, os.cpu_count() or 1))))
+
+_scan_pool: Optional[ThreadPoolExecutor] = None
+_scan_pool_lock = threading.Lock()
+
+
+def _get_scan_pool() -> ThreadPoolExecutor:
+    # a pool of its own: searches run on planner threads, and waiting there on tasks
+    # queued behind them in the same pool would deadlock it under load. Scans never
+    # submit further work, so this pool always drains.
+    global _scan_pool
+    if _scan_pool is None:
+        with _scan_pool_lock:
+            if _scan_pool is None:
+                _scan_pool = ThreadPoolExecutor(max_workers=SHARD_SCAN_WORKERS, thread_name_prefix="shard-scan")
+    return _scan_pool
+
+
+def write_index(out_dir: str, embeddings: Sequence[Sequence[float]], texts: Sequence[str],
+                metadatas: Sequence[Optional[Dict]]) -> dict:
+    """Write a flat index; meta.json is replaced last, so readers never see a half-written index."""
+    os.makedirs(out_dir, exist_ok=True)
+    vectors = np.asarray(embeddings, dtype=np.float32)
+    if vectors.ndim != 2 or len(vectors) != len(texts):
+        raise ValueError("embeddings must be a [n, dim] matrix with one row per text")
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    vectors /= np.where(norms == 0, 1.0, norms)
+
+    # group rows by shard (stable, so rows keep their order within a shard)
+    shard_of = [(m or {}).get("shard") or "" for m in metadatas]
+    shards = {}
+    if any(shard_of):
+        order = sorted(range(len(texts)), key=shard_of.__getitem__)
+        vectors = vectors[order]
+        texts = [texts[i] for i in order]
+        metadatas = [metadatas[i] for i in order]
+        for row, i in enumerate(order):
+            start, _ = shards.get(shard_of[i], (row, row))
+            shards[shard_of[i]] = (start, row + 1)
+
+    offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+    tmp_docs = os.path.join(out_dir, _DOCS + ".tmp")
+    with open(tmp_docs, "wb") as f:
+        for i, (text, meta) in enumerate(zip(texts, metadatas)):
+            record = json.dumps({"t": text or "", "m": meta or {}}, ensure_ascii=False).encode("utf-8")
+            f.write(record)
+            offsets[i + 1] = offsets[i] + len(record)
+
+    for name, array in ((_VECTORS, vectors), (_OFFSETS, offsets)):
+        tmp = os.path.join(out_dir, name + ".tmp")
+        with open(tmp, "wb") as f:
+            np.save(f, array)
+        os.replace(tmp, os.path.join(out_dir, name))
+    os.replace(tmp_docs, os.path.join(out_dir, _DOCS))
+
+    meta = {"count": int(len(texts)), "dim": int(vectors.shape[1]) if len(vectors) else 0,
+            "shards": {name: [int(start), int(end)] for name, (start, end) in shards.items()}}
+    tmp_meta = os.path.join(out_dir, _META + ".tmp")
+    with open(tmp_meta, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(tmp_meta, os.path.join(out_dir, _META))
+    return meta
+
+
+def exists(path: str = FLAT_INDEX_DIR) -> bool:
+    return os.path.exists(os.path.join(path, _META))
+
+
+class FlatIndex:
+    """mmap-backed exact nearest-neighbour search over normalised vectors."""
+
+    def __init__(self, path: str = FLAT_INDEX_DIR):
+        self.path = path
+        with open(os.path.join(path, _META), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.vectors = np.load(os.path.join(path, _VECTORS), mmap_mode="r")
+        self.offsets = np.load(os.path.join(path, _OFFSETS), mmap_mode="r")
+        self._docs_file = open(os.path.join(path, _DOCS), "rb")
+        size = os.fstat(self._docs_file.fileno()).st_size
+        self._docs = mmap.mmap(self._docs_file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    def __len__(self) -> int:
+        return int(self.vectors.shape[0])
+
+    def document(self, i: int) -> Document:
+        record = json.loads(self._docs[int(self.offsets[i]):int(self.offsets[i + 1])])
+        return Document(page_content=record["t"], metadata=record["m"])
+
+    @property
+    def shards(self) -> Dict[str, Tuple[int, int]]:
+        return {name: (start, end) for name, (start, end) in self.meta.get("shards", {}).items()}
+
+    def search(self, queries: np.ndarray, k: int, shards: Optional[Sequence[str]] = None) -> List[List[int]]:
+        """Row indices of the top-k rows per query (queries: [m, dim]), best first."""
+        return self.search_scored(queries, k, shards)[0]
+
+    def search_scored(self, queries: np.ndarray, k: int,
+                      shards: Optional[Sequence[str]] = None) -> Tuple[List[List[int]], List[List[float]]]:
+        """
+        (row indices, cosine scores) of the top-k rows per query. `shards` limits the
+        scan to those shards (None = the whole index; unknown names are ignored).
+        """
+        if shards is None or not self.meta.get("shards"):
+            ranges = [(0, len(self))]
+        else:
+            known = self.shards
+            ranges = [known[name] for name in dict.fromkeys(shards) if name in known]
+        ranges = [(start, end) for start, end in ranges if end > start]
+        if not ranges or k <= 0:
+            return [[] for _ in range(len(queries))], [[] for _ in range(len(queries))]
+        q = np.asarray(queries, dtype=np.float32)
+        q = q / np.maximum(np.linalg.norm(q, axis=1, keepdims=True), 1e-12)
+
+        if len(ranges) > 1 and sum(end - start for start, end in ranges) >= SHARD_FANOUT_MIN_ROWS:
+            pool = _get_scan_pool()
+            futures = [pool.submit(self._top_k, q, k, start, end) for start, end in ranges]
+            parts = [f.result() for f in futures]
+        else:
+            parts = [self._top_k(q, k, start, end) for start, end in ranges]
+
+        rows = np.concatenate([p[0] for p in parts], axis=1)
+        scores = np.concatenate([p[1] for p in parts], axis=1)
+        if len(parts) > 1:
+            best = np.argsort(-scores, axis=1, kind="stable")[:, :k]
+            rows = np.take_along_axis(rows, best, axis=1)
+            scores = np.take_along_axis(scores, best, axis=1)
+        return rows.tolist(), scores.tolist()
+
+    def _top_k(self, q: np.ndarray, k: int, start: int, end: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Best-first (rows, scores) of the top-k rows of vectors[start:end] for each query."""
+        scores = q @ self.vectors[start:end].T
+        n = end - start
+        k = min(k, n)
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k] if k < n else np.tile(np.arange(n), (len(q), 1))
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind="stable")
+        return np.take_along_axis(top, order, axis=1) + start, np.take_along_axis(top_scores, order, axis=1)
+
+    def close(self):
+        if isinstance(self._docs, mmap.mmap):
+            self._docs.close()
+        self._docs_file.close()
+
+
+class FlatVectorStore:
+    """The subset of the Chroma vector-store interface that rag_store1 and its callers use."""
+
+    def __init__(self, index: FlatIndex, embeddings):
+        self.index = index
+        self.embeddings = embeddings
+
+    @property
+    def shards(self) -> List[str]:
+        return list(self.index.shards)
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4,
+                                    shards: Optional[Sequence[str]] = None, **kwargs) -> List[Document]:
+        return self.similarity_search_by_vectors([embedding], k=k, shards=shards)[0]
+
+    def similarity_search_by_vectors(self, embeddings: List[List[float]], k: int = 4,
+                                     shards: Optional[Sequence[str]] = None) -> List[List[Document]]:
+        if not embeddings:
+            return []
+        hits = self.index.search(np.asarray(embeddings, dtype=np.float32), k, shards)
+        return [[self.index.document(i) for i in row] for row in hits]
+
+    def similarity_search_with_vectors(self, embedding: List[float], k: int = 4,
+                                       shards: Optional[Sequence[str]] = None) -> Tuple[List[Document], np.ndarray]:
+        """Top-k documents and their (normalised) vectors, for rerankers that need both."""
+        rows = self.index.search(np.asarray([embedding], dtype=np.float32), k, shards)[0]
+        return [self.index.document(i) for i in rows], np.asarray(self.index.vectors[rows])
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs) -> List[Document]:
+        return self.similarity_search_by_vector(self.embeddings.embed_query(query), k=k)
+
+    def as_retriever(self, search_kwargs: Optional[Dict] = None) -> "FlatRetriever":
+        return FlatRetriever(self, search_kwargs or {})
+
+
+class FlatRetriever:
+    def __init__(self, vectorstore: FlatVectorStore, search_kwargs: Dict):
+        self.vectorstore = vectorstore
+        self.search_kwargs = search_kwargs
+
+    def get_relevant_documents(self, query: str) -> List[Document]:
+        return self.vectorstore.similarity_search(query, k=self.search_kwargs.get("k", 4))
+
+    invoke = get_relevant_documents
@@ -0,0 +1,370 @@
+# llm_gateway.py
+import os
+import time
+import random
+import hashlib
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Any, Callable, List, Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.language_models.chat_models import SimpleChatModel
+from langchain_core.messages import BaseMessage
+
+import metrics
+import tracing
+from admission import AdmissionController, AdmissionRejected
+
+
+class GatewayError(Exception):
+    """Raised when an LLM call fails after all retries (or times out)."""
+
+
+class CircuitOpenError(GatewayError):
+    """Raised without calling the provider while the circuit breaker is open."""
+
+
+class ProviderRequestError(GatewayError):
+    """Raised at once, without retrying, for errors a retry cannot fix (bad request, auth, context length)."""
+
+
+# provider / HTTP client exceptions that mean "try again" (groq, openai, httpx), matched by
+# name so no SDK has to be imported here; groq's APITimeoutError subclasses APIConnectionError
+_TRANSIENT_ERRORS = {"APIConnectionError", "APITimeoutError", "TimeoutException", "NetworkError",
+                     "RemoteProtocolError"}
+
+
+def is_transient(error: BaseException) -> bool:
+    """True for timeouts, connection errors, 429 and 5xx: worth retrying and counted by the breaker."""
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    if isinstance(status, int):
+        return status == 429 or status >= 500
+    return any(cls.__name__ in _TRANSIENT_ERRORS for cls in type(error).__mro__)
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+# --------------------------------------------------
+# CIRCUIT BREAKER
+# --------------------------------------------------
+class CircuitBreaker:
+    """
+    Classic closed -> open -> half-open breaker.
+    After `failure_threshold` consecutive failures the circuit opens for `reset_timeout_s`;
+    then a single probe call is let through and its outcome decides whether to close again.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout_s: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_s = reset_timeout_s
+        self._failures = 0
+        self._opened_at = None
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state_locked()
+
+    def _state_locked(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_timeout_s:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self._state_locked()
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probe_in_flight = False
+
+    def abandon(self):
+        """The allowed call says nothing about provider health (never sent, or a bad request): free the probe, count nothing."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probe_in_flight or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._probe_in_flight = False
+
+
+# --------------------------------------------------
+# GATEWAY
+# --------------------------------------------------
+class LLMGateway:
+    """
+    Wraps provider calls with a per-call deadline, jittered exponential retries,
+    optional hedging (a duplicate request fired once the first one is slower than
+    the recent `hedge_percentile` latency) and a circuit breaker. When an
+    AdmissionController is attached, every provider request (each attempt and each
+    hedge) holds its own slot until the provider returns, so the cap bounds what is
+    really in flight: no slot is held during backoff sleeps, and a hedge is only
+    fired if a slot is free right away.
+
+    Python threads cannot be killed, so a timed-out attempt keeps running in the
+    pool (and keeps its slot) until the provider returns; the provider client should
+    therefore also be given its own request timeout (see build_chat_model).
+    """
+
+    def __init__(self, timeout_s: float = 15.0, max_retries: int = 2,
+                 backoff_base_s: float = 0.25, backoff_max_s: float = 2.0,
+                 hedge_percentile: float = 0.0, hedge_min_samples: int = 20,
+                 breaker: Optional[CircuitBreaker] = None, max_workers: int = 16,
+                 admission: Optional[AdmissionController] = None):
+        self.timeout_s = timeout_s
+        self.max_retries = max_retries
+        self.backoff_base_s = backoff_base_s
+        self.backoff_max_s = backoff_max_s
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.breaker = breaker or CircuitBreaker()
+        self.admission = admission
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm-gw")
+        self._latencies = deque(maxlen=200)
+        self._lat_lock = threading.Lock()
+
+        # simple counters for debugging / metrics
+        self.calls = 0
+        self.retries = 0
+        self.hedges = 0
+        self.timeouts = 0
+        self.rejected = 0
+
+    @classmethod
+    def from_env(cls) -> "LLMGateway":
+        breaker = CircuitBreaker(
+            failure_threshold=int(_env_float("LLM_BREAKER_FAILURES", 5)),
+            reset_timeout_s=_env_float("LLM_BREAKER_RESET_S", 30.0),
+        )
+        return cls(
+            timeout_s=_env_float("LLM_TIMEOUT_S", 15.0),
+            max_retries=int(_env_float("LLM_MAX_RETRIES", 2)),
+            hedge_percentile=_env_float("LLM_HEDGE_PERCENTILE", 0.0),
+            breaker=breaker,
+            admission=AdmissionController.from_env(),
+        )
+
+    # ---------------- latency tracking ----------------
+    def _record_latency(self, seconds: float):
+        with self._lat_lock:
+            self._latencies.append(seconds)
+
+    def _hedge_delay(self) -> Optional[float]:
+        if not self.hedge_percentile:
+            return None
+        with self._lat_lock:
+            if len(self._latencies) < self.hedge_min_samples:
+                return None
+            ordered = sorted(self._latencies)
+        idx = min(len(ordered) - 1, int(len(ordered) * self.hedge_percentile / 100.0))
+        return ordered[idx]
+
+    def _backoff(self, attempt: int) -> float:
+        # "full jitter": uniform in [0, min(max, base * 2^attempt)]
+        return random.uniform(0, min(self.backoff_max_s, self.backoff_base_s * (2 ** attempt)))
+
+    # ---------------- single attempt ----------------
+    def _submit(self, fn: Callable, args, kwargs, block: bool = True):
+        """
+        Start fn in the pool under its own admission slot, released when the provider
+        call returns (not when the attempt gives up on it). None if block=False and no
+        slot is free.
+        """
+        if self.admission is None:
+            return self._pool.submit(fn, *args, **kwargs)
+        if not self.admission.acquire(block=block):
+            return None
+        try:
+            future = self._pool.submit(fn, *args, **kwargs)
+        except BaseException:
+            self.admission.release()
+            raise
+        future.add_done_callback(lambda _: self.admission.release())
+        return future
+
+    def _attempt(self, fn: Callable, args, kwargs, hedge: bool):
+        futures = [self._submit(fn, args, kwargs)]  # may wait for a slot: not part of the deadline
+        started = time.monotonic()
+        deadline = started + self.timeout_s
+
+        hedge_delay = self._hedge_delay() if hedge else None
+        if hedge_delay is not None and hedge_delay < self.timeout_s:
+            done, _ = wait(futures, timeout=hedge_delay)
+            # a hedge never queues: under load it would only add to the pressure
+            duplicate = None if done else self._submit(fn, args, kwargs, block=False)
+            if duplicate is not None:
+                self.hedges += 1
+                futures.append(duplicate)
+
+        last_error = None
+        pending = set(futures)
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for f in done:
+                if f.exception() is None:
+                    for other in pending:
+                        other.cancel()
+                    self._record_latency(time.monotonic() - started)
+                    return f.result()
+                last_error = f.exception()
+
+        if last_error is not None and not pending:
+            raise last_error
+        self.timeouts += 1
+        raise TimeoutError(f"LLM call exceeded {self.timeout_s:.1f}s deadline")
+
+    # ---------------- public API ----------------
+    @tracing.span("llm_call")
+    def call(self, fn: Callable, *args, hedge: bool = False, **kwargs) -> Any:
+        """
+        Invoke `fn(*args, **kwargs)` under the gateway policy.
+        Only pass hedge=True for idempotent calls (a hedged duplicate may also complete).
+        Only transient errors (is_transient) are retried and counted by the breaker; any other
+        error raises ProviderRequestError at once. Raises CircuitOpenError if the breaker is
+        open, GatewayError once retries are exhausted, and admission.AdmissionRejected if no
+        provider slot frees up in time.
+        """
+        with metrics.stage("llm"):
+            return self._call_with_retries(fn, args, kwargs, hedge)
+
+    def _call_with_retries(self, fn: Callable, args, kwargs, hedge: bool) -> Any:
+        if not self.breaker.allow():
+            self.rejected += 1
+            raise CircuitOpenError("LLM circuit breaker is open")
+
+        self.calls += 1
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self.retries += 1
+                time.sleep(self._backoff(attempt - 1))
+            try:
+                result = self._attempt(fn, args, kwargs, hedge)
+                self.breaker.record_success()
+                return result
+            except AdmissionRejected:
+                # never reached the provider: neither a success nor a failure
+                self.breaker.abandon()
+                raise
+            except Exception as e:
+                if not is_transient(e):
+                    # the same request would fail again, and it says nothing about provider health
+                    self.breaker.abandon()
+                    raise ProviderRequestError(f"{type(e).__name__}: {e}") from e
+                last_error = e
+                print(f"[llm_gateway] attempt {attempt + 1} failed: {e}")
+                self.breaker.record_failure()
+                if self.breaker.state == "open":
+                    break
+
+        raise GatewayError(str(last_error)) from last_error
+
+    def stats(self) -> dict:
+        return {
+            "state": self.breaker.state,
+            "calls": self.calls,
+            "retries": self.retries,
+            "hedges": self.hedges,
+            "timeouts": self.timeouts,
+            "rejected": self.rejected,
+            "hedge_delay_s": self._hedge_delay(),
+            "admission": self.admission.stats() if self.admission else None,
+        }
+
+
+# --------------------------------------------------
+# FAKE LOCAL BACKEND (offline / load tests)
+# --------------------------------------------------
+class FakeChatModel(SimpleChatModel):
+    """
+    Deterministic stand-in for ChatGroq. The reply depends only on the last human
+    message and the first line of the per-turn context, so runs are reproducible.
+    `latency_ms` adds a fixed sleep to mimic provider round-trips.
+    """
+
+    latency_ms: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-ecommerce-chat"
+
+    def _call(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+              run_manager: Any = None, **kwargs: Any) -> str:
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000.0)
+
+        human = next((m.content for m in reversed(messages) if m.type == "human"), "")
+        # first system message is the persona prompt; later ones carry retrieved context
+        context_lines = [
+            line.strip()
+            for m in [m for m in messages if m.type == "system"][1:]
+            for line in str(m.content).splitlines()
+            if line.strip() and not line.strip().endswith(":")
+        ]
+        digest = hashlib.sha1(str(human).encode("utf-8")).hexdigest()[:8]
+        if context_lines:
+            return f"[{digest}] Based on what I found: {context_lines[0][:200]}"
+        return f"[{digest}] Thanks for your message. How can I help with your shopping today?"
+
+
+class TokenUsageCallback(BaseCallbackHandler):
+    """Feeds provider-reported token usage (llm_output["token_usage"]) into metrics."""
+
+    def on_llm_end(self, response, **kwargs):
+        usage = (getattr(response, "llm_output", None) or {}).get("token_usage") or {}
+        metrics.record_tokens(
+            prompt=int(usage.get("prompt_tokens") or 0),
+            completion=int(usage.get("completion_tokens") or 0),
+        )
+
+
+def build_chat_model(model_name: str, temperature: float, timeout_s: float):
+    """
+    Select the chat backend from LLM_BACKEND ("groq" by default, "fake" for offline runs).
+    The provider client's own retries are disabled; LLMGateway owns the retry policy.
+    """
+    backend = os.getenv("LLM_BACKEND", "groq").lower()
+    if backend == "fake":
+        return FakeChatModel(latency_ms=_env_float("FAKE_LLM_LATENCY_MS", 0.0))
+
+    from langchain_groq import ChatGroq
+
+    groq_key = os.getenv("GROQ_API_KEY")
+    if not groq_key:
+        raise ValueError("GROQ_API_KEY missing in environment")
+    return ChatGroq(
+        temperature=temperature,
+        model_name=model_name,
+        groq_api_key=groq_key,
+        timeout=timeout_s,
+        max_retries=0,
+        callbacks=[TokenUsageCallback()],
+    )
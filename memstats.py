@@ -0,0 +1,50 @@
+# memstats.py
+"""
+Per-process memory accounting (Linux /proc).
+
+RSS counts every resident page, including pages shared copy-on-write with a pre-fork
+parent or mapped from the same index files by sibling workers. PSS divides each shared
+page by the number of processes mapping it, so summing PSS over workers gives the
+real footprint. Shared/private splits show how much of a worker is still shared.
+"""
+import os
+from typing import Dict, Optional
+
+import metrics
+
+_FIELDS = {
+    "Rss": "rss",
+    "Pss": "pss",
+    "Shared_Clean": "shared_clean",
+    "Shared_Dirty": "shared_dirty",
+    "Private_Clean": "private_clean",
+    "Private_Dirty": "private_dirty",
+}
+
+
+def process_memory(pid: Optional[int] = None) -> Dict[str, int]:
+    """Memory of `pid` (default: this process) in bytes; empty dict where /proc is unavailable."""
+    pid = pid or os.getpid()
+    out: Dict[str, int] = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", "r") as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                name = _FIELDS.get(key.strip())
+                if name:
+                    out[name] = int(rest.split()[0]) * 1024
+    except OSError:
+        pass
+    return out
+
+
+def format_mb(stats: Dict[str, int]) -> str:
+    return " ".join(f"{k}={v / 1048576:.1f}MB" for k, v in stats.items())
+
+
+@metrics.register_collector
+def _memory_metrics():
+    pid = str(os.getpid())
+    return metrics.sample_lines(
+        "ecom_process_memory_bytes", "Worker memory by kind (rss, pss, shared_*, private_*)",
+        {(("pid", pid), ("kind", k)): v for k, v in process_memory().items()})
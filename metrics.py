@@ -0,0 +1,220 @@
+# metrics.py
+import time
+import bisect
+import threading
+import contextvars
+from contextlib import contextmanager
+from functools import wraps
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Latency buckets in milliseconds (Prometheus "le" upper bounds)
+DEFAULT_BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+_current_intent = contextvars.ContextVar("metrics_intent", default="none")
+_current_timings = contextvars.ContextVar("metrics_timings", default=None)
+_routing_started = contextvars.ContextVar("metrics_routing_started", default=None)
+
+
+def _fmt_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(v) -> str:
+    return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_fmt_labels(self.labels, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS_MS):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets))
+        # per label set: [bucket counts..., +Inf count], sum
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labels)
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][idx] += 1
+            series[1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(k, list(v[0]), v[1]) for k, v in self._series.items()]
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, c in zip(self.buckets, counts):
+                cumulative += c
+                le = 'le="%s"' % bound
+                lines.append(f"{self.name}_bucket{_fmt_labels(self.labels, key, le)} {cumulative}")
+            cumulative += counts[-1]
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_fmt_labels(self.labels, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_fmt_labels(self.labels, key)} {round(total, 3)}")
+            lines.append(f"{self.name}_count{_fmt_labels(self.labels, key)} {cumulative}")
+        return lines
+
+
+# --------------------------------------------------
+# REGISTRY
+# --------------------------------------------------
+_METRICS = []
+# callables returning extra exposition lines (gauges read from other components)
+_COLLECTORS: List[Callable[[], List[str]]] = []
+
+
+def _register(metric):
+    _METRICS.append(metric)
+    return metric
+
+
+def register_collector(fn: Callable[[], List[str]]):
+    _COLLECTORS.append(fn)
+    return fn
+
+
+STAGE_LATENCY = _register(Histogram(
+    "ecom_stage_latency_ms", "Latency of pipeline stages in milliseconds", ("stage", "intent")))
+PROCESS_LATENCY = _register(Histogram(
+    "ecom_process_latency_ms", "End-to-end EcommerceLLM.process latency in milliseconds", ("intent",)))
+HTTP_LATENCY = _register(Histogram(
+    "ecom_http_request_latency_ms", "HTTP request latency in milliseconds", ("method", "route", "status")))
+CACHE_EVENTS = _register(Counter(
+    "ecom_cache_events_total", "Cache lookups by cache and result (hit/miss)", ("cache", "result")))
+LLM_TOKENS = _register(Counter(
+    "ecom_llm_tokens_total", "LLM tokens reported by the provider", ("kind",)))
+
+
+# --------------------------------------------------
+# RECORDING HELPERS
+# --------------------------------------------------
+def set_intent(intent: str):
+    """
+    Label every stage recorded for the rest of the current request with this intent branch.
+    The first call inside intent_scope() also records the "intent_routing" stage.
+    """
+    _current_intent.set(intent)
+    started = _routing_started.get()
+    if started is not None:
+        _routing_started.set(None)
+        record_stage("intent_routing", (time.perf_counter() - started) * 1000)
+
+
+def current_intent() -> str:
+    return _current_intent.get()
+
+
+@contextmanager
+def intent_scope():
+    token = _current_intent.set("none")
+    routing_token = _routing_started.set(time.perf_counter())
+    try:
+        yield
+    finally:
+        _routing_started.reset(routing_token)
+        _current_intent.reset(token)
+
+
+@contextmanager
+def collect_timings(sink: Optional[Dict[str, float]] = None):
+    """Accumulate per-stage milliseconds for the current request into `sink` (a dict)."""
+    sink = {} if sink is None else sink
+    token = _current_timings.set(sink)
+    try:
+        yield sink
+    finally:
+        _current_timings.reset(token)
+
+
+def record_stage(stage: str, elapsed_ms: float):
+    STAGE_LATENCY.observe(elapsed_ms, stage=stage, intent=_current_intent.get())
+    sink = _current_timings.get()
+    if sink is not None:
+        sink[stage] = round(sink.get(stage, 0.0) + elapsed_ms, 3)
+
+
+@contextmanager
+def stage(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, (time.perf_counter() - start) * 1000)
+
+
+def timed(name: str):
+    """Decorator form of stage()."""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_cache(cache: str, hit: bool):
+    CACHE_EVENTS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def record_tokens(prompt: int = 0, completion: int = 0):
+    if prompt:
+        LLM_TOKENS.inc(prompt, kind="prompt")
+    if completion:
+        LLM_TOKENS.inc(completion, kind="completion")
+
+
+def sample_lines(name: str, help_text: str, values: Dict[Tuple[Tuple[str, str], ...], float],
+                 metric_type: str = "gauge") -> List[str]:
+    """Render {((label, value), ...): number} as one metric family; used by collectors."""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}"]
+    for labels, value in values.items():
+        names = tuple(n for n, _ in labels)
+        vals = tuple(v for _, v in labels)
+        lines.append(f"{name}{_fmt_labels(names, vals)} {value}")
+    return lines
+
+
+def render() -> str:
+    """Prometheus text exposition format (version 0.0.4)."""
+    lines = []
+    for m in _METRICS:
+        lines.extend(m.render())
+    for collector in list(_COLLECTORS):
+        try:
+            lines.extend(collector())
+        except Exception as e:
+            print(f"[metrics] collector failed: {e}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,135 @@
+# onnx_embeddings.py
+"""
+MiniLM sentence embeddings on ONNX Runtime (EMBEDDING_BACKEND=onnx).
+
+The same sentence-transformers model as the "hf" backend, exported once to ONNX and
+(by default) dynamically quantized to int8 weights, then run by ONNX Runtime with a
+fixed thread count. Pooling matches sentence-transformers for all-MiniLM-L6-v2: mean
+over non-padding tokens, then L2 normalisation. Documents are embedded in batches of
+similar length, so short FAQ questions are not padded to the longest product page.
+
+The export lands in ONNX_MODEL_DIR on first use (needs torch + transformers, which the
+hf backend already installs); later processes only load it. Build the index with the
+backend you serve with: int8 vectors are close to, not identical with, fp32 ones
+(benchmarks/embeddings.py measures how close on the real corpus).
+
+    ONNX_MODEL_DIR    export / cache directory (default onnx_models/<model name>)
+    ONNX_QUANTIZE     1 = int8 dynamic quantization (default), 0 = fp32 ONNX
+    ONNX_THREADS      intra-op threads (default OMP_NUM_THREADS, else min(4, cpus))
+    ONNX_BATCH_SIZE   texts per inference call (default 32)
+    ONNX_MAX_LENGTH   token limit per text (default 256, the model's max_seq_length)
+"""
+import os
+import threading
+from typing import List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+ONNX_QUANTIZE = os.getenv("ONNX_QUANTIZE", "1") != "0"
+ONNX_BATCH_SIZE = int(os.getenv("ONNX_BATCH_SIZE", "32"))
+ONNX_MAX_LENGTH = int(os.getenv("ONNX_MAX_LENGTH", "256"))
+
+_FP32 = "model.onnx"
+_INT8 = "model.int8.onnx"
+
+
+def default_model_dir(model_name: str) -> str:
+    return os.getenv("ONNX_MODEL_DIR") or os.path.join("onnx_models", model_name.split("/")[-1])
+
+
+def default_threads() -> int:
+    env = os.getenv("ONNX_THREADS") or os.getenv("OMP_NUM_THREADS")
+    return int(env) if env else min(4, os.cpu_count() or 1)
+
+
+def export_model(model_name: str, out_dir: str, quantize: bool = True) -> str:
+    """Export the transformer to ONNX (dynamic batch / sequence axes), optionally int8-quantize it; returns the path."""
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    os.makedirs(out_dir, exist_ok=True)
+    fp32_path = os.path.join(out_dir, _FP32)
+    if not os.path.exists(fp32_path):
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        model = AutoModel.from_pretrained(model_name).eval()
+        sample = tokenizer(["export sample"], return_tensors="pt")
+        names = ["input_ids", "attention_mask", "token_type_ids"]
+        axes = {name: {0: "batch", 1: "sequence"} for name in names}
+        axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+        tmp = fp32_path + ".tmp"
+        with torch.no_grad():
+            torch.onnx.export(
+                model, tuple(sample[name] for name in names), tmp,
+                input_names=names, output_names=["last_hidden_state"],
+                dynamic_axes=axes, opset_version=14,
+            )
+        os.replace(tmp, fp32_path)
+        tokenizer.save_pretrained(out_dir)
+    if not quantize:
+        return fp32_path
+
+    int8_path = os.path.join(out_dir, _INT8)
+    if not os.path.exists(int8_path):
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        tmp = int8_path + ".tmp"
+        quantize_dynamic(fp32_path, tmp, weight_type=QuantType.QInt8)
+        os.replace(tmp, int8_path)
+    return int8_path
+
+
+class OnnxEmbeddings(Embeddings):
+    """LangChain Embeddings over an ONNX Runtime session; safe to share between threads."""
+
+    def __init__(self, model_name: str, model_dir: Optional[str] = None, quantize: bool = ONNX_QUANTIZE,
+                 threads: Optional[int] = None, batch_size: int = ONNX_BATCH_SIZE,
+                 max_length: int = ONNX_MAX_LENGTH):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        self.model_name = model_name
+        self.model_dir = model_dir or default_model_dir(model_name)
+        self.model_path = export_model(model_name, self.model_dir, quantize)
+        self.quantized = quantize
+        self.threads = threads or default_threads()
+        self.batch_size = batch_size
+        self.max_length = max_length
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = self.threads
+        options.inter_op_num_threads = 1
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(self.model_path, options, providers=["CPUExecutionProvider"])
+        self._inputs = {i.name for i in self.session.get_inputs()}
+        self.tokenizer = AutoTokenizer.from_pretrained(self.model_dir)
+        # fast tokenizers are not re-entrant across threads; inference itself is
+        self._tokenizer_lock = threading.Lock()
+
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        with self._tokenizer_lock:
+            enc = self.tokenizer(texts, padding=True, truncation=True, max_length=self.max_length,
+                                 return_tensors="np")
+        feeds = {name: enc[name].astype(np.int64) for name in self._inputs if name in enc}
+        if "token_type_ids" in self._inputs and "token_type_ids" not in feeds:
+            feeds["token_type_ids"] = np.zeros_like(feeds["input_ids"])
+        hidden = self.session.run(None, feeds)[0]
+        mask = enc["attention_mask"].astype(np.float32)[:, :, None]
+        pooled = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        return pooled / np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        # length-sorted batches keep padding (and wasted FLOPs) low; results go back in input order
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        out = np.empty((len(texts), 0), dtype=np.float32)
+        for start in range(0, len(order), self.batch_size):
+            idx = order[start:start + self.batch_size]
+            vectors = self._embed_batch([texts[i] or "" for i in idx])
+            if out.shape[1] == 0:
+                out = np.empty((len(texts), vectors.shape[1]), dtype=np.float32)
+            out[idx] = vectors
+        return out.tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed_batch([text or ""])[0].tolist()
@@ -1,11 +1,20 @@
 # orders.py
+import os
 import csv
 import ast
+import json
 import uuid
+import sqlite3
+import threading
 from datetime import datetime, timedelta
-from langsmith import traceable
+import tracing
+import metrics
 
 ORDERS_CSV = "orders.csv"
+# "memory" = dict loaded from orders.csv in every process (CSV rewritten on create);
+# "sqlite" = one shared database file, safe for several worker processes
+ORDERS_BACKEND = os.getenv("ORDERS_BACKEND", "memory").lower()
+ORDERS_DB = os.getenv("ORDERS_DB", "orders.db")
 
 ORDER_FIELDS = [
     "order_id",
@@ -67,22 +76,86 @@ def _write_orders_to_csv():
             })
 
 
+class SqliteOrderStore:
+    """
+    Orders in a SQLite file (WAL mode: concurrent readers across processes, one writer).
+    Seeded from orders.csv the first time the table is empty. Connections are per thread
+    and per process, so a store opened before fork() is safe to use in the children.
+    """
+
+    def __init__(self, db_path: str = ORDERS_DB, seed_csv: str = ORDERS_CSV):
+        self.db_path = db_path
+        self._local = threading.local()
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS orders ("
+                " order_id TEXT PRIMARY KEY COLLATE NOCASE, user_email TEXT, user_name TEXT,"
+                " items TEXT, total_amount REAL, currency TEXT, status TEXT,"
+                " placed_date TEXT, estimated_delivery TEXT)"
+            )
+        if conn.execute("SELECT 1 FROM orders LIMIT 1").fetchone() is None:
+            seeded = load_orders(seed_csv)
+            with conn:
+                conn.executemany(
+                    "INSERT OR IGNORE INTO orders VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    [self._row(o) for o in seeded.values()],
+                )
+            print(f"[orders] seeded {len(seeded)} orders into {db_path}")
+
+    def _conn(self) -> sqlite3.Connection:
+        pid = os.getpid()
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != pid:
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn, self._local.pid = conn, pid
+        return conn
+
+    @staticmethod
+    def _row(o: dict) -> tuple:
+        return (o["order_id"], o["user_email"], o["user_name"], json.dumps(o["items"]),
+                o["total_amount"], o["currency"], o["status"], o["placed_date"], o["estimated_delivery"])
+
+    def get(self, order_id: str):
+        r = self._conn().execute("SELECT * FROM orders WHERE order_id = ?", (order_id,)).fetchone()
+        if r is None:
+            return None
+        o = dict(r)
+        o["items"] = json.loads(o["items"] or "[]")
+        return o
+
+    def add(self, order: dict):
+        conn = self._conn()
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO orders VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", self._row(order))
+
+
 # Load once at startup
-_ORDERS = load_orders()
+_DB = SqliteOrderStore() if ORDERS_BACKEND == "sqlite" else None
+_ORDERS = load_orders() if _DB is None else {}
+# serialises inserts into _ORDERS with the CSV rewrite that iterates it
+_ORDERS_LOCK = threading.Lock()
 
 
 # --------------------------------------------------
 # ORDER STATUS TOOL (UNCHANGED)
 # --------------------------------------------------
-@traceable(name="order_status_lookup")
+@tracing.span("order_status_lookup")
+@metrics.timed("order_lookup")
 def get_order_status(order_id: str, user_email: str = None):
     if not order_id:
         return None
 
-    o = _ORDERS.get(order_id)
+    if _DB is not None:
+        o = _DB.get(order_id)   # order_id column is COLLATE NOCASE
+    else:
+        o = _ORDERS.get(order_id)
 
-    if o is None:
-        for oid, data in _ORDERS.items():
+    if o is None and _DB is None:
+        for oid, data in list(_ORDERS.items()):
             if oid.lower() == order_id.lower():
                 o = data
                 break
@@ -97,14 +170,20 @@ def get_order_status(order_id: str, user_email: str = None):
 # --------------------------------------------------
 # CREATE ORDER TOOL (NEW)
 # --------------------------------------------------
-@traceable(name="create_order")
+@tracing.span("create_order")
+@metrics.timed("create_order")
 def create_order(product: dict, quantity: int, user_email: str, user_name: str):
     order_id = f"ORD{uuid.uuid4().int % 1_000_000}"
 
     placed_date = datetime.now()
     estimated_delivery = placed_date + timedelta(days=7)
 
-    total_amount = float(product["final_price"]) * quantity
+    # the catalog is authoritative for price; the product dict may come from search metadata
+    from product_catalog import get_catalog
+    unit_price = get_catalog().price(product["prod_id"])
+    if unit_price is None:
+        unit_price = float(product["final_price"])
+    total_amount = unit_price * quantity
 
     new_order = {
         "order_id": order_id,
@@ -114,7 +193,7 @@ def create_order(product: dict, quantity: int, user_email: str, user_name: str):
             "prod_id": product["prod_id"],
             "title": product["title"],
             "qty": quantity,
-            "price": product["final_price"],
+            "price": unit_price,
         }],
         "total_amount": round(total_amount, 2),
         "currency": product.get("currency", "INR"),
@@ -123,10 +202,15 @@ def create_order(product: dict, quantity: int, user_email: str, user_name: str):
         "estimated_delivery": estimated_delivery.strftime("%d-%m-%Y"),
     }
 
-    # Update in-memory store
-    _ORDERS[order_id] = new_order
+    if _DB is not None:
+        _DB.add(new_order)
+        return new_order
+
+    with _ORDERS_LOCK:
+        # Update in-memory store
+        _ORDERS[order_id] = new_order
 
-    # Persist to CSV
-    _write_orders_to_csv()
+        # Persist to CSV
+        _write_orders_to_csv()
 
     return new_order
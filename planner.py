@@ -0,0 +1,135 @@
+# planner.py
+"""
+Concurrent execution of independent pipeline steps.
+
+    planner = get_planner()
+    out = planner.run({"order": (get_order_status, order_id),
+                       "ret": (get_return_by_order, order_id)})
+
+run() starts every step at once and returns when the slowest finishes, so a branch
+costs max(step) instead of sum(step). Each step runs in a copy of the caller's
+contextvars (metrics intent + timings sink, admission priority, batch query vectors,
+trace span), so it is accounted to the request that launched it.
+
+Speculator holds work started before it is known to be needed (retrieval on a stable
+partial transcript, or on a likely intent while a cheaper path is tried first).
+take() hands a pending Future to the request that turns out to need it; entries nobody
+claims are cancelled when they expire or are discarded.
+
+    PLANNER_MAX_WORKERS   shared pool size (default 32)
+"""
+import os
+import time
+import threading
+import contextvars
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+import metrics
+
+MAX_WORKERS = int(os.getenv("PLANNER_MAX_WORKERS", "32"))
+
+
+class Planner:
+    def __init__(self, max_workers: int = MAX_WORKERS):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="planner")
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        ctx = contextvars.copy_context()
+        return self._pool.submit(ctx.run, fn, *args, **kwargs)
+
+    def run(self, steps: Dict[str, Tuple]) -> Dict[str, Any]:
+        """
+        {name: (fn, *args)} -> {name: result}, all steps in parallel. If a step raises,
+        the exception is re-raised here after the others have been cancelled or finished.
+        """
+        futures = {name: self.submit(step[0], *step[1:]) for name, step in steps.items()}
+        results, error = {}, None
+        for name, fut in futures.items():
+            try:
+                results[name] = fut.result()
+            except Exception as e:
+                error = error or e
+                for other in futures.values():
+                    other.cancel()
+        if error is not None:
+            raise error
+        return results
+
+
+class Speculator:
+    """Bounded, short-lived key -> Future map for speculative work."""
+
+    def __init__(self, planner: Planner, max_entries: int = 256, ttl_s: float = 15.0):
+        self.planner = planner
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self._entries: "OrderedDict[Hashable, Tuple[Future, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.started = 0
+        self.used = 0
+        self.wasted = 0
+
+    def start(self, key: Hashable, fn: Callable, *args, **kwargs) -> bool:
+        """Begin `fn` for `key` unless it is already pending; returns True if started."""
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            if key in self._entries:
+                return False
+            fut = self.planner.submit(fn, *args, **kwargs)
+            self._entries[key] = (fut, now)
+            while len(self._entries) > self.max_entries:
+                self._drop(self._entries.popitem(last=False)[1][0])
+            self.started += 1
+        return True
+
+    def take(self, key: Hashable) -> Optional[Future]:
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self.used += 1
+        metrics.record_cache("speculative", entry is not None)
+        return entry[0] if entry else None
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def discard(self, key: Hashable):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._drop(entry[0])
+
+    def _expire(self, now: float):
+        while self._entries:
+            key, (fut, started) = next(iter(self._entries.items()))
+            if now - started < self.ttl_s:
+                break
+            self._entries.popitem(last=False)
+            self._drop(fut)
+
+    def _drop(self, fut: Future):
+        # not-yet-started work is cancelled; running work finishes and is ignored
+        fut.cancel()
+        self.wasted += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            pending = len(self._entries)
+        return {"started": self.started, "used": self.used, "wasted": self.wasted, "pending": pending}
+
+
+_planner: Optional[Planner] = None
+_planner_lock = threading.Lock()
+
+
+def get_planner() -> Planner:
+    global _planner
+    if _planner is None:
+        with _planner_lock:
+            if _planner is None:
+                _planner = Planner()
+    return _planner
@@ -0,0 +1,197 @@
+# product_catalog.py
+"""
+Compact columnar product catalog with O(1) lookup by prod_id.
+
+Loaded once from products.csv (same parsing and prod_ids as the RAG index:
+rag_store1.product_ids). Each field is one column: NumPy arrays for numbers, lists of interned
+strings for text (brand / currency / availability repeat a lot). A dict maps
+prod_id -> row. No per-product dicts or LangChain Documents are kept, so a catalog
+of 100k products costs a few tens of MB and a lookup costs about a microsecond.
+
+Rebuilt automatically when the catalog watcher swaps in a new index generation.
+"""
+import re
+import sys
+import threading
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+import rag_store1
+from rag_store1 import parse_number, safe_get
+
+PRODUCTS_CSV = "products.csv"
+
+# availability column: 1 in stock, 0 unavailable, -1 unknown (empty in the CSV)
+IN_STOCK, OUT_OF_STOCK, UNKNOWN = 1, 0, -1
+_UNAVAILABLE = ("unavailable", "out of stock", "sold out", "not available")
+_ID_TOKEN = re.compile(r"[A-Za-z0-9][A-Za-z0-9_\-]{3,}")
+
+
+def _stock_state(availability: str) -> int:
+    a = availability.lower()
+    if not a:
+        return UNKNOWN
+    return OUT_OF_STOCK if any(w in a for w in _UNAVAILABLE) else IN_STOCK
+
+
+def _number(value, default=np.nan) -> float:
+    v = parse_number(value)
+    return float(v) if isinstance(v, (int, float)) and v == v else default
+
+
+class ProductCatalog:
+    __slots__ = ("ids", "titles", "brands", "currencies", "availability", "urls", "categories",
+                 "final_price", "initial_price", "rating", "reviews_count", "stock", "_row")
+
+    def __init__(self, rows: Iterable[dict]):
+        intern: Dict[str, str] = {}
+
+        def shared(s: str) -> str:
+            return intern.setdefault(s, s)
+
+        ids, titles, brands, currencies, availability, urls, categories = [], [], [], [], [], [], []
+        final_price, initial_price, rating, reviews, stock = [], [], [], [], []
+        rows = list(rows)
+        row_of: Dict[str, int] = {}
+        # same ids as the RAG index (colliding ids are suffixed there and here alike)
+        for row, pid in zip(rows, rag_store1.product_ids(rows)):
+            row_of[pid] = len(ids)
+            ids.append(pid)
+            titles.append(safe_get(row, "title"))
+            brands.append(shared(safe_get(row, "brand")))
+            currencies.append(shared(safe_get(row, "currency")))
+            avail = shared(safe_get(row, "availability"))
+            availability.append(avail)
+            urls.append(safe_get(row, "url"))
+            categories.append(shared(safe_get(row, "categories")))
+            final_price.append(_number(row.get("final_price", "")))
+            initial_price.append(_number(row.get("initial_price", "")))
+            rating.append(_number(row.get("rating", "")))
+            reviews.append(_number(row.get("reviews_count", ""), 0))
+            stock.append(_stock_state(avail))
+
+        self.ids = ids
+        self.titles = titles
+        self.brands = brands
+        self.currencies = currencies
+        self.availability = availability
+        self.urls = urls
+        self.categories = categories
+        self.final_price = np.asarray(final_price, dtype=np.float64)
+        self.initial_price = np.asarray(initial_price, dtype=np.float64)
+        self.rating = np.asarray(rating, dtype=np.float32)
+        self.reviews_count = np.asarray(reviews, dtype=np.int64)
+        self.stock = np.asarray(stock, dtype=np.int8)
+        self._row = row_of
+
+    @classmethod
+    def from_csv(cls, csv_path: str = PRODUCTS_CSV) -> "ProductCatalog":
+        df = rag_store1.read_products_frame(csv_path)
+        if df is None:
+            return cls([])
+        # NaN cells are read as "" by safe_get, exactly as when the index is built
+        return cls(df.to_dict("records"))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, prod_id: str) -> bool:
+        return prod_id in self._row
+
+    def row(self, prod_id: str) -> int:
+        """Row index of prod_id, or -1."""
+        return self._row.get((prod_id or "").strip(), -1)
+
+    def price(self, prod_id: str) -> Optional[float]:
+        i = self.row(prod_id)
+        if i < 0:
+            return None
+        p = self.final_price[i]
+        if p != p:  # NaN: fall back to the list price
+            p = self.initial_price[i]
+        return None if p != p else float(p)
+
+    def in_stock(self, prod_id: str) -> Optional[bool]:
+        """True / False, or None when the product is unknown or its availability is blank."""
+        i = self.row(prod_id)
+        if i < 0 or self.stock[i] == UNKNOWN:
+            return None
+        return bool(self.stock[i] == IN_STOCK)
+
+    def title(self, prod_id: str) -> Optional[str]:
+        i = self.row(prod_id)
+        return self.titles[i] if i >= 0 else None
+
+    def product(self, prod_id: str) -> Optional[dict]:
+        """Same shape as tools.format_product_results items, plus rating/reviews/category."""
+        i = self.row(prod_id)
+        if i < 0:
+            return None
+        price = self.price(prod_id)
+        rating = float(self.rating[i])
+        return {
+            "prod_id": self.ids[i],
+            "title": self.titles[i],
+            "brand": self.brands[i],
+            "final_price": "" if price is None else str(price),
+            "currency": self.currencies[i],
+            "availability": self.availability[i],
+            "url": self.urls[i],
+            "rating": None if rating != rating else rating,
+            "reviews_count": int(self.reviews_count[i]),
+            "category": self.categories[i],
+        }
+
+    def find_ids(self, text: str) -> List[str]:
+        """prod_ids that appear verbatim as tokens in free text (e.g. "buy 2 of B07XJ8C8F5")."""
+        return [t for t in _ID_TOKEN.findall(text or "") if t in self._row]
+
+    def enrich_items(self, items: List[dict]) -> List[dict]:
+        """Copies of order items with title / unit price / currency filled in from the catalog."""
+        out = []
+        for it in items or []:
+            it = dict(it)
+            i = self.row(it.get("prod_id"))
+            if i >= 0:
+                it.setdefault("title", self.titles[i])
+                if "price" not in it:
+                    it["price"] = self.price(it["prod_id"])
+                it.setdefault("currency", self.currencies[i])
+            out.append(it)
+        return out
+
+    def memory_bytes(self) -> int:
+        arrays = (self.final_price, self.initial_price, self.rating, self.reviews_count, self.stock)
+        size = sum(a.nbytes for a in arrays) + sys.getsizeof(self._row)
+        for col in (self.ids, self.titles, self.brands, self.currencies, self.availability,
+                    self.urls, self.categories):
+            size += sys.getsizeof(col)
+        # strings: interned columns share objects, so count each distinct string once
+        seen = {id(s): s for col in (self.ids, self.titles, self.brands, self.currencies,
+                                     self.availability, self.urls, self.categories) for s in col}
+        return size + sum(sys.getsizeof(s) for s in seen.values())
+
+    def stats(self) -> dict:
+        return {"products": len(self), "memory_bytes": self.memory_bytes(),
+                "in_stock": int((self.stock == IN_STOCK).sum())}
+
+
+_CATALOG: Optional[ProductCatalog] = None
+_LOCK = threading.Lock()
+
+
+def get_catalog() -> ProductCatalog:
+    global _CATALOG
+    if _CATALOG is None:
+        with _LOCK:
+            if _CATALOG is None:
+                _CATALOG = ProductCatalog.from_csv(PRODUCTS_CSV)
+    return _CATALOG
+
+
+@rag_store1.register_reload_hook
+def _reload_catalog(generation):
+    # built off to the side and swapped in one assignment; readers holding the old one are unaffected
+    global _CATALOG
+    _CATALOG = ProductCatalog.from_csv(PRODUCTS_CSV)
@@ -0,0 +1,202 @@
+# profiling.py
+"""
+On-demand request profiling.
+
+A request is profiled when either
+  - it carries `X-Profile: sample|cprofile` plus `X-Admin-Token: $PROFILE_ADMIN_TOKEN`, or
+  - an admin has armed the next N requests for a path (arm()).
+
+"sample" runs a background sampler that snapshots the request thread's stack every
+PROFILE_SAMPLE_INTERVAL_MS and aggregates collapsed stacks (flamegraph input);
+"cprofile" runs the deterministic cProfile and keeps the pstats dump.
+At most PROFILE_MAX_STORED results are kept (oldest evicted).
+"""
+import io
+import os
+import sys
+import time
+import uuid
+import marshal
+import cProfile
+import pstats
+import threading
+from collections import Counter, deque
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+MODES = ("sample", "cprofile")
+MAX_STORED = int(os.getenv("PROFILE_MAX_STORED", 20))
+SAMPLE_INTERVAL_S = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", 5)) / 1000.0
+
+
+def admin_token() -> Optional[str]:
+    """Profiling admin is disabled unless PROFILE_ADMIN_TOKEN is set."""
+    return os.getenv("PROFILE_ADMIN_TOKEN") or None
+
+
+class ProfileRecord:
+    __slots__ = ("id", "label", "mode", "created", "duration_ms", "samples", "collapsed", "pstats_data")
+
+    def __init__(self, label: str, mode: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.label = label
+        self.mode = mode
+        self.created = time.time()
+        self.duration_ms = 0.0
+        self.samples = 0
+        self.collapsed: Dict[str, int] = {}
+        self.pstats_data: Optional[bytes] = None
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "label": self.label,
+            "mode": self.mode,
+            "created": self.created,
+            "duration_ms": round(self.duration_ms, 2),
+            "samples": self.samples,
+        }
+
+    def collapsed_text(self) -> str:
+        return "\n".join(f"{stack} {n}" for stack, n in
+                         sorted(self.collapsed.items(), key=lambda kv: -kv[1]))
+
+    def pstats_text(self, limit: int = 40) -> str:
+        if self.pstats_data is None:
+            return ""
+        stats = pstats.Stats(_StatsSource(self.pstats_data), stream=io.StringIO())
+        stats.sort_stats("cumulative").print_stats(limit)
+        return stats.stream.getvalue()
+
+
+class _StatsSource:
+    """Adapter so pstats.Stats can load a marshalled stats dict from memory."""
+
+    def __init__(self, data: bytes):
+        self.stats = marshal.loads(data)
+
+    def create_stats(self):
+        pass
+
+
+_records = deque(maxlen=MAX_STORED)
+_armed: Dict[str, List] = {}   # path -> [remaining count, mode]
+_lock = threading.Lock()
+
+
+# --------------------------------------------------
+# ARMING / SELECTION
+# --------------------------------------------------
+def arm(path: str, count: int = 1, mode: str = "sample"):
+    if mode not in MODES:
+        raise ValueError(f"mode must be one of {MODES}")
+    with _lock:
+        _armed[path] = [max(0, count), mode]
+
+
+def disarm(path: str = None):
+    with _lock:
+        if path is None:
+            _armed.clear()
+        else:
+            _armed.pop(path, None)
+
+
+def armed() -> dict:
+    with _lock:
+        return {p: {"remaining": c, "mode": m} for p, (c, m) in _armed.items()}
+
+
+def requested_mode(path: str, headers) -> Optional[str]:
+    """Decide whether this request is profiled; consumes one armed slot if used."""
+    header_mode = (headers.get("x-profile") or "").strip().lower()
+    token = admin_token()
+    if header_mode in MODES and token and headers.get("x-admin-token") == token:
+        return header_mode
+    with _lock:
+        entry = _armed.get(path)
+        if entry and entry[0] > 0:
+            entry[0] -= 1
+            return entry[1]
+    return None
+
+
+# --------------------------------------------------
+# CAPTURE
+# --------------------------------------------------
+def _collapse(frame) -> str:
+    parts = []
+    while frame is not None:
+        code = frame.f_code
+        parts.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(parts))
+
+
+def _sampler(target_tid: int, stop: threading.Event, counts: Counter):
+    while not stop.wait(SAMPLE_INTERVAL_S):
+        frame = sys._current_frames().get(target_tid)
+        if frame is not None:
+            counts[_collapse(frame)] += 1
+
+
+@contextmanager
+def capture(mode: Optional[str], label: str):
+    """Profile the enclosed block in the *current thread*; no-op when mode is None."""
+    if mode not in MODES:
+        yield None
+        return
+
+    record = ProfileRecord(label, mode)
+    start = time.perf_counter()
+    if mode == "cprofile":
+        prof = cProfile.Profile()
+        prof.enable()
+        try:
+            yield record
+        finally:
+            prof.disable()
+            record.duration_ms = (time.perf_counter() - start) * 1000
+            prof.create_stats()
+            record.pstats_data = marshal.dumps(prof.stats)
+            record.samples = sum(v[0] for v in prof.stats.values())
+            _store(record)
+    else:
+        counts = Counter()
+        stop = threading.Event()
+        sampler = threading.Thread(
+            target=_sampler, args=(threading.get_ident(), stop, counts), name="profile-sampler", daemon=True
+        )
+        sampler.start()
+        try:
+            yield record
+        finally:
+            stop.set()
+            sampler.join()
+            record.duration_ms = (time.perf_counter() - start) * 1000
+            record.collapsed = dict(counts)
+            record.samples = sum(counts.values())
+            _store(record)
+
+
+def _store(record: ProfileRecord):
+    with _lock:
+        _records.append(record)
+
+
+def list_records() -> List[dict]:
+    with _lock:
+        return [r.summary() for r in reversed(_records)]
+
+
+def get_record(record_id: str) -> Optional[ProfileRecord]:
+    with _lock:
+        for r in _records:
+            if r.id == record_id:
+                return r
+    return None
+
+
+def clear():
+    with _lock:
+        _records.clear()
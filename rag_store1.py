@@ -1,27 +1,64 @@
 # rag_store.py
 import os
+import re
 import json
 import ast
-from typing import List
+import hashlib
+import math
+import shutil
+import threading
+import weakref
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, List, Optional
 import pandas as pd
-from langsmith import traceable
-from langchain.docstore.document import Document
-
-# Handle LangChain import deprecation: prefer langchain_community if available
-try:
-    from langchain_community.embeddings import HuggingFaceEmbeddings
-    from langchain_community.vectorstores import Chroma
-except Exception:
-    # fallback for older installations
-    from langchain.embeddings import HuggingFaceEmbeddings
-    from langchain.vectorstores import Chroma
+import tracing
+import metrics
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
 
 CHROMA_DIR = "chroma_db"
 HF_EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"  # good default for demos
+# "hf" = sentence-transformers via HuggingFaceEmbeddings; "onnx" = same model on ONNX Runtime
+# (int8, onnx_embeddings.py); "hash" = deterministic offline stand-in
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "hf").lower()
+# "chroma" = Chroma client per process; "flat" = read-only mmap export (flat_index.py), shared across workers
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma").lower()
+FLAT_INDEX_DIR = os.getenv("FLAT_INDEX_DIR", "flat_index")
+# hot-reloaded index builds live in GENERATIONS_DIR/gen-NNNNNN; CURRENT names the active one
+GENERATIONS_DIR = os.getenv("INDEX_GENERATIONS_DIR", "index_generations")
+# flat index shards: one per source, products further split by top-level category ("0" = by source only)
+SHARD_BY_CATEGORY = os.getenv("SHARD_BY_CATEGORY", "1") != "0"
+
+
+# Heavy integrations (sentence-transformers / torch, chromadb) are imported on first use,
+# so importing this module stays cheap and the cost lands in warmup instead.
+def _hf_embeddings_cls():
+    # Handle LangChain import deprecation: prefer langchain_community if available
+    try:
+        from langchain_community.embeddings import HuggingFaceEmbeddings
+    except Exception:
+        # fallback for older installations
+        from langchain.embeddings import HuggingFaceEmbeddings
+    return HuggingFaceEmbeddings
+
+
+def _chroma_cls():
+    try:
+        from langchain_community.vectorstores import Chroma
+    except Exception:
+        from langchain.vectorstores import Chroma
+    return Chroma
 
 # --- Helpers to parse messy CSV fields ---
 def safe_get(row, key):
-    return str(row.get(key, "")).strip() if key in row else ""
+    # pandas marks empty cells NaN; they must read as "" (not "nan") wherever a row is used
+    if key not in row:
+        return ""
+    v = row.get(key)
+    if v is None or v is pd.NA or (isinstance(v, float) and math.isnan(v)):
+        return ""
+    return str(v).strip()
 
 def parse_number(value):
     if value is None:
@@ -132,21 +169,53 @@ def build_product_content(row: pd.Series) -> str:
     content = "\n\n".join(parts)
     return content
 
-def load_products_csv(csv_path: str = "products.csv") -> List[Document]:
+def read_products_frame(csv_path: str = "products.csv") -> Optional[pd.DataFrame]:
     if not os.path.exists(csv_path):
         print(f"[rag_store] products CSV not found at {csv_path}")
-        return []
+        return None
     # read with pandas, try common separators and encoding
     try:
-        df = pd.read_csv(csv_path, sep=None, engine="python", encoding="utf-8")
+        return pd.read_csv(csv_path, sep=None, engine="python", encoding="utf-8")
     except Exception:
         # fallback to default comma separator
-        df = pd.read_csv(csv_path, encoding="utf-8", on_bad_lines="skip")
+        return pd.read_csv(csv_path, encoding="utf-8", on_bad_lines="skip")
+
+
+def product_id(row, idx) -> str:
+    # create an ID (prefer a column like sku/model_number) or fallback to row index
+    return safe_get(row, "model_number") or safe_get(row, "seller_id") or safe_get(row, "title")[:60] or f"prod_{idx}"
+
+
+def product_ids(rows) -> List[str]:
+    """
+    One unique prod_id per row, in row order: product_id(), and for a row whose id is
+    already taken (e.g. the seller_id fallback shared by a seller's products) the same id
+    suffixed with "-<row>". The RAG index and the product catalog both use this, so an id
+    from search results always resolves in the catalog.
+    """
+    ids, seen, collided = [], set(), 0
+    for idx, row in enumerate(rows):
+        pid = product_id(row, idx)
+        if pid in seen:
+            collided += 1
+            base, n = pid, idx
+            while pid in seen:
+                pid, n = f"{base}-{n}", n + 1
+        seen.add(pid)
+        ids.append(pid)
+    if collided:
+        print(f"[rag_store] {collided} products share a prod_id with an earlier row; suffixed with their row number")
+    return ids
+
+
+def load_products_csv(csv_path: str = "products.csv") -> List[Document]:
+    df = read_products_frame(csv_path)
+    if df is None:
+        return []
 
     docs = []
-    for idx, row in df.iterrows():
-        # create an ID (prefer a column like sku/model_number) or fallback to row index
-        prod_id = safe_get(row, "model_number") or safe_get(row, "seller_id") or safe_get(row, "title")[:60] or f"prod_{idx}"
+    rows = [row for _, row in df.iterrows()]
+    for row, prod_id in zip(rows, product_ids(rows)):
         content = build_product_content(row)
         # metadata should include structured values so you can filter later
         meta = {
@@ -162,6 +231,7 @@ def load_products_csv(csv_path: str = "products.csv") -> List[Document]:
             "seller_id": safe_get(row, "seller_id"),
             "delivery": safe_get(row, "delivery"),
         }
+        meta["shard"] = shard_name(meta)
         docs.append(Document(page_content=content, metadata=meta))
     return docs
 
@@ -179,13 +249,117 @@ def load_faqs_json(json_path: str = "faqs.json") -> List[Document]:
         if not q and not a:
             continue
         content = f"Q: {q}\nA: {a}"
-        meta = {"source": "faqs", "index": i, "question": q}
+        meta = {"source": "faqs", "index": i, "question": q, "doc_id": f"faq-{i}"}
+        meta["shard"] = shard_name(meta)
         docs.append(Document(page_content=content, metadata=meta))
     return docs
 
+# --- Shards and query routing ---
+# products without a usable category
+OTHER_PRODUCTS_SHARD = "products/other"
+
+
+def _slug(s: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", s.lower()).strip("-")
+
+
+def shard_name(meta: Dict) -> str:
+    """Shard of a document: its source ("faqs"), or "products/<top-level category>"."""
+    source = meta.get("source") or "other"
+    if source != "products" or not SHARD_BY_CATEGORY:
+        return source
+    categories = parse_list_field(meta.get("category"))
+    slug = _slug(categories[0]) if categories else ""
+    return f"products/{slug}" if slug else OTHER_PRODUCTS_SHARD
+
+
+def route_shards(shards: List[str], query: str, source: Optional[str] = None) -> Optional[List[str]]:
+    """
+    Shards worth searching for `query`: those of `source` (all when None), narrowed to the
+    product categories the query names (e.g. "cheap electronics" -> products/electronics).
+    None means "search everything" (unsharded index).
+    """
+    if not shards:
+        return None
+    chosen = [s for s in shards if source is None or s == source or s.startswith(source + "/")]
+    words = set(re.findall(r"[a-z0-9]+", (query or "").lower()))
+    words |= {w[:-1] for w in words if w.endswith("s")}
+    # the "other" catch-all bucket is never named: "show me other headphones" is not a category
+    named = [s for s in chosen if s.startswith("products/") and s != OTHER_PRODUCTS_SHARD
+             and set(s[9:].split("-")) <= words]
+    if named:
+        chosen = named + [s for s in chosen if not s.startswith("products/")]
+    return chosen
+
+
+def _search_by_vectors(vectordb, vectors: List[List[float]], queries: List[str], k: int,
+                       source: Optional[str] = None) -> List[List[Document]]:
+    """Nearest neighbours per query vector, searching only the shards routed for each query."""
+    if hasattr(vectordb, "shards"):
+        # flat index: group queries that route to the same shards into one scan
+        groups: Dict[tuple, List[int]] = {}
+        for i, q in enumerate(queries):
+            route = route_shards(vectordb.shards, q, source)
+            groups.setdefault(tuple(route) if route is not None else None, []).append(i)
+        out: List[List[Document]] = [[] for _ in queries]
+        for route, idxs in groups.items():
+            found = vectordb.similarity_search_by_vectors([vectors[i] for i in idxs], k=k,
+                                                          shards=list(route) if route is not None else None)
+            for i, docs in zip(idxs, found):
+                out[i] = docs
+        return out
+    # Chroma: one collection, filtered by source
+    where = {"source": source} if source else None
+    if len(vectors) == 1:
+        return [vectordb.similarity_search_by_vector(vectors[0], k=k, filter=where)]
+    res = vectordb._collection.query(
+        query_embeddings=vectors, n_results=k, where=where, include=["documents", "metadatas"]
+    )
+    return [[Document(page_content=t or "", metadata=m or {}) for t, m in zip(texts, metas)]
+            for texts, metas in zip(res.get("documents") or [], res.get("metadatas") or [])]
+
+
+# --- Embedding backends ---
+class HashEmbeddings(Embeddings):
+    """
+    Deterministic feature-hashing embeddings (unigrams + bigrams, signed buckets, L2-normalised).
+    No model download or network: used by benchmarks and offline tests. Lexical, not semantic,
+    but stable across runs so latency numbers are comparable.
+    """
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+
+    def _embed(self, text: str) -> List[float]:
+        vec = [0.0] * self.dim
+        tokens = re.findall(r"[a-z0-9]+", (text or "").lower())
+        features = tokens + [f"{a}_{b}" for a, b in zip(tokens, tokens[1:])]
+        for feat in features:
+            h = int.from_bytes(hashlib.blake2b(feat.encode("utf-8"), digest_size=8).digest(), "little")
+            vec[h % self.dim] += 1.0 if (h >> 63) & 1 else -1.0
+        norm = math.sqrt(sum(v * v for v in vec)) or 1.0
+        return [v / norm for v in vec]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(t) for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+
+def build_embeddings(backend: str = None):
+    backend = (backend or EMBEDDING_BACKEND).lower()
+    if backend == "hash":
+        return HashEmbeddings()
+    if backend == "onnx":
+        from onnx_embeddings import OnnxEmbeddings
+        return OnnxEmbeddings(HF_EMBEDDING_MODEL)
+    return _hf_embeddings_cls()(model_name=HF_EMBEDDING_MODEL)
+
+
 def build_vectorstore(csv_path: str = "products.csv", faq_json_path: str = "faqs.json", persist_directory: str = CHROMA_DIR):
     print("[rag_store] Building vector store...")
-    embeddings = HuggingFaceEmbeddings(model_name=HF_EMBEDDING_MODEL)
+    embeddings = get_embeddings()
 
     docs = []
     prod_docs = load_products_csv(csv_path)
@@ -198,17 +372,410 @@ def build_vectorstore(csv_path: str = "products.csv", faq_json_path: str = "faqs
     print(f"[rag_store] Total documents to index: {len(docs)}")
 
     # create or open Chroma DB
-    vectordb = Chroma.from_documents(documents=docs, embedding=embeddings, persist_directory=persist_directory)
+    vectordb = _chroma_cls().from_documents(documents=docs, embedding=embeddings, persist_directory=persist_directory)
     vectordb.persist()
     print(f"[rag_store] Persisted Chroma DB to '{persist_directory}'")
+    if VECTOR_BACKEND == "flat":
+        build_flat_index(vectordb)
     return vectordb
 
-@traceable(name="rag_retrieval")
-def get_retriever(persist_directory: str = CHROMA_DIR, k: int = 2):
-    embeddings = HuggingFaceEmbeddings(model_name=HF_EMBEDDING_MODEL)
-    vectordb = Chroma(persist_directory=persist_directory, embedding_function=embeddings)
+
+def build_flat_index(vectordb=None, out_dir: str = FLAT_INDEX_DIR, persist_directory: str = CHROMA_DIR) -> dict:
+    """Export the Chroma collection (vectors, texts, metadata) into the mmap-able flat index."""
+    import flat_index
+    if vectordb is None:
+        vectordb = _chroma_cls()(persist_directory=persist_directory, embedding_function=get_embeddings())
+    data = vectordb._collection.get(include=["embeddings", "documents", "metadatas"])
+    meta = flat_index.write_index(out_dir, data["embeddings"], data["documents"], data["metadatas"])
+    print(f"[rag_store] Wrote flat index ({meta['count']} x {meta['dim']}) to '{out_dir}'")
+    return meta
+
+
+# --- Index generations (hot reload without restart) ---
+class IndexGeneration:
+    """
+    One immutable build of the index. Generation 0 is the hand-built CHROMA_DIR /
+    FLAT_INDEX_DIR; later ones are built by build_generation() into their own directory,
+    so requests still holding an older store keep reading consistent data.
+    """
+    __slots__ = ("number", "chroma_dir", "flat_dir", "sources")
+
+    def __init__(self, number: int, chroma_dir: str, flat_dir: str, sources: Optional[Dict] = None):
+        self.number = number
+        self.chroma_dir = chroma_dir
+        self.flat_dir = flat_dir
+        self.sources = sources or {}
+
+    @classmethod
+    def load(cls, number: int) -> "IndexGeneration":
+        if number == 0:
+            return cls(0, CHROMA_DIR, FLAT_INDEX_DIR)
+        path = _generation_dir(number)
+        sources = {}
+        try:
+            with open(os.path.join(path, "sources.json"), "r", encoding="utf-8") as f:
+                sources = json.load(f)
+        except FileNotFoundError:
+            pass
+        return cls(number, os.path.join(path, "chroma"), os.path.join(path, "flat"), sources)
+
+    def info(self) -> dict:
+        return {"number": self.number, "chroma_dir": self.chroma_dir, "flat_dir": self.flat_dir,
+                "sources": self.sources}
+
+
+_ACTIVE_GENERATION: Optional[IndexGeneration] = None
+_GENERATION_LOCK = threading.Lock()
+_RELOAD_HOOKS = []
+
+
+def _generation_dir(number: int) -> str:
+    return os.path.join(GENERATIONS_DIR, f"gen-{number:06d}")
+
+
+def source_signature(paths: List[str]) -> Dict[str, List[int]]:
+    """{path: [mtime_ns, size]} for each source file (missing files are omitted)."""
+    out = {}
+    for p in paths:
+        try:
+            st = os.stat(p)
+            out[p] = [st.st_mtime_ns, st.st_size]
+        except FileNotFoundError:
+            pass
+    return out
+
+
+def published_generation() -> int:
+    """Generation named by GENERATIONS_DIR/CURRENT (shared by all worker processes); 0 if none."""
+    try:
+        with open(os.path.join(GENERATIONS_DIR, "CURRENT"), "r", encoding="utf-8") as f:
+            return int(f.read().strip() or 0)
+    except (FileNotFoundError, ValueError):
+        return 0
+
+
+def active_generation() -> IndexGeneration:
+    global _ACTIVE_GENERATION
+    gen = _ACTIVE_GENERATION
+    if gen is None:
+        with _GENERATION_LOCK:
+            if _ACTIVE_GENERATION is None:
+                _ACTIVE_GENERATION = IndexGeneration.load(published_generation())
+                if _ACTIVE_GENERATION.number:
+                    _note_worker_generation(_ACTIVE_GENERATION.number)
+            gen = _ACTIVE_GENERATION
+    return gen
+
+
+def register_reload_hook(fn):
+    """fn(generation) runs after every swap; derived caches (answers, lookups) rebuild or clear here."""
+    _RELOAD_HOOKS.append(fn)
+    return fn
+
+
+def _existing_vectors() -> Dict[str, List[float]]:
+    """page_content -> vector of the active generation, so unchanged documents are not re-embedded."""
+    try:
+        vectordb = get_vectorstore()
+    except Exception:
+        return {}
+    if hasattr(vectordb, "index"):
+        idx = vectordb.index
+        return {idx.document(i).page_content: idx.vectors[i].tolist() for i in range(len(idx))}
+    data = vectordb._collection.get(include=["embeddings", "documents"])
+    return {t: list(v) for t, v in zip(data["documents"] or [], data["embeddings"] or [])}
+
+
+def build_generation(csv_path: str = "products.csv", faq_json_path: str = "faqs.json",
+                     batch_size: int = 256) -> IndexGeneration:
+    """
+    Build the next index generation (Chroma + flat export) from the source files without
+    touching the active one. Vectors of documents whose text did not change are reused.
+    """
+    sources = source_signature([csv_path, faq_json_path])
+    docs = load_products_csv(csv_path) + load_faqs_json(faq_json_path)
+    existing = [int(d[4:]) for d in os.listdir(GENERATIONS_DIR) if d.startswith("gen-")] \
+        if os.path.isdir(GENERATIONS_DIR) else []
+    number = max(existing + [active_generation().number]) + 1
+    path = _generation_dir(number)
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path)
+
+    reuse = _existing_vectors()
+    texts = [d.page_content for d in docs]
+    missing = [t for t in dict.fromkeys(texts) if t not in reuse]
+    embeddings = get_embeddings()
+    for i in range(0, len(missing), batch_size):
+        chunk = missing[i:i + batch_size]
+        reuse.update(zip(chunk, embeddings.embed_documents(chunk)))
+    vectors = [reuse[t] for t in texts]
+    print(f"[rag_store] generation {number}: {len(docs)} docs, {len(missing)} embedded, "
+          f"{len(docs) - len(missing)} reused")
+
+    gen = IndexGeneration(number, os.path.join(path, "chroma"), os.path.join(path, "flat"), sources)
+    vectordb = _chroma_cls()(persist_directory=gen.chroma_dir, embedding_function=embeddings)
+    ids = [f"{number}-{i}" for i in range(len(docs))]
+    for i in range(0, len(docs), 1000):
+        vectordb._collection.add(ids=ids[i:i + 1000], embeddings=vectors[i:i + 1000],
+                                 documents=texts[i:i + 1000], metadatas=[d.metadata for d in docs[i:i + 1000]])
+    import flat_index
+    flat_index.write_index(gen.flat_dir, vectors, texts, [d.metadata for d in docs])
+    with open(os.path.join(path, "sources.json"), "w", encoding="utf-8") as f:
+        json.dump(sources, f)
+    return gen
+
+
+def activate_generation(gen: IndexGeneration, publish: bool = True):
+    """
+    Atomically make `gen` the generation new requests use. Its store is opened (and
+    searched once) first, so the swap itself is a pointer assignment; requests already
+    holding the previous store finish on it. With publish=True the choice is written to
+    GENERATIONS_DIR/CURRENT for the other worker processes.
+    """
+    global _ACTIVE_GENERATION
+    previous = active_generation()
+    # open + warm the new store under its own cache key before anyone can see it
+    store = _open_store(gen.chroma_dir, gen.flat_dir)
+    store.similarity_search_by_vector(get_embeddings().embed_query("warmup query"), k=1)
+    with _GENERATION_LOCK:
+        _ACTIVE_GENERATION = gen
+    if publish:
+        os.makedirs(GENERATIONS_DIR, exist_ok=True)
+        tmp = os.path.join(GENERATIONS_DIR, f"CURRENT.{os.getpid()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(str(gen.number))
+        os.replace(tmp, os.path.join(GENERATIONS_DIR, "CURRENT"))
+    _note_worker_generation(gen.number)
+    _retire_generations(keep={gen.number, previous.number})
+    for hook in list(_RELOAD_HOOKS):
+        try:
+            hook(gen)
+        except Exception as e:
+            print(f"[rag_store] reload hook {getattr(hook, '__name__', hook)} failed: {e}")
+    print(f"[rag_store] active index generation: {previous.number} -> {gen.number}")
+
+
+def _note_worker_generation(number: int):
+    """Record in GENERATIONS_DIR/workers/<pid> the generation this process now serves."""
+    path = os.path.join(GENERATIONS_DIR, "workers")
+    os.makedirs(path, exist_ok=True)
+    tmp = os.path.join(path, f"{os.getpid()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(str(number))
+    os.replace(tmp, os.path.join(path, str(os.getpid())))
+
+
+def _worker_generations() -> set:
+    """Generations live worker processes still serve (markers of exited workers are removed)."""
+    path = os.path.join(GENERATIONS_DIR, "workers")
+    serving = set()
+    for name in os.listdir(path) if os.path.isdir(path) else []:
+        if not name.isdigit():
+            continue
+        marker = os.path.join(path, name)
+        try:
+            os.kill(int(name), 0)
+        except ProcessLookupError:
+            try:
+                os.remove(marker)
+            except FileNotFoundError:
+                pass
+            continue
+        except PermissionError:
+            pass  # alive, owned by another user
+        try:
+            with open(marker, "r", encoding="utf-8") as f:
+                serving.add(int(f.read().strip()))
+        except (FileNotFoundError, ValueError):
+            continue
+    return serving
+
+
+# generation number -> weak reference to its store, for generations retired while open here
+_RETIRED_STORES: Dict[int, object] = {}
+
+
+def _retire_generations(keep):
+    """Drop cached stores of generations no longer in `keep`; their directories go once unread."""
+    with _HANDLE_LOCK:
+        for g in map(IndexGeneration.load, [0] + _generation_numbers()):
+            if g.number in keep:
+                continue
+            store = _VECTORSTORES.pop(_store_key(g.chroma_dir, g.flat_dir), None)
+            if store is not None and g.number:
+                _RETIRED_STORES[g.number] = weakref.ref(store)
+    collect_generations(keep)
+
+
+def _generation_numbers() -> List[int]:
+    if not os.path.isdir(GENERATIONS_DIR):
+        return []
+    return sorted(int(d[4:]) for d in os.listdir(GENERATIONS_DIR) if d.startswith("gen-") and d[4:].isdigit())
+
+
+def collect_generations(keep=None) -> List[int]:
+    """
+    Delete build directories of retired generations nobody reads any more: not in `keep`
+    (default: the active and published generations), not served by any live worker
+    process (GENERATIONS_DIR/workers), and with no store of theirs still referenced by a
+    request in this process. Skipped ones are retried on the next call (each watcher poll).
+    """
+    if keep is None:
+        keep = {active_generation().number, published_generation()}
+    keep = set(keep) | _worker_generations()
+    removed = []
+    for number in _generation_numbers():
+        if number in keep:
+            continue
+        with _HANDLE_LOCK:
+            ref = _RETIRED_STORES.get(number)
+            if ref is not None and ref() is not None:
+                continue  # an in-flight request still holds this generation's store
+            g = IndexGeneration.load(number)
+            if _VECTORSTORES.get(_store_key(g.chroma_dir, g.flat_dir)) is not None:
+                continue
+            _RETIRED_STORES.pop(number, None)
+        shutil.rmtree(_generation_dir(number), ignore_errors=True)
+        removed.append(number)
+    if removed:
+        print(f"[rag_store] removed index generations {removed}")
+    return removed
+
+# --- Shared handles: the embedding model and Chroma client are loaded once per process ---
+_EMBEDDINGS = None
+_VECTORSTORES: Dict[str, object] = {}
+_HANDLE_LOCK = threading.Lock()
+
+# Query vectors precomputed by a batch call; retrieval inside use_query_vectors() reuses them
+_query_vectors = contextvars.ContextVar("batch_query_vectors", default=None)
+
+
+def get_embeddings():
+    global _EMBEDDINGS
+    with _HANDLE_LOCK:
+        if _EMBEDDINGS is None:
+            _EMBEDDINGS = build_embeddings()
+        return _EMBEDDINGS
+
+
+def _store_key(chroma_dir: str, flat_dir: str) -> str:
+    return flat_dir if VECTOR_BACKEND == "flat" else chroma_dir
+
+
+def _open_store(chroma_dir: str, flat_dir: str):
+    key = _store_key(chroma_dir, flat_dir)
+    embeddings = get_embeddings()
+    with _HANDLE_LOCK:
+        vectordb = _VECTORSTORES.get(key)
+        if vectordb is None:
+            if VECTOR_BACKEND == "flat":
+                import flat_index
+                if not flat_index.exists(flat_dir):
+                    raise RuntimeError(f"flat index not found in '{flat_dir}'; run rag_store1.build_flat_index()")
+                vectordb = flat_index.FlatVectorStore(flat_index.FlatIndex(flat_dir), embeddings)
+            else:
+                vectordb = _chroma_cls()(persist_directory=chroma_dir, embedding_function=embeddings)
+            _VECTORSTORES[key] = vectordb
+        return vectordb
+
+
+def get_vectorstore(persist_directory: str = None):
+    """
+    Chroma store, or a FlatVectorStore over the mmap export when VECTOR_BACKEND=flat.
+    With no persist_directory, the store of the active index generation.
+    """
+    if persist_directory is None:
+        gen = active_generation()
+        return _open_store(gen.chroma_dir, gen.flat_dir)
+    return _open_store(persist_directory, FLAT_INDEX_DIR)
+
+
+# handle construction only (cached store), so it is a hot span: not traced by default
+@tracing.span("rag_retrieval", hot=True)
+def get_retriever(persist_directory: str = None, k: int = 2):
+    vectordb = get_vectorstore(persist_directory)
     retriever = vectordb.as_retriever(search_kwargs={"k": k})
     return retriever
 
+
+# --- Batched retrieval ---
+def embed_queries(queries: List[str]) -> List[List[float]]:
+    """Embed many queries with a single batched model call."""
+    if not queries:
+        return []
+    return get_embeddings().embed_documents(list(queries))
+
+
+@contextmanager
+def use_query_vectors(vectors: Dict[str, List[float]]):
+    """Within this block, retrieve_documents() reuses these precomputed query vectors."""
+    token = _query_vectors.set(vectors)
+    try:
+        yield
+    finally:
+        _query_vectors.reset(token)
+
+
+def precomputed_vector(query: str) -> Optional[List[float]]:
+    vectors = _query_vectors.get()
+    return vectors.get(query) if vectors else None
+
+
+def _query_vector(retriever, query: str) -> List[float]:
+    vec = precomputed_vector(query)
+    metrics.record_cache("query_vector", vec is not None)
+    if vec is None:
+        # embed explicitly (rather than get_relevant_documents) so the two costs are timed apart
+        with metrics.stage("embedding"):
+            vec = retriever.vectorstore.embeddings.embed_query(query)
+    return vec
+
+
+def retrieve_documents(retriever, query: str, source: Optional[str] = None) -> List[Document]:
+    """
+    retriever.get_relevant_documents, skipping the embedding call when a batch already
+    embedded `query`. `source` ("products" / "faqs") limits the search to that source's shards.
+    """
+    vec = _query_vector(retriever, query)
+    k = retriever.search_kwargs.get("k", 4)
+    with metrics.stage("vector_search"):
+        return _search_by_vectors(retriever.vectorstore, [vec], [query], k, source)[0]
+
+
+def retrieve_candidates(retriever, query: str, fetch_k: int, source: Optional[str] = None):
+    """
+    (query vector, documents, their vectors) of the top `fetch_k` hits, for rerankers
+    (rerank.py) that need the candidates' embeddings as well as the documents.
+    """
+    vec = _query_vector(retriever, query)
+    vectordb = retriever.vectorstore
+    with metrics.stage("vector_search"):
+        if hasattr(vectordb, "shards"):
+            docs, vectors = vectordb.similarity_search_with_vectors(
+                vec, k=fetch_k, shards=route_shards(vectordb.shards, query, source))
+            return vec, docs, vectors
+        res = vectordb._collection.query(
+            query_embeddings=[vec], n_results=fetch_k, where={"source": source} if source else None,
+            include=["documents", "metadatas", "embeddings"]
+        )
+    docs = [Document(page_content=t or "", metadata=m or {})
+            for t, m in zip((res.get("documents") or [[]])[0], (res.get("metadatas") or [[]])[0])]
+    embeddings = res.get("embeddings")
+    return vec, docs, list(embeddings[0]) if embeddings is not None and len(embeddings) else []
+
+
+def batch_similarity_search(queries: List[str], k: int = 4, persist_directory: str = None,
+                            source: Optional[str] = None) -> List[List[Document]]:
+    """
+    Embed all queries in one model call and run the nearest-neighbour searches as a
+    single vector-store query (one scan per distinct shard route on the flat index).
+    Returns one list of Documents per input query, in order.
+    """
+    if not queries:
+        return []
+    vectordb = get_vectorstore(persist_directory)
+    vectors = embed_queries(queries)
+    return _search_by_vectors(vectordb, vectors, list(queries), k, source)
+
 if __name__ == "__main__":
     build_vectorstore()
@@ -0,0 +1,104 @@
+# rerank.py
+"""
+Diversity reranking for product results (maximal marginal relevance).
+
+Vector search over-fetches `fetch_k` candidates together with their embeddings; the
+reranker first drops near-duplicates by metadata (same brand + model from another
+seller, optionally one product per brand / seller) and then picks `k` with MMR:
+
+    next = argmax_i  lambda * sim(q, d_i) - (1 - lambda) * max_j sim(d_i, d_j selected)
+
+Similarities are one [n] and one [n, n] matrix product; each greedy step updates the
+running max with a single row, so reranking 20-40 candidates takes well under a
+millisecond and no model call.
+
+    MMR_LAMBDA        relevance vs diversity trade-off (default 0.7; 1 = plain top-k order)
+    MMR_FETCH_FACTOR  candidates fetched per result (default 4)
+    MMR_DEDUPE        comma list of "model", "brand", "seller" (default "model"; "" disables)
+"""
+import os
+import re
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+MMR_LAMBDA = float(os.getenv("MMR_LAMBDA", "0.7"))
+MMR_FETCH_FACTOR = int(os.getenv("MMR_FETCH_FACTOR", "4"))
+MMR_DEDUPE = tuple(k.strip() for k in os.getenv("MMR_DEDUPE", "model").split(",") if k.strip())
+
+_SELLER_SUFFIX = re.compile(r"\s*[\(\[\-|].*?(seller|sold by|ships from).*$", re.IGNORECASE)
+
+
+def _model_key(meta: Dict) -> str:
+    """brand + normalised title: the same item listed by several sellers collapses to one key."""
+    title = _SELLER_SUFFIX.sub("", meta.get("title") or "")
+    title = re.sub(r"[^a-z0-9]+", " ", title.lower()).strip()
+    brand = (meta.get("brand") or "").strip().lower()
+    return f"{brand}|{title}" if title else f"id|{meta.get('prod_id') or ''}"
+
+
+_KEYS = {
+    "model": _model_key,
+    "brand": lambda meta: (meta.get("brand") or "").strip().lower(),
+    "seller": lambda meta: (meta.get("seller_id") or "").strip().lower(),
+}
+
+
+def dedupe(metadatas: Sequence[Dict], by: Sequence[str] = MMR_DEDUPE) -> List[int]:
+    """Indices of the candidates to keep: the first (best ranked) per key, for every key in `by`."""
+    keys = [_KEYS[name] for name in by if name in _KEYS]
+    seen = [set() for _ in keys]
+    kept = []
+    for i, meta in enumerate(metadatas):
+        meta = meta or {}
+        values = [fn(meta) for fn in keys]
+        # an empty key (unknown brand / seller) never counts as a duplicate
+        if any(v and v in s for v, s in zip(values, seen)):
+            continue
+        for v, s in zip(values, seen):
+            if v:
+                s.add(v)
+        kept.append(i)
+    return kept
+
+
+def mmr(query_vector: Sequence[float], vectors: np.ndarray, k: int, lambda_mult: float = MMR_LAMBDA) -> List[int]:
+    """Indices of `k` rows of `vectors` chosen by maximal marginal relevance, in selection order."""
+    v = np.asarray(vectors, dtype=np.float32)
+    n = len(v)
+    if n == 0 or k <= 0:
+        return []
+    v = v / np.maximum(np.linalg.norm(v, axis=1, keepdims=True), 1e-12)
+    q = np.asarray(query_vector, dtype=np.float32)
+    q = q / max(float(np.linalg.norm(q)), 1e-12)
+    relevance = v @ q
+    if lambda_mult >= 1.0:
+        return np.argsort(-relevance, kind="stable")[:k].tolist()
+    pairwise = v @ v.T
+
+    selected = [int(np.argmax(relevance))]
+    redundancy = pairwise[selected[0]].copy()  # max similarity to anything selected so far
+    available = np.ones(n, dtype=bool)
+    available[selected[0]] = False
+    for _ in range(min(k, n) - 1):
+        score = lambda_mult * relevance - (1.0 - lambda_mult) * redundancy
+        score[~available] = -np.inf
+        best = int(np.argmax(score))
+        selected.append(best)
+        available[best] = False
+        np.maximum(redundancy, pairwise[best], out=redundancy)
+    return selected
+
+
+def rerank(query_vector: Sequence[float], docs: List, vectors: np.ndarray, k: int,
+           lambda_mult: Optional[float] = None, dedupe_by: Optional[Sequence[str]] = None) -> List:
+    """De-duplicate, then MMR-select `k` of the candidate documents (best first)."""
+    lambda_mult = MMR_LAMBDA if lambda_mult is None else lambda_mult
+    dedupe_by = MMR_DEDUPE if dedupe_by is None else dedupe_by
+    keep = dedupe([d.metadata for d in docs], dedupe_by) if dedupe_by else list(range(len(docs)))
+    if not keep:
+        return []
+    if len(vectors) != len(docs):  # store returned no embeddings: de-duplicated top-k order
+        return [docs[i] for i in keep[:k]]
+    chosen = mmr(query_vector, np.asarray(vectors)[keep], k, lambda_mult)
+    return [docs[keep[i]] for i in chosen]
@@ -1,8 +1,22 @@
 import csv
+import threading
 from datetime import datetime
+from typing import Callable, List
+import metrics
 
 RETURNS_FILE = "returns.csv"
+# concurrent appends from request threads must not interleave rows
+_WRITE_LOCK = threading.Lock()
 
+# called with each new return row after it is appended (e.g. incremental analytics)
+_return_hooks: List[Callable[[dict], None]] = []
+
+
+def register_return_hook(fn: Callable[[dict], None]):
+    _return_hooks.append(fn)
+    return fn
+
+@metrics.timed("return_lookup")
 def get_return_by_order(order_id):
     with open(RETURNS_FILE, newline="", encoding="utf-8") as f:
         reader = csv.DictReader(f)
@@ -12,6 +26,7 @@ def get_return_by_order(order_id):
     return None
 
 
+@metrics.timed("create_return")
 def create_return_request(order, reason):
     today = datetime.today()
     placed_date = datetime.strptime(order["placed_date"], "%d-%m-%Y")
@@ -39,8 +54,14 @@ def create_return_request(order, reason):
         "Discount_Applied": "No"
     }
 
-    with open(RETURNS_FILE, "a", newline="", encoding="utf-8") as f:
+    with _WRITE_LOCK, open(RETURNS_FILE, "a", newline="", encoding="utf-8") as f:
         writer = csv.DictWriter(f, fieldnames=new_row.keys())
         writer.writerow(new_row)
 
+    for hook in _return_hooks:
+        try:
+            hook(new_row)
+        except Exception as e:
+            print(f"[returns] return hook {getattr(hook, '__name__', hook)} failed: {e}")
+
     return new_row
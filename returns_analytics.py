@@ -0,0 +1,312 @@
+# returns_analytics.py
+"""
+Returns analytics over returns.csv, maintained incrementally.
+
+The file is parsed once into typed columns (dictionary-encoded categorical fields,
+order day numbers, prices, days-to-return) plus running counters of orders / returns
+(and return reasons) per dimension value. After that only the bytes appended since
+the last read are parsed: create_return_request notifies us through
+returns.register_return_hook, and every query first compares the file size, so rows
+appended by other workers are picked up as well.
+
+Whole-history breakdowns (by category, reason, payment / shipping method, location,
+status or order month) come straight from the counters, so their cost does not grow
+with the number of rows. Rolling windows ("last N days") are one vectorised mask +
+bincount over the columns.
+
+Every row is an order; it counts as a return unless Return_Status is "Not Returned".
+"""
+import os
+import csv
+import threading
+from array import array
+from datetime import date, datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+
+import returns
+
+RETURNS_CSV = returns.RETURNS_FILE
+
+DIMENSIONS = {
+    "category": "Product_Category",
+    "reason": "Return_Reason",
+    "payment_method": "Payment_Method",
+    "shipping_method": "Shipping_Method",
+    "location": "User_Location",
+    "status": "Return_Status",
+    "month": "Order_Date",  # YYYY-MM of the order date
+}
+
+# Days_to_Return histogram buckets (upper bounds, inclusive); negative / blank values are "unknown"
+DAYS_BUCKETS = ((7, "0-7"), (14, "8-14"), (30, "15-30"), (60, "31-60"), (None, "61+"))
+_UNKNOWN_DAYS = -1
+_NO_DAY = -(2 ** 31)
+_EPOCH = date(1970, 1, 1)
+
+
+def _day_number(value: str) -> int:
+    try:
+        return (datetime.strptime(value.strip(), "%d-%m-%Y").date() - _EPOCH).days
+    except ValueError:
+        return _NO_DAY
+
+
+def _days_bucket(value: str) -> int:
+    try:
+        days = int(float(value))
+    except ValueError:
+        return _UNKNOWN_DAYS
+    if days < 0:
+        return _UNKNOWN_DAYS
+    for i, (upper, _) in enumerate(DAYS_BUCKETS):
+        if upper is None or days <= upper:
+            return i
+    return _UNKNOWN_DAYS
+
+
+def _is_return(status: str) -> bool:
+    s = status.strip().lower()
+    return bool(s) and s != "not returned"
+
+
+def _rate(returned: int, orders: int) -> Optional[float]:
+    return round(returned / orders, 4) if orders else None
+
+
+def _histogram(counts: List[int], returned: int) -> Dict[str, int]:
+    hist = {label: int(counts[i]) for i, (_, label) in enumerate(DAYS_BUCKETS)}
+    hist["unknown"] = returned - sum(hist.values())
+    return hist
+
+
+class _Dimension:
+    """Dictionary-encoded column plus per-value order / return / reason counters."""
+    __slots__ = ("values", "code_of", "codes", "orders", "returns", "reasons")
+
+    def __init__(self):
+        self.values: List[str] = []
+        self.code_of: Dict[str, int] = {}
+        self.codes = array("i")
+        self.orders: List[int] = []
+        self.returns: List[int] = []
+        self.reasons: List[Dict[int, int]] = []
+
+    def add(self, value: str, returned: bool, reason_code: Optional[int]) -> int:
+        # reason_code None: this column is the reason itself
+        code = self.code_of.get(value)
+        if code is None:
+            code = self.code_of[value] = len(self.values)
+            self.values.append(value)
+            self.orders.append(0)
+            self.returns.append(0)
+            self.reasons.append({})
+        self.codes.append(code)
+        self.orders[code] += 1
+        if returned:
+            self.returns[code] += 1
+            rc = code if reason_code is None else reason_code
+            self.reasons[code][rc] = self.reasons[code].get(rc, 0) + 1
+        return code
+
+
+class ReturnsAnalytics:
+    def __init__(self, csv_path: str = RETURNS_CSV):
+        self.csv_path = csv_path
+        self.dims = {name: _Dimension() for name in DIMENSIONS}
+        self.order_day = array("i")
+        self.returned = array("b")
+        self.price = array("d")
+        self.days_bucket = array("b")
+        self.days_hist = [0] * len(DAYS_BUCKETS)
+        self._header: Optional[List[str]] = None
+        self._offset = 0
+        self._lock = threading.Lock()
+        self.refresh()
+
+    def __len__(self) -> int:
+        return len(self.returned)
+
+    # ------------------------------------------------------------------
+    # loading
+    # ------------------------------------------------------------------
+    def refresh(self) -> int:
+        """Parse rows appended since the last call; returns how many were added."""
+        try:
+            size = os.path.getsize(self.csv_path)
+        except OSError:
+            return 0
+        with self._lock:
+            if size < self._offset:
+                self._reset()  # file replaced / truncated: start over
+            if size == self._offset:
+                return 0
+            with open(self.csv_path, "rb") as f:
+                f.seek(self._offset)
+                chunk = f.read(size - self._offset)
+            # only whole lines; a row still being written is picked up next time
+            end = chunk.rfind(b"\n") + 1
+            if end == 0:
+                return 0
+            self._offset += end
+            lines = chunk[:end].decode("utf-8-sig" if self._header is None else "utf-8").splitlines()
+            reader = csv.reader(lines)
+            if self._header is None:
+                self._header = next(reader, None) or []
+            before = len(self)
+            for values in reader:
+                if values:
+                    self._add(dict(zip(self._header, values)))
+            return len(self) - before
+
+    def _reset(self):
+        self.dims = {name: _Dimension() for name in DIMENSIONS}
+        self.order_day = array("i")
+        self.returned = array("b")
+        self.price = array("d")
+        self.days_bucket = array("b")
+        self.days_hist = [0] * len(DAYS_BUCKETS)
+        self._header = None
+        self._offset = 0
+
+    def _add(self, row: dict):
+        returned = _is_return(row.get("Return_Status", ""))
+        reason = (row.get("Return_Reason") or "").strip() if returned else ""
+        reason_code = self.dims["reason"].add(reason, returned, None)
+        order_date = (row.get("Order_Date") or "").strip()
+        day = _day_number(order_date)
+        for name, column in DIMENSIONS.items():
+            if name == "reason":
+                continue
+            if name == "month":
+                value = order_date[6:10] + "-" + order_date[3:5] if day != _NO_DAY else ""
+            else:
+                value = (row.get(column) or "").strip()
+            self.dims[name].add(value, returned, reason_code)
+        self.order_day.append(day)
+        self.returned.append(1 if returned else 0)
+        try:
+            self.price.append(float(row.get("Product_Price") or "nan"))
+        except ValueError:
+            self.price.append(float("nan"))
+        bucket = _days_bucket(row.get("Days_to_Return") or "") if returned else _UNKNOWN_DAYS
+        self.days_bucket.append(bucket)
+        if bucket != _UNKNOWN_DAYS:
+            self.days_hist[bucket] += 1
+
+    # ------------------------------------------------------------------
+    # queries
+    # ------------------------------------------------------------------
+    def summary(self, by: Optional[str] = None, days: Optional[int] = None,
+                until: Optional[date] = None, top: int = 20) -> dict:
+        """
+        Orders, returns, return rate, reason breakdown and days-to-return histogram,
+        optionally grouped `by` a dimension and limited to orders placed in the `days`
+        days up to `until` (default today).
+        """
+        if by is not None and by not in DIMENSIONS:
+            raise ValueError(f"unknown dimension {by!r}; expected one of {sorted(DIMENSIONS)}")
+        if days is not None and days < 1:
+            raise ValueError("days must be >= 1")
+        self.refresh()
+        with self._lock:
+            if days is None:
+                out = self._from_counters(by, top)
+            else:
+                out = self._from_columns(by, days, until or date.today(), top)
+        out["by"] = by
+        return out
+
+    def _reason_names(self, counts: Dict[int, int]) -> Dict[str, int]:
+        names = self.dims["reason"].values
+        ranked = sorted(counts.items(), key=lambda kv: -kv[1])
+        return {(names[c] or "unspecified"): n for c, n in ranked if n}
+
+    def _from_counters(self, by: Optional[str], top: int) -> dict:
+        status = self.dims["status"]
+        orders = sum(status.orders)
+        returned = sum(status.returns)
+        reasons: Dict[int, int] = {}
+        for per_status in status.reasons:
+            for c, n in per_status.items():
+                reasons[c] = reasons.get(c, 0) + n
+        out = {
+            "orders": orders, "returns": returned, "return_rate": _rate(returned, orders),
+            "reasons": self._reason_names(reasons),
+            "days_to_return": _histogram(self.days_hist, returned),
+        }
+        if by is not None:
+            dim = self.dims[by]
+            groups = [
+                {"value": dim.values[c], "orders": dim.orders[c], "returns": dim.returns[c],
+                 "return_rate": _rate(dim.returns[c], dim.orders[c]),
+                 "reasons": self._reason_names(dim.reasons[c])}
+                for c in range(len(dim.values))
+            ]
+            out["groups"] = self._rank(groups, by, top)
+        return out
+
+    def _from_columns(self, by: Optional[str], days: int, until: date, top: int) -> dict:
+        end = (until - _EPOCH).days
+        day = np.frombuffer(self.order_day, dtype=np.int32)
+        ret = np.frombuffer(self.returned, dtype=np.int8).astype(bool)
+        bucket = np.frombuffer(self.days_bucket, dtype=np.int8)
+        reason = np.frombuffer(self.dims["reason"].codes, dtype=np.int32)
+        mask = (day > end - days) & (day <= end)
+        hit = mask & ret
+        n_reasons = len(self.dims["reason"].values)
+        hist = np.bincount(bucket[hit & (bucket >= 0)], minlength=len(DAYS_BUCKETS))
+        out = {
+            "orders": int(mask.sum()), "returns": int(hit.sum()),
+            "return_rate": _rate(int(hit.sum()), int(mask.sum())),
+            "reasons": self._reason_names(dict(enumerate(np.bincount(reason[hit], minlength=n_reasons).tolist()))),
+            "days_to_return": _histogram(hist.tolist(), int(hit.sum())),
+            "window": {"days": days, "until": until.isoformat()},
+        }
+        if by is not None:
+            dim = self.dims[by]
+            codes = np.frombuffer(dim.codes, dtype=np.int32)
+            n = len(dim.values)
+            orders = np.bincount(codes[mask], minlength=n)
+            returned = np.bincount(codes[hit], minlength=n)
+            by_reason = np.bincount(codes[hit] * n_reasons + reason[hit],
+                                    minlength=n * n_reasons).reshape(n, n_reasons)
+            groups = [
+                {"value": dim.values[c], "orders": int(orders[c]), "returns": int(returned[c]),
+                 "return_rate": _rate(int(returned[c]), int(orders[c])),
+                 "reasons": self._reason_names(dict(enumerate(by_reason[c].tolist())))}
+                for c in np.flatnonzero(orders).tolist()
+            ]
+            out["groups"] = self._rank(groups, by, top)
+        return out
+
+    @staticmethod
+    def _rank(groups: List[dict], by: str, top: int) -> List[dict]:
+        if by == "month":
+            return sorted(groups, key=lambda g: g["value"])[-top:]
+        return sorted(groups, key=lambda g: (-g["returns"], -g["orders"], g["value"]))[:top]
+
+    def stats(self) -> dict:
+        return {"rows": len(self), "bytes_read": self._offset,
+                "distinct": {name: len(d.values) for name, d in self.dims.items()}}
+
+
+_ANALYTICS: Optional[ReturnsAnalytics] = None
+_LOCK = threading.Lock()
+
+
+def get_returns_analytics() -> ReturnsAnalytics:
+    global _ANALYTICS
+    if _ANALYTICS is None:
+        with _LOCK:
+            if _ANALYTICS is None:
+                _ANALYTICS = ReturnsAnalytics(RETURNS_CSV)
+    return _ANALYTICS
+
+
+@returns.register_return_hook
+def _on_return(row: dict):
+    # not loaded yet: the first query parses the whole file anyway
+    if _ANALYTICS is not None:
+        _ANALYTICS.refresh()
@@ -0,0 +1,149 @@
+# serve.py
+"""
+Pre-fork multi-worker server for app.main:app.
+
+    python serve.py --workers 4 --port 8000
+
+Unlike `uvicorn --workers N` (which starts N fresh interpreters that each import the
+app and load their own model and index), the parent process here binds the socket,
+imports the app and runs the full warmup (embedding model, vector index, EcommerceLLM)
+once, then forks the workers. Model weights and interpreter state are shared
+copy-on-write; gc.freeze() keeps the collector from touching (and so copying) those
+pages. The vector index defaults to the read-only mmap backend (VECTOR_BACKEND=flat)
+and orders to the shared SQLite store (ORDERS_BACKEND=sqlite), since neither a Chroma
+client nor the in-process orders dict can be shared safely between processes.
+
+The parent restarts workers that die and logs per-worker RSS/PSS every
+--memory-report-s seconds; each worker also exports its own memory on /metrics.
+"""
+import argparse
+import gc
+import os
+import signal
+import sys
+import time
+
+WORKER_ENV_DEFAULTS = {
+    "VECTOR_BACKEND": "flat",
+    "ORDERS_BACKEND": "sqlite",
+    # HuggingFace tokenizers' and OpenMP's thread pools are not fork-safe once used in the
+    # parent; with one process per core, single-threaded inference per worker is the better split
+    "TOKENIZERS_PARALLELISM": "false",
+    "OMP_NUM_THREADS": "1",
+}
+
+
+def _preload():
+    for key, value in WORKER_ENV_DEFAULTS.items():
+        os.environ.setdefault(key, value)
+
+    import rag_store1
+    import flat_index
+    if os.environ["VECTOR_BACKEND"] == "flat" and not flat_index.exists(rag_store1.active_generation().flat_dir):
+        print("[serve] flat index missing, exporting it from Chroma ...")
+        rag_store1.build_flat_index()
+
+    from app import deps
+    from app.main import app
+    deps.warmup()
+    if not deps.is_ready():
+        raise SystemExit(f"[serve] warmup failed: {deps.warmup_state()['error']}")
+    return app
+
+
+def _run_worker(app, sock, args):
+    import uvicorn
+    # children inherit the warm singletons; the startup warmup just finds them cached
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, signal.SIG_DFL)
+    config = uvicorn.Config(app, log_level=args.log_level, timeout_keep_alive=5)
+    server = uvicorn.Server(config)
+    server.run(sockets=[sock])
+
+
+def _memory_report(workers):
+    import memstats
+    total_pss = 0
+    lines = []
+    for pid in [os.getpid()] + sorted(workers):
+        stats = memstats.process_memory(pid)
+        total_pss += stats.get("pss", 0)
+        role = "parent" if pid == os.getpid() else "worker"
+        lines.append(f"  {role} {pid}: {memstats.format_mb(stats)}")
+    print(f"[serve] memory (total PSS {total_pss / 1048576:.1f}MB):\n" + "\n".join(lines), flush=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pre-fork multi-worker server for app.main:app")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--log-level", default="warning")
+    parser.add_argument("--memory-report-s", type=float, default=60.0, help="0 to disable")
+    args = parser.parse_args(argv)
+
+    if not hasattr(os, "fork"):
+        raise SystemExit("pre-fork mode needs os.fork(); use `uvicorn app.main:app --workers N` instead")
+
+    import uvicorn
+    sock = uvicorn.Config("app.main:app", host=args.host, port=args.port).bind_socket()
+    sock.set_inheritable(True)
+
+    t0 = time.perf_counter()
+    app = _preload()
+    print(f"[serve] preloaded in {time.perf_counter() - t0:.1f}s, forking {args.workers} workers "
+          f"on http://{args.host}:{args.port}", flush=True)
+
+    # move everything allocated so far into the permanent generation: the GC then never
+    # writes to these objects' headers, so their pages stay shared after fork
+    gc.collect()
+    gc.freeze()
+
+    workers = {}
+    stopping = False
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            try:
+                _run_worker(app, sock, args)
+            finally:
+                os._exit(0)
+        workers[pid] = time.time()
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    for _ in range(max(1, args.workers)):
+        spawn()
+
+    next_report = time.monotonic() + args.memory_report_s if args.memory_report_s else None
+    while workers:
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            break
+        if pid:
+            workers.pop(pid, None)
+            if not stopping:
+                print(f"[serve] worker {pid} exited (status {status}), restarting", flush=True)
+                spawn()
+            continue
+        if next_report and time.monotonic() >= next_report and not stopping:
+            _memory_report(workers)
+            next_report = time.monotonic() + args.memory_report_s
+        time.sleep(0.2)
+    sock.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,8 @@
+import hashlib
+import re
 import streamlit as st
 from ecommerce_llm import EcommerceLLM
+from admission import AdmissionRejected
 import numpy as np
 import soundfile as sf
 from ecom_stt import speech_to_text
@@ -12,13 +15,66 @@ st.set_page_config(
     layout="wide"
 )
 
-# --- Session state ---
-if "llm" not in st.session_state:
-    st.session_state.llm = EcommerceLLM()
+
+# --- Shared engine (one per process: model, gateway, retriever) ---
+@st.cache_resource(show_spinner="Loading assistant...")
+def get_engine() -> EcommerceLLM:
+    return EcommerceLLM()
+
+
+# --- Session state (per browser tab: conversation memory + transcript) ---
+if "assistant" not in st.session_state:
+    st.session_state.assistant = get_engine().session()
 
 if "messages" not in st.session_state:
     st.session_state.messages = []
 
+assistant = st.session_state.assistant
+
+
+def stream_reply(reply: str):
+    # render sentence by sentence so long answers start appearing immediately
+    for chunk in re.split(r"(?<=[.!?])\s+", reply):
+        if chunk:
+            yield chunk + " "
+
+
+def run_turn(user_text: str, speak: bool = False):
+    """One pipeline invocation per turn: process once, then render, speak and show tools from that result."""
+    st.session_state.messages.append({"role": "user", "content": user_text})
+    with st.chat_message("user"):
+        st.markdown(user_text)
+
+    with st.chat_message("assistant"):
+        try:
+            with st.spinner("Thinking..."):
+                reply = assistant.process(user_text)
+        except AdmissionRejected as e:
+            # overloaded: drop the turn so the retry does not duplicate it in the transcript
+            st.session_state.messages.pop()
+            st.warning(f"The assistant is busy right now. Please retry in {max(1, round(e.retry_after_s))} s.")
+            return
+        st.write_stream(stream_reply(reply))
+
+        if speak:
+            # 🔊 Speak reply
+            try:
+                audio_bytes = text_to_speech(reply)
+                st.audio(audio_bytes, format="audio/wav")
+            except Exception:
+                st.warning("Voice output unavailable.")
+
+    st.session_state.messages.append({"role": "assistant", "content": reply})
+
+    # Tool panel
+    with st.expander("🧠 Tool Activity (MCP-style)"):
+        st.json(assistant.last_tool)
+
+    with st.expander("📄 Retrieved Documents"):
+        for d in assistant.last_retrieved or []:
+            st.markdown(d.page_content[:500])
+
+
 # --- UI ---
 st.title("🛒 Ecommerce AI Assistant")
 
@@ -36,27 +92,7 @@ if mode == "Chat":
     user_input = st.chat_input("Type your message...")
 
     if user_input:
-        # show user message
-        st.session_state.messages.append({"role": "user", "content": user_input})
-        with st.chat_message("user"):
-            st.markdown(user_input)
-
-        # bot response
-        with st.chat_message("assistant"):
-            with st.spinner("Thinking..."):
-                reply = st.session_state.llm.process(user_input)
-                st.markdown(reply)
-
-        st.session_state.messages.append({"role": "assistant", "content": reply})
-
-        # Tool panel
-        with st.expander("🧠 Tool Activity (MCP-style)"):
-            st.json(getattr(st.session_state.llm, "last_tool", None))
-
-        with st.expander("📄 Retrieved Documents"):
-            docs = getattr(st.session_state.llm, "last_retrieved", [])
-            for d in docs:
-                st.markdown(d.page_content[:500])
+        run_turn(user_input)
 
 # --- Voice Mode ---
 if mode == "Voice":
@@ -65,49 +101,15 @@ if mode == "Voice":
     audio = st.audio_input("Record your voice")
 
     if audio is not None:
-        with st.spinner("Transcribing..."):
-            # Convert audio to WAV bytes
-            audio_bytes = audio.read()
-
-            transcript = speech_to_text(audio_bytes)
-
-        if not transcript:
-            st.error("Could not understand audio. Please try again.")
-        else:
-            # Show transcript
-            st.session_state.messages.append(
-                {"role": "user", "content": transcript}
-            )
-            with st.chat_message("user"):
-                st.markdown(transcript)
-
-            # LLM response
-            with st.chat_message("assistant"):
-                with st.spinner("Thinking..."):
-                    reply = st.session_state.llm.process(transcript)
-                    st.markdown(reply)
-                    reply = st.session_state.llm.process(transcript)
-                    st.markdown(reply)
-
-                    # 🔊 Speak reply
-                    try:
-                        ssml = getattr(st.session_state.llm, "last_ssml", None) or reply
-                        audio_bytes = text_to_speech(ssml)
-                        st.audio(audio_bytes, format="audio/wav")
-                    except Exception:
-                        st.warning("Voice output unavailable.")
-
-
-            st.session_state.messages.append(
-                {"role": "assistant", "content": reply}
-            )
-
-            # Tool visibility
-            with st.expander("🧠 Tool Activity (MCP-style)"):
-                st.json(getattr(st.session_state.llm, "last_tool", None))
-
-            with st.expander("📄 Retrieved Documents"):
-                docs = getattr(st.session_state.llm, "last_retrieved", [])
-                for d in docs:
-                    st.markdown(d.page_content[:500])
-
+        audio_bytes = audio.read()
+        # the widget keeps its value across reruns: only a new recording is a new turn
+        digest = hashlib.sha1(audio_bytes).hexdigest()
+        if st.session_state.get("last_audio") != digest:
+            st.session_state.last_audio = digest
+            with st.spinner("Transcribing..."):
+                transcript = speech_to_text(audio_bytes)
+
+            if not transcript:
+                st.error("Could not understand audio. Please try again.")
+            else:
+                run_turn(transcript, speak=True)
@@ -0,0 +1,180 @@
+# suggest.py
+"""
+Typeahead suggestions over product titles, brands and categories (GET /suggest).
+
+Built from the in-memory product catalog (product_catalog) and rebuilt whenever the
+catalog watcher swaps in a new index generation. Each suggestion is indexed under its
+first SUGGEST_WORD_STARTS word starts, so "iph" and "13 p" both find "Apple iPhone 13
+Pro". The keys are the normalised text from that word on, cut to SUGGEST_KEY_BYTES UTF-8
+bytes, and are stored in one sorted fixed-width bytes array. A prefix lookup is two
+binary searches (np.searchsorted) for a contiguous key range, whose suggestions are then
+ranked by popularity. One- and two-letter prefixes match a large part of the catalog,
+so their ranked answers (up to SUGGEST_PRECOMPUTE_CHARS characters) are computed at
+build time.
+
+A product's popularity is log1p(reviews_count) * rating (unrated products count as
+SUGGEST_DEFAULT_RATING). A brand or category scores the sum over its products.
+"""
+import os
+import re
+import threading
+import time
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+import rag_store1
+from product_catalog import ProductCatalog, get_catalog
+from rag_store1 import parse_list_field
+
+SUGGEST_WORD_STARTS = int(os.getenv("SUGGEST_WORD_STARTS", "6"))
+SUGGEST_KEY_BYTES = int(os.getenv("SUGGEST_KEY_BYTES", "32"))
+SUGGEST_PRECOMPUTE_CHARS = int(os.getenv("SUGGEST_PRECOMPUTE_CHARS", "2"))
+SUGGEST_DEFAULT_RATING = float(os.getenv("SUGGEST_DEFAULT_RATING", "3.0"))
+MAX_SUGGESTIONS = 20
+
+KINDS = ("title", "brand", "category")
+_TITLE, _BRAND, _CATEGORY = range(len(KINDS))
+
+_NON_WORD = re.compile(r"[\W_]+")
+
+
+def normalise(text: str) -> str:
+    return " ".join(_NON_WORD.sub(" ", (text or "").lower()).split())
+
+
+class SuggestIndex:
+    def __init__(self, texts: Sequence[str], kinds: Sequence[int], scores: Sequence[float],
+                 prod_ids: Sequence[Optional[str]]):
+        t0 = time.perf_counter()
+        self.texts = list(texts)
+        self.kinds = np.asarray(kinds, dtype=np.int8)
+        self.scores = np.asarray(scores, dtype=np.float32)
+        self.prod_ids = list(prod_ids)
+
+        keys, owners = [], []
+        for i, text in enumerate(self.texts):
+            norm = normalise(text)
+            start = 0
+            for word in norm.split(" ")[:SUGGEST_WORD_STARTS]:
+                keys.append(norm[start:])
+                owners.append(i)
+                start += len(word) + 1
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        encoded = [keys[j].encode("utf-8")[:SUGGEST_KEY_BYTES] for j in order]
+        self.keys = np.array(encoded, dtype=f"S{SUGGEST_KEY_BYTES}")
+        self.owners = np.asarray([owners[j] for j in order], dtype=np.int32)
+
+        # short prefixes: best MAX_SUGGESTIONS per kind, ready to merge
+        prefixes = {k[:n] for k in keys for n in range(1, SUGGEST_PRECOMPUTE_CHARS + 1) if len(k) >= n}
+        self._precomputed: Dict[str, List[np.ndarray]] = {}
+        for p in prefixes:
+            ids = self._range(p)
+            self._precomputed[p] = [self._top(ids[self.kinds[ids] == code], MAX_SUGGESTIONS)
+                                    for code in range(len(KINDS))]
+        self.build_ms = round((time.perf_counter() - t0) * 1000, 1)
+
+    @classmethod
+    def from_catalog(cls, catalog: ProductCatalog) -> "SuggestIndex":
+        rating = np.where(np.isnan(catalog.rating), SUGGEST_DEFAULT_RATING, catalog.rating)
+        popularity = np.log1p(np.maximum(catalog.reviews_count, 0)) * rating
+
+        texts, kinds, scores, prod_ids = [], [], [], []
+        title_row: Dict[str, int] = {}  # the same title from several sellers: keep the most popular
+        totals = ({}, {})                # brand / category -> (display text, summed score)
+        for i, title in enumerate(catalog.titles):
+            score = float(popularity[i])
+            norm = normalise(title)
+            if norm:
+                j = title_row.get(norm)
+                if j is None:
+                    title_row[norm] = len(texts)
+                    texts.append(title)
+                    kinds.append(_TITLE)
+                    scores.append(score)
+                    prod_ids.append(catalog.ids[i])
+                elif score > scores[j]:
+                    texts[j], scores[j], prod_ids[j] = title, score, catalog.ids[i]
+            names = ([catalog.brands[i]], parse_list_field(catalog.categories[i]))
+            for total, values in zip(totals, names):
+                for value in dict.fromkeys(v.strip() for v in values if v and v.strip()):
+                    key = normalise(value)
+                    if key:
+                        text, s = total.get(key, (value, 0.0))
+                        total[key] = (text, s + score)
+        for code, total in ((_BRAND, totals[0]), (_CATEGORY, totals[1])):
+            for text, score in total.values():
+                texts.append(text)
+                kinds.append(code)
+                scores.append(score)
+                prod_ids.append(None)
+        return cls(texts, kinds, scores, prod_ids)
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def _range(self, prefix: str) -> np.ndarray:
+        """Distinct suggestion ids with a word start beginning with `prefix` (normalised)."""
+        p = prefix.encode("utf-8")[:SUGGEST_KEY_BYTES]
+        # UTF-8 never contains 0xff, so p + b"\xff" sorts after every key starting with p
+        lo, hi = np.searchsorted(self.keys, [p, p + b"\xff"])
+        return np.unique(self.owners[lo:hi])
+
+    def _top(self, ids: np.ndarray, n: int) -> np.ndarray:
+        if len(ids) > n:
+            ids = ids[np.argpartition(-self.scores[ids], n - 1)[:n]]
+        return ids[np.argsort(-self.scores[ids], kind="stable")]
+
+    def suggest(self, query: str, limit: int = 8, kinds: Optional[Sequence[str]] = None) -> List[dict]:
+        """Up to `limit` suggestions whose title / brand / category has a word starting with `query`."""
+        q = normalise(query)
+        limit = max(0, min(limit, MAX_SUGGESTIONS))
+        codes = [KINDS.index(k) for k in (kinds or KINDS)]
+        if not q or not limit:
+            return []
+        per_kind = self._precomputed.get(q)
+        if per_kind is not None:
+            ids = np.concatenate([per_kind[c] for c in codes])
+        else:
+            ids = self._range(q)
+            if len(codes) < len(KINDS):
+                ids = ids[np.isin(self.kinds[ids], codes)]
+            if len(q.encode("utf-8")) > SUGGEST_KEY_BYTES:
+                # keys are truncated: confirm the whole query against the text
+                ids = np.asarray([i for i in ids.tolist() if (" " + normalise(self.texts[i])).find(" " + q) >= 0],
+                                 dtype=np.int32)
+        return [
+            {"text": self.texts[i], "type": KINDS[self.kinds[i]], "prod_id": self.prod_ids[i],
+             "score": round(float(self.scores[i]), 3)}
+            for i in self._top(ids, limit).tolist()
+        ]
+
+    def stats(self) -> dict:
+        return {
+            "suggestions": len(self), "keys": int(len(self.keys)),
+            "by_type": {k: int((self.kinds == c).sum()) for c, k in enumerate(KINDS)},
+            "precomputed_prefixes": len(self._precomputed), "build_ms": self.build_ms,
+            "memory_bytes": int(self.keys.nbytes + self.owners.nbytes + self.kinds.nbytes + self.scores.nbytes),
+        }
+
+
+_INDEX: Optional[SuggestIndex] = None
+_LOCK = threading.Lock()
+
+
+def get_suggest_index() -> SuggestIndex:
+    global _INDEX
+    if _INDEX is None:
+        with _LOCK:
+            if _INDEX is None:
+                _INDEX = SuggestIndex.from_catalog(get_catalog())
+    return _INDEX
+
+
+@rag_store1.register_reload_hook
+def _reload_suggestions(generation):
+    # registered after product_catalog's hook, so get_catalog() is already the new catalog;
+    # not loaded yet: the first request builds it anyway
+    global _INDEX
+    if _INDEX is not None:
+        _INDEX = SuggestIndex.from_catalog(get_catalog())
@@ -0,0 +1,99 @@
+# tests/test_admission.py
+import threading
+import time
+
+import pytest
+
+from admission import AdmissionController, AdmissionRejected, current_priority, priority_scope
+
+
+def wait_queued(controller: AdmissionController, n: int):
+    deadline = time.monotonic() + 2.0
+    while controller.stats()["queue_depth"] < n:
+        assert time.monotonic() < deadline, "waiter never queued"
+        time.sleep(0.005)
+
+
+def queue_waiter(controller, priority, granted, errors):
+    def run():
+        try:
+            with controller.slot(priority):
+                granted.append(priority)
+                time.sleep(0.01)
+        except AdmissionRejected:
+            errors.append(priority)
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+def test_waiters_are_served_by_priority():
+    controller = AdmissionController(max_concurrency=1, max_queue=8, max_wait_s=2.0)
+    granted, errors = [], []
+    controller.acquire("text")
+    threads = []
+    for i, priority in enumerate(["batch", "text", "voice", "text"]):
+        threads.append(queue_waiter(controller, priority, granted, errors))
+        wait_queued(controller, i + 1)
+    controller.release()
+    for t in threads:
+        t.join()
+    assert granted == ["voice", "text", "text", "batch"] and not errors
+    assert controller.stats()["active"] == 0
+
+
+def test_full_queue_rejects_at_once():
+    controller = AdmissionController(max_concurrency=1, max_queue=1, max_wait_s=2.0)
+    granted, errors = [], []
+    controller.acquire("text")
+    waiter = queue_waiter(controller, "text", granted, errors)
+    wait_queued(controller, 1)
+    with pytest.raises(AdmissionRejected):
+        controller.acquire("text")
+    controller.release()
+    waiter.join()
+    assert granted == ["text"] and controller.rejected["text"] == 1
+
+
+def test_higher_priority_sheds_lowest_waiter_when_full():
+    controller = AdmissionController(max_concurrency=1, max_queue=1, max_wait_s=2.0)
+    granted, errors = [], []
+    controller.acquire("text")
+    batch = queue_waiter(controller, "batch", granted, errors)
+    wait_queued(controller, 1)
+    voice = queue_waiter(controller, "voice", granted, errors)
+    batch.join()
+    assert errors == ["batch"]
+    wait_queued(controller, 1)
+    controller.release()
+    voice.join()
+    assert granted == ["voice"]
+
+
+def test_wait_budget_rejects():
+    controller = AdmissionController(max_concurrency=1, max_queue=4, max_wait_s=0.05)
+    controller.acquire("text")
+    with pytest.raises(AdmissionRejected):
+        controller.acquire("voice")
+    assert controller.stats()["queue_depth"] == 0
+    controller.release()
+    assert controller.stats()["active"] == 0
+
+
+def test_non_blocking_acquire_never_queues():
+    controller = AdmissionController(max_concurrency=1, max_queue=4, max_wait_s=1.0)
+    assert controller.acquire(block=False)
+    assert not controller.acquire(block=False)
+    assert controller.stats()["queue_depth"] == 0
+    controller.release()
+    assert controller.acquire(block=False)
+    controller.release()
+
+
+def test_priority_scope():
+    assert current_priority() == "text"
+    with priority_scope("voice"):
+        assert current_priority() == "voice"
+    with priority_scope("unknown"):
+        assert current_priority() == "text"
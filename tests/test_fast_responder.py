@@ -0,0 +1,40 @@
+# tests/test_fast_responder.py
+import pytest
+
+from fast_responder import FastResponder
+
+
+@pytest.fixture(scope="module")
+def responder():
+    # built-in catalog only: a local reply_templates.json must not change the outcome
+    return FastResponder.from_file(lambda text: f"<speak>{text}</speak>", path="")
+
+
+@pytest.mark.parametrize("text", ["ok", "yes", "no", "yeah", "nope", "sure", "Yes!"])
+def test_bare_confirmations_reach_the_conversation(responder, text):
+    # usually the answer to the assistant's last question ("place the order?")
+    assert responder.match(text) is None
+
+
+def test_canned_phrase_with_filler(responder):
+    reply = responder.match("ok thanks")
+    assert reply is not None and reply.template == "thanks"
+    assert responder.match("hi thanks bye").template == "closing"
+
+
+def test_real_content_is_not_canned(responder):
+    assert responder.match("hi, where is my order ORD1") is None
+    assert responder.opens_with_canned("hi, where is my order ORD1")
+
+
+def test_phrases_match_whole_words_only(responder):
+    reply = responder.match("this shipping")
+    assert reply is None or reply.template != "greeting"
+    assert not responder.opens_with_canned("this shipping")
+
+
+def test_static_replies_are_prerendered(responder):
+    reply = responder.match("hello")
+    assert reply.template == "greeting"
+    assert responder.ssml_for(reply.text) == f"<speak>{reply.text}</speak>"
+    assert responder.render("order_not_found", order_id="ORD9") == "I couldn't find an order with id ORD9."
@@ -0,0 +1,193 @@
+# tests/test_llm_gateway.py
+import threading
+import time
+
+import pytest
+
+from admission import AdmissionController
+from llm_gateway import (CircuitBreaker, CircuitOpenError, FakeChatModel, GatewayError, LLMGateway,
+                         ProviderRequestError, is_transient)
+
+
+class StatusError(Exception):
+    """Stand-in for an SDK error carrying an HTTP status (groq.APIStatusError, httpx)."""
+
+    def __init__(self, status_code: int):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+class Flaky:
+    """Callable raising the queued errors in turn, then returning "ok"."""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+
+def gateway(**kwargs) -> LLMGateway:
+    kwargs.setdefault("backoff_base_s", 0.0)
+    return LLMGateway(**kwargs)
+
+
+# ---------------- circuit breaker ----------------
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout_s=60)
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_success()  # resets the streak
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+
+def test_breaker_half_open_lets_one_probe_through():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout_s=0.05)
+    breaker.record_failure()
+    assert breaker.state == "open"
+    time.sleep(0.06)
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+    assert not breaker.allow()  # only one probe at a time
+    breaker.record_failure()  # failed probe: open again
+    assert breaker.state == "open"
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow()
+
+
+def test_abandoned_probe_frees_half_open():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout_s=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.abandon()
+    assert breaker.state == "half_open" and breaker.allow()
+
+
+# ---------------- retries ----------------
+def test_fake_model_through_gateway_is_deterministic():
+    gw = gateway()
+    model = FakeChatModel()
+    first = gw.call(model.invoke, [("human", "where is my order?")]).content
+    assert first == gw.call(model.invoke, [("human", "where is my order?")]).content
+    assert gw.stats()["calls"] == 2 and gw.breaker.state == "closed"
+
+
+def test_transient_errors_are_retried():
+    fn = Flaky(TimeoutError("slow"), StatusError(503))
+    gw = gateway(max_retries=2)
+    assert gw.call(fn) == "ok"
+    assert fn.calls == 3 and gw.retries == 2
+    assert gw.breaker.state == "closed"
+
+
+def test_exhausted_retries_raise_gateway_error():
+    fn = Flaky(*[StatusError(429)] * 5)
+    gw = gateway(max_retries=2, breaker=CircuitBreaker(failure_threshold=10))
+    with pytest.raises(GatewayError):
+        gw.call(fn)
+    assert fn.calls == 3 and gw.breaker._failures == 3
+
+
+@pytest.mark.parametrize("status", [400, 401, 413])
+def test_non_transient_errors_fail_fast_without_touching_breaker(status):
+    fn = Flaky(StatusError(status))
+    gw = gateway(max_retries=2, breaker=CircuitBreaker(failure_threshold=1))
+    with pytest.raises(ProviderRequestError):
+        gw.call(fn)
+    assert fn.calls == 1 and gw.retries == 0
+    assert gw.breaker.state == "closed" and gw.breaker._failures == 0
+
+
+def test_is_transient():
+    assert is_transient(TimeoutError()) and is_transient(ConnectionResetError())
+    assert is_transient(StatusError(429)) and is_transient(StatusError(502))
+    assert not is_transient(StatusError(400)) and not is_transient(ValueError("bad prompt"))
+
+
+def test_open_breaker_short_circuits_without_calling_provider():
+    fn = Flaky(*[ConnectionError("down")] * 5)
+    gw = gateway(max_retries=5, breaker=CircuitBreaker(failure_threshold=2, reset_timeout_s=60))
+    with pytest.raises(GatewayError):
+        gw.call(fn)
+    assert fn.calls == 2  # stops retrying once the breaker opens
+    with pytest.raises(CircuitOpenError):
+        gw.call(fn)
+    assert fn.calls == 2 and gw.rejected == 1
+
+
+# ---------------- deadline / hedging ----------------
+def test_attempt_deadline_times_out():
+    gw = gateway(timeout_s=0.05, max_retries=0)
+    t0 = time.monotonic()
+    with pytest.raises(GatewayError):
+        gw.call(time.sleep, 0.5)
+    assert time.monotonic() - t0 < 0.4
+    assert gw.timeouts == 1
+
+
+def test_hedge_fires_after_recent_latency_percentile():
+    calls = []
+    lock = threading.Lock()
+
+    def first_slow():
+        with lock:
+            calls.append(None)
+            n = len(calls)
+        time.sleep(0.5 if n == 1 else 0.0)
+        return n
+
+    gw = gateway(timeout_s=2.0, hedge_percentile=50, hedge_min_samples=1)
+    gw._record_latency(0.02)
+    t0 = time.monotonic()
+    assert gw.call(first_slow, hedge=True) == 2  # the duplicate answered first
+    assert time.monotonic() - t0 < 0.4
+    assert gw.hedges == 1
+
+
+def test_hedge_is_skipped_when_no_admission_slot_is_free():
+    admission = AdmissionController(max_concurrency=1, max_queue=4, max_wait_s=1.0)
+    gw = gateway(timeout_s=2.0, hedge_percentile=50, hedge_min_samples=1, admission=admission)
+    gw._record_latency(0.01)
+    assert gw.call(time.sleep, 0.1, hedge=True) is None
+    assert gw.hedges == 0
+
+
+def test_admission_cap_bounds_provider_requests_in_flight():
+    admission = AdmissionController(max_concurrency=2, max_queue=16, max_wait_s=5.0)
+    gw = gateway(timeout_s=0.05, max_retries=1, admission=admission)
+    in_flight, peak = [0], [0]
+    lock = threading.Lock()
+
+    def slow():
+        with lock:
+            in_flight[0] += 1
+            peak[0] = max(peak[0], in_flight[0])
+        time.sleep(0.15)  # outlives the attempt deadline
+        with lock:
+            in_flight[0] -= 1
+
+    def run():
+        with pytest.raises(GatewayError):
+            gw.call(slow)
+
+    threads = [threading.Thread(target=run) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    time.sleep(0.2)
+    assert peak[0] == 2  # timed-out attempts keep their slot until they return
+    assert admission.stats()["active"] == 0
@@ -0,0 +1,19 @@
+# tests/test_product_ids.py
+from rag_store1 import product_ids, safe_get
+
+
+def test_blank_cells_read_as_empty():
+    assert safe_get({"brand": float("nan")}, "brand") == ""
+    assert safe_get({"brand": None}, "brand") == ""
+    assert safe_get({"brand": " Acme "}, "brand") == "Acme"
+
+
+def test_ids_fall_back_past_blank_model_numbers():
+    assert product_ids([{"model_number": float("nan"), "seller_id": "S9"}]) == ["S9"]
+
+
+def test_colliding_ids_are_suffixed_not_dropped():
+    rows = [{"seller_id": "S1"}, {"seller_id": "S1"}, {"seller_id": "S1"}, {"model_number": "S1-1"}]
+    ids = product_ids(rows)
+    assert ids == ["S1", "S1-1", "S1-2", "S1-1-3"]
+    assert len(set(ids)) == len(rows)
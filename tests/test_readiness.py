@@ -0,0 +1,62 @@
+# tests/test_readiness.py
+import sys
+import types
+
+import pytest
+
+from app import deps
+
+
+class _Engine:
+    pass
+
+
+class _Store:
+    def similarity_search_by_vector(self, vec, k=1):
+        return []
+
+
+class _Embeddings:
+    def embed_query(self, text):
+        return [1.0]
+
+
+@pytest.fixture
+def fresh_deps(monkeypatch):
+    monkeypatch.setattr(deps, "_warmup", {"status": "cold", "started_at": None, "finished_at": None,
+                                          "stages_ms": {}, "error": None})
+    monkeypatch.setattr(deps, "_llm_instance", None)
+    monkeypatch.setitem(sys.modules, "ecommerce_llm", types.SimpleNamespace(EcommerceLLM=_Engine))
+    return deps
+
+
+def test_ready_at_once_when_warmup_is_disabled(fresh_deps):
+    assert not fresh_deps.is_ready()
+    fresh_deps.skip_warmup()
+    assert fresh_deps.is_ready()
+    assert fresh_deps.warmup_state()["status"] == "skipped"
+    # the engine is then built lazily by the first request, and readiness stays up
+    assert isinstance(fresh_deps.get_llm(), _Engine)
+    assert fresh_deps.is_ready()
+
+
+def test_ready_only_after_warmup_finishes(fresh_deps, monkeypatch):
+    monkeypatch.setitem(sys.modules, "rag_store1", types.SimpleNamespace(
+        get_embeddings=_Embeddings, get_vectorstore=_Store))
+    monkeypatch.setitem(sys.modules, "product_catalog", types.SimpleNamespace(get_catalog=lambda: None))
+    monkeypatch.setitem(sys.modules, "suggest", types.SimpleNamespace(get_suggest_index=lambda: None))
+    monkeypatch.setitem(sys.modules, "faq_index", types.SimpleNamespace(get_faq_index=lambda: None))
+    assert not fresh_deps.is_ready()
+    fresh_deps.warmup()
+    assert fresh_deps.is_ready()
+    state = fresh_deps.warmup_state()
+    assert state["status"] == "ready" and "build_llm" in state["stages_ms"]
+
+
+def test_failed_warmup_is_not_ready(fresh_deps, monkeypatch):
+    def broken():
+        raise RuntimeError("no model")
+    monkeypatch.setitem(sys.modules, "rag_store1", types.SimpleNamespace(get_embeddings=broken))
+    fresh_deps.warmup()
+    assert not fresh_deps.is_ready()
+    assert fresh_deps.warmup_state()["error"] == "RuntimeError: no model"
@@ -0,0 +1,25 @@
+# tests/test_shard_routing.py
+from rag_store1 import OTHER_PRODUCTS_SHARD, route_shards, shard_name
+
+SHARDS = ["faqs", "products/electronics", "products/headphones", "products/home-kitchen", OTHER_PRODUCTS_SHARD]
+
+
+def test_named_category_narrows_product_shards():
+    assert route_shards(SHARDS, "cheap headphones", "products") == ["products/headphones"]
+    assert route_shards(SHARDS, "home and kitchen deals", "products") == ["products/home-kitchen"]
+
+
+def test_other_bucket_is_never_named():
+    # "other" is a word, not a category: every product shard stays in the search
+    assert route_shards(SHARDS, "show me other options", "products") == [s for s in SHARDS if s != "faqs"]
+    assert route_shards(SHARDS, "show me other headphones", "products") == ["products/headphones"]
+
+
+def test_source_filter_and_unsharded_index():
+    assert route_shards(SHARDS, "return policy", "faqs") == ["faqs"]
+    assert route_shards([], "anything", "products") is None
+
+
+def test_products_without_category_go_to_other_bucket():
+    assert shard_name({"source": "products", "category": ""}) == OTHER_PRODUCTS_SHARD
+    assert shard_name({"source": "products", "category": '["Electronics", "Audio"]'}) == "products/electronics"
@@ -1,16 +1,48 @@
 # tools.py
 from typing import List, Dict
-from rag_store import get_retriever
-from langsmith import traceable
+from rag_store1 import get_retriever, retrieve_documents, retrieve_candidates, batch_similarity_search, active_generation
+import rerank
+import tracing
+import singleflight
+import metrics
 
-@traceable(name="product_search")
-def search_products(query: str, k: int = 5) -> List[Dict]:
+_search_flight = singleflight.get_group("search_products")
+
+
+@tracing.span("product_search")
+@metrics.timed("search_products")
+def search_products(query: str, k: int = 5, diverse: bool = True) -> List[Dict]:
     """
     Returns structured product metadata using retriever (no LLM).
     Each item: {prod_id,title,brand,final_price,currency,availability,url,score?}
+    With diverse=True, MMR_FETCH_FACTOR * k candidates are fetched and reranked (rerank.py)
+    so near-identical listings do not fill the k slots.
+    Concurrent identical (query, k) calls share one retrieval; treat results as read-only.
     """
+    key = (active_generation().number, k, diverse, singleflight.normalize_key(query))
+    return _search_flight.do(key, _search_products, query, k, diverse)
+
+
+def _search_products(query: str, k: int, diverse: bool = True) -> List[Dict]:
     retriever = get_retriever(k=k)
-    docs = retriever.get_relevant_documents(query)
+    if not diverse:
+        # product shards only, so FAQ hits never take top-k slots
+        return format_product_results(retrieve_documents(retriever, query, source="products"))
+    vec, docs, vectors = retrieve_candidates(retriever, query, max(k, k * rerank.MMR_FETCH_FACTOR), source="products")
+    with metrics.stage("rerank"):
+        docs = rerank.rerank(vec, docs, vectors, k)
+    return format_product_results(docs)
+
+
+def search_products_batch(queries: List[str], k: int = 5) -> List[List[Dict]]:
+    """
+    Batched variant of search_products: one embedding call for all queries and one
+    vector-store query. Returns one result list per query, in order.
+    """
+    return [format_product_results(docs) for docs in batch_similarity_search(queries, k=k, source="products")]
+
+
+def format_product_results(docs) -> List[Dict]:
     results = []
     for d in docs:
         md = d.metadata or {}
@@ -0,0 +1,261 @@
+# tracing.py
+"""
+Low-overhead tracing facade (replaces @traceable on hot paths).
+
+    @tracing.span("product_search")          # traced when the request is sampled
+    @tracing.span("rag_retrieval", hot=True)  # opt-out: only traced with TRACE_HOT_SPANS=1
+
+Configuration (environment):
+    TRACING_MODE        off | log | langsmith   (default: langsmith if LANGCHAIN_TRACING_V2=true, else off)
+    TRACE_SAMPLE_RATE   head-based sampling probability per root span (default 0.1)
+    TRACE_DISABLED_SPANS comma-separated span names never traced
+    TRACE_HOT_SPANS     1 to also trace spans declared hot=True
+    TRACE_LANGCHAIN_AUTO 1 to keep LangChain's own per-call tracing (unsampled) enabled
+
+In "off" mode span() returns the function unchanged, so tracing costs nothing.
+The sampling decision is taken once at the root span and inherited by nested
+spans. Finished spans are queued and exported in batches by a background thread;
+argument serialization happens on that thread, not on the request path.
+"""
+import os
+import time
+import uuid
+import queue
+import random
+import threading
+import contextvars
+from datetime import datetime, timezone
+from functools import wraps
+from typing import List, Optional
+
+from dotenv import load_dotenv
+
+import metrics
+
+load_dotenv()
+
+_NOT_SAMPLED = object()
+_current_span = contextvars.ContextVar("trace_current_span", default=None)
+
+
+def _env_flag(name: str) -> bool:
+    return os.getenv(name, "").strip().lower() in ("1", "true", "yes", "on")
+
+
+def _default_mode() -> str:
+    return "langsmith" if _env_flag("LANGCHAIN_TRACING_V2") else "off"
+
+
+MODE = os.getenv("TRACING_MODE", _default_mode()).strip().lower()
+SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.1"))
+DISABLED_SPANS = {s.strip() for s in os.getenv("TRACE_DISABLED_SPANS", "").split(",") if s.strip()}
+TRACE_HOT = _env_flag("TRACE_HOT_SPANS")
+
+if MODE != "off" and not _env_flag("TRACE_LANGCHAIN_AUTO"):
+    # LangChain would otherwise trace every chain/LLM call unsampled on its own
+    os.environ["LANGCHAIN_TRACING_V2"] = "false"
+
+
+class _Span:
+    __slots__ = ("id", "trace_id", "parent", "name", "start", "end", "args", "kwargs",
+                 "output", "error", "dotted_order")
+
+    def __init__(self, name: str, parent: Optional["_Span"], args, kwargs):
+        self.id = uuid.uuid4()
+        self.parent = parent
+        self.trace_id = parent.trace_id if parent else self.id
+        self.name = name
+        self.start = datetime.now(timezone.utc)
+        self.end = None
+        self.args = args
+        self.kwargs = kwargs
+        self.output = None
+        self.error = None
+        stamp = self.start.strftime("%Y%m%dT%H%M%S%fZ") + str(self.id)
+        self.dotted_order = f"{parent.dotted_order}.{stamp}" if parent else stamp
+
+
+# --------------------------------------------------
+# EXPORT
+# --------------------------------------------------
+def _short_repr(value, limit: int = 500) -> str:
+    try:
+        r = repr(value)
+    except Exception:
+        r = f"<{type(value).__name__}>"
+    return r if len(r) <= limit else r[:limit] + "...[truncated]"
+
+
+class _Exporter:
+    """Bounded queue + background thread that ships finished spans in batches."""
+
+    def __init__(self, mode: str, batch_size: int = 50, flush_interval_s: float = 2.0, max_queue: int = 5000):
+        self.mode = mode
+        self.batch_size = batch_size
+        self.flush_interval_s = flush_interval_s
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._client = None
+        self._project = os.getenv("LANGCHAIN_PROJECT", "default")
+        self.exported = 0
+        self.dropped = 0
+        self.export_errors = 0
+        self.export_ms = 0.0
+        self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+        self._thread.start()
+
+    def submit(self, span: _Span):
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval_s
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            start = time.perf_counter()
+            try:
+                self._export(batch)
+                self.exported += len(batch)
+            except Exception as e:
+                self.export_errors += 1
+                print(f"[tracing] export failed ({len(batch)} spans): {e}")
+            self.export_ms += (time.perf_counter() - start) * 1000
+
+    def _to_run(self, span: _Span) -> dict:
+        run = {
+            "id": str(span.id),
+            "trace_id": str(span.trace_id),
+            "dotted_order": span.dotted_order,
+            "parent_run_id": str(span.parent.id) if span.parent else None,
+            "name": span.name,
+            "run_type": "chain",
+            "start_time": span.start.isoformat(),
+            "end_time": span.end.isoformat() if span.end else None,
+            "inputs": {
+                "args": [_short_repr(a) for a in span.args],
+                "kwargs": {k: _short_repr(v) for k, v in span.kwargs.items()},
+            },
+            "outputs": {"output": _short_repr(span.output)} if span.error is None else None,
+            "error": span.error,
+            "session_name": self._project,
+        }
+        return run
+
+    def _export(self, batch: List[_Span]):
+        runs = [self._to_run(s) for s in batch]
+        if self.mode == "log":
+            for r in runs:
+                print(f"[tracing] {r['name']} trace={r['trace_id'][:8]} {r['start_time']} -> {r['end_time']}")
+            return
+        if self._client is None:
+            from langsmith import Client
+            self._client = Client()
+        if hasattr(self._client, "batch_ingest_runs"):
+            self._client.batch_ingest_runs(create=runs)
+        else:
+            for r in runs:
+                self._client.create_run(**r)
+
+
+_exporter: Optional[_Exporter] = None
+_exporter_lock = threading.Lock()
+
+# counters for measuring what tracing itself costs
+_stats = {"root_spans": 0, "sampled_roots": 0, "spans_recorded": 0, "overhead_ms": 0.0}
+
+
+def _get_exporter() -> _Exporter:
+    global _exporter
+    if _exporter is None:
+        with _exporter_lock:
+            if _exporter is None:
+                _exporter = _Exporter(MODE)
+    return _exporter
+
+
+# --------------------------------------------------
+# PUBLIC API
+# --------------------------------------------------
+def enabled_for(name: str, hot: bool = False) -> bool:
+    if MODE == "off" or name in DISABLED_SPANS:
+        return False
+    return TRACE_HOT or not hot
+
+
+def span(name: str, hot: bool = False):
+    """Decorator recording a span for sampled requests; a no-op wrapper-free decorator when disabled."""
+    def decorator(fn):
+        if not enabled_for(name, hot):
+            return fn
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            t0 = time.perf_counter()
+            parent = _current_span.get()
+            if parent is None:
+                _stats["root_spans"] += 1
+                if random.random() >= SAMPLE_RATE:
+                    token = _current_span.set(_NOT_SAMPLED)
+                    _stats["overhead_ms"] += (time.perf_counter() - t0) * 1000
+                    try:
+                        return fn(*args, **kwargs)
+                    finally:
+                        _current_span.reset(token)
+                _stats["sampled_roots"] += 1
+            elif parent is _NOT_SAMPLED:
+                return fn(*args, **kwargs)
+
+            s = _Span(name, parent, args, kwargs)
+            token = _current_span.set(s)
+            t1 = time.perf_counter()
+            try:
+                s.output = fn(*args, **kwargs)
+                return s.output
+            except Exception as e:
+                s.error = f"{type(e).__name__}: {e}"
+                raise
+            finally:
+                t2 = time.perf_counter()
+                _current_span.reset(token)
+                s.end = datetime.now(timezone.utc)
+                _get_exporter().submit(s)
+                _stats["spans_recorded"] += 1
+                _stats["overhead_ms"] += ((t1 - t0) + (time.perf_counter() - t2)) * 1000
+
+        return wrapper
+    return decorator
+
+
+def stats() -> dict:
+    out = dict(_stats, mode=MODE, sample_rate=SAMPLE_RATE)
+    if _exporter is not None:
+        out.update(
+            exported=_exporter.exported,
+            dropped=_exporter.dropped,
+            export_errors=_exporter.export_errors,
+            export_ms=round(_exporter.export_ms, 3),
+            queued=_exporter._queue.qsize(),
+        )
+    return out
+
+
+@metrics.register_collector
+def _tracing_metrics():
+    s = stats()
+    counters = {(("event", k),): s[k] for k in ("root_spans", "sampled_roots", "spans_recorded",
+                                                "exported", "dropped", "export_errors") if k in s}
+    lines = metrics.sample_lines("ecom_tracing_events_total", "Tracing spans by outcome",
+                                 counters, metric_type="counter")
+    lines += metrics.sample_lines("ecom_tracing_overhead_ms_total",
+                                  "Request-thread time spent in tracing bookkeeping",
+                                  {(): round(s["overhead_ms"], 3)}, metric_type="counter")
+    return lines